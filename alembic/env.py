@@ -34,9 +34,23 @@ import models.notifications
 import models.note_like
 import models.deadline
 import models.ai_summary
+import models.ai_summary_job
+import models.ocr_cache
+import models.ai_summary_lease
+import models.vote_event
+import models.organization_score_bucket
+import models.media_object
 
 target_metadata = Base.metadata
 
+# Dialect-specific search objects created by DDL events in models.note, not
+# mapped on the table; keep autogenerate from proposing to drop them.
+UNMAPPED_OBJECTS = {"search_vector", "ix_notes_search_vector", "notes_fts"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name in UNMAPPED_OBJECTS)
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -59,6 +73,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -82,7 +97,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,31 @@
+"""media variants added
+
+Revision ID: a3e7c1d9f5b8
+Revises: d6a2f8c4b0e7
+Create Date: 2026-10-18 19:42:17.318406
+
+Existing objects start without derivatives; the image pipeline renders
+them in the background on the next start.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3e7c1d9f5b8'
+down_revision: Union[str, Sequence[str], None] = 'd6a2f8c4b0e7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('media_objects', sa.Column('variants', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('media_objects', 'variants')
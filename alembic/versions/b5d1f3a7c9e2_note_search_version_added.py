@@ -0,0 +1,31 @@
+"""note search version added
+
+Revision ID: b5d1f3a7c9e2
+Revises: a3e7c1d9f5b8
+Create Date: 2026-10-18 21:06:52.740193
+
+Search index snapshots written before this revision are rebuilt from the
+notes table on the next start.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5d1f3a7c9e2'
+down_revision: Union[str, Sequence[str], None] = 'a3e7c1d9f5b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('search_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('notes', 'search_version')
@@ -0,0 +1,47 @@
+"""notes full text search added
+
+Revision ID: b9d3e5f7a1c4
+Revises: f4b8c2e6a0d3
+Create Date: 2026-10-18 15:52:08.114267
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d3e5f7a1c4'
+down_revision: Union[str, Sequence[str], None] = 'f4b8c2e6a0d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('notes', sa.Column('ocr_text', sa.Text(), nullable=True))
+    # Postgres has no Polish configuration out of the box; start from a copy of
+    # "simple" so the column below can be built, and map a Polish dictionary
+    # into it later for stemming.
+    op.execute("""
+        DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'polish') THEN
+                CREATE TEXT SEARCH CONFIGURATION polish (COPY = simple);
+            END IF;
+        END $$
+    """)
+    op.execute("""
+        ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('polish'::regconfig, coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('polish'::regconfig, coalesce(content, '') || ' ' || coalesce(ocr_text, '')), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_notes_search_vector', 'notes', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_notes_search_vector', table_name='notes', postgresql_using='gin')
+    op.drop_column('notes', 'search_vector')
+    op.drop_column('notes', 'ocr_text')
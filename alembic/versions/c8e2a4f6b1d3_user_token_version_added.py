@@ -0,0 +1,31 @@
+"""user token version added
+
+Revision ID: c8e2a4f6b1d3
+Revises: b5d1f3a7c9e2
+Create Date: 2026-10-18 22:31:05.614902
+
+Tokens issued before this revision carry no version and count as version 0,
+so existing sessions stay valid until the user's password next changes.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8e2a4f6b1d3'
+down_revision: Union[str, Sequence[str], None] = 'b5d1f3a7c9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,109 @@
+"""media objects added
+
+Revision ID: d6a2f8c4b0e7
+Revises: b9d3e5f7a1c4
+Create Date: 2026-10-18 17:08:44.502913
+
+Copies existing note images and avatars into the content-addressed store:
+files with the same bytes become one object under media/objects, the rows
+pointing at them get its URL and hash, and the object's ref_count is the
+number of those rows. The originals are left in place, since the upgrade
+can still roll back after this revision. Once it is committed, remove them
+with `python -m services.media_cleanup`. Downgrading keeps the copies.
+
+"""
+from typing import Sequence, Union
+import hashlib
+import os
+import shutil
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd6a2f8c4b0e7'
+down_revision: Union[str, Sequence[str], None] = 'b9d3e5f7a1c4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# (table, primary key, url column, hash column)
+MEDIA_REFERENCES = [
+    ('notes', 'note_id', 'image_url', 'media_hash'),
+    ('users', 'user_id', 'avatar_url', 'avatar_hash'),
+]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_path(sha256: str, extension: str) -> str:
+    return os.path.join('media', 'objects', sha256[:2], sha256[2:4], sha256 + extension.lower())
+
+
+def dedupe_existing_media(connection):
+    """Stores a copy of every referenced local file once."""
+    objects = {}
+    references = []
+    for table, key, url_column, hash_column in MEDIA_REFERENCES:
+        rows = connection.execute(sa.text(
+            f"SELECT {key}, {url_column} FROM {table} WHERE {url_column} LIKE '/media/%' AND {hash_column} IS NULL"
+        )).all()
+        for row_id, url in rows:
+            original = url.lstrip('/')
+            source = os.path.join(APP_ROOT, original)
+            if not os.path.isfile(source):
+                continue
+            sha256 = file_sha256(source)
+            if sha256 not in objects:
+                path = object_path(sha256, os.path.splitext(original)[1])
+                target = os.path.join(APP_ROOT, path)
+                if not os.path.exists(target):
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.copy2(source, target)
+                objects[sha256] = {'path': path, 'size': os.path.getsize(source), 'ref_count': 0}
+            objects[sha256]['ref_count'] += 1
+            references.append((table, key, url_column, hash_column, row_id, sha256))
+
+    if objects:
+        connection.execute(sa.text(
+            "INSERT INTO media_objects (sha256, path, size, ref_count) VALUES (:sha256, :path, :size, :ref_count)"
+        ), [{'sha256': sha256, **values} for sha256, values in objects.items()])
+    for table, key, url_column, hash_column, row_id, sha256 in references:
+        connection.execute(sa.text(
+            f"UPDATE {table} SET {url_column} = :url, {hash_column} = :sha256 WHERE {key} = :id"
+        ), {'url': '/' + objects[sha256]['path'], 'sha256': sha256, 'id': row_id})
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('media_objects',
+    sa.Column('sha256', sa.String(length=64), nullable=False),
+    sa.Column('path', sa.String(), nullable=False),
+    sa.Column('size', sa.BigInteger(), nullable=False),
+    sa.Column('ref_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('sha256')
+    )
+    op.add_column('notes', sa.Column('media_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('notes_media_hash_fkey', 'notes', 'media_objects', ['media_hash'], ['sha256'])
+    op.add_column('users', sa.Column('avatar_hash', sa.String(length=64), nullable=True))
+    op.create_foreign_key('users_avatar_hash_fkey', 'users', 'media_objects', ['avatar_hash'], ['sha256'])
+
+    dedupe_existing_media(op.get_bind())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('users_avatar_hash_fkey', 'users', type_='foreignkey')
+    op.drop_column('users', 'avatar_hash')
+    op.drop_constraint('notes_media_hash_fkey', 'notes', type_='foreignkey')
+    op.drop_column('notes', 'media_hash')
+    op.drop_table('media_objects')
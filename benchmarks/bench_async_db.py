@@ -0,0 +1,68 @@
+"""Concurrent throughput of the sync `db_dependency` vs `async_db_dependency`.
+
+Both endpoints run the same query, which sleeps inside SQLite to simulate a
+slow database. With the sync session every request blocks the event loop,
+so concurrent requests are served one after another. Concurrency is kept
+within the default pool size (5 + 10 overflow) of both engines.
+
+    python benchmarks/bench_async_db.py [concurrency] [rounds] [query_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_async_db.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy import event, text
+from database import engine, async_engine, db_dependency, async_db_dependency
+
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 15
+ROUNDS = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+QUERY_MS = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+engine.echo = False
+async_engine.echo = False
+
+def add_sleep_function(dbapi_connection, connection_record):
+    dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000))
+
+event.listen(engine, "connect", add_sleep_function)
+event.listen(async_engine.sync_engine, "connect", add_sleep_function)
+
+app = FastAPI()
+
+@app.get("/sync")
+async def sync_query(db: db_dependency):
+    db.execute(text("SELECT sleep_ms(:ms)"), {"ms": QUERY_MS})
+
+@app.get("/async")
+async def async_query(db: async_db_dependency):
+    await db.execute(text("SELECT sleep_ms(:ms)"), {"ms": QUERY_MS})
+
+async def run(path: str) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)
+        start = time.perf_counter()
+        for _ in range(ROUNDS):
+            responses = await asyncio.gather(*(client.get(path) for _ in range(CONCURRENCY)))
+            assert all(response.status_code == 200 for response in responses)
+        return time.perf_counter() - start
+
+async def main():
+    total = CONCURRENCY * ROUNDS
+    print(f"{total} requests, {CONCURRENCY} concurrent, {QUERY_MS} ms per query")
+    for name, path in (("sync session", "/sync"), ("async session", "/async")):
+        elapsed = await run(path)
+        print(f"{name:>14}: {elapsed:6.2f} s  {total / elapsed:8.1f} req/s")
+    await async_engine.dispose()
+    os.remove(DATABASE_PATH)
+
+if __name__ == "__main__":
+    asyncio.run(main())
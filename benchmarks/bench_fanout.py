@@ -0,0 +1,74 @@
+"""Notifying every member of an organization: one commit per row vs fan-out.
+
+The per-row run mirrors `remove_user_from_organization`, which adds and
+commits each notification on its own; the fan-out run is
+`NotificationFanOut.fan_out`, chunked multi-row INSERTs in one transaction.
+
+    python benchmarks/bench_fanout.py [members]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_fanout.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import select, delete, insert
+from database import Base, engine, async_engine, SessionLocal
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.notifications import Notification
+from models.organization import Organization
+from models.organization_user import OrganizationUser
+from models.user import User
+from services.notification_fanout import notification_fanout
+
+MEMBERS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+engine.echo = False
+async_engine.echo = False
+
+
+def seed():
+    with engine.begin() as conn:
+        conn.execute(insert(Organization).values(organization_id=1, organization_name="Organizacja"))
+        conn.execute(insert(User), [
+            {"user_id": user_id, "username": f"user{user_id}", "first_name": "Test", "last_name": "User",
+             "email": f"user{user_id}@example.com", "password_hash": "x"}
+            for user_id in range(1, MEMBERS + 1)
+        ])
+        conn.execute(insert(OrganizationUser), [
+            {"organization_id": 1, "user_id": user_id} for user_id in range(1, MEMBERS + 1)
+        ])
+
+def per_row(message):
+    db = SessionLocal()
+    try:
+        user_ids = db.scalars(select(OrganizationUser.user_id).filter(OrganizationUser.organization_id == 1)).all()
+        for user_id in user_ids:
+            db.add(Notification(user_id=user_id, message=message, status="unread"))
+            db.commit()
+    finally:
+        db.close()
+
+def fan_out(message):
+    notification_fanout.fan_out(1, message)
+
+def main():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    seed()
+    print(f"{MEMBERS} members of one organization")
+    for name, operation in (("per row", per_row), ("fan-out", fan_out)):
+        with engine.begin() as conn:
+            conn.execute(delete(Notification))
+        start = time.perf_counter()
+        operation("Nowy termin: Kolokwium")
+        elapsed = time.perf_counter() - start
+        print(f"{name:>8}: {elapsed * 1000:9.1f} ms  {MEMBERS / elapsed:9.0f} rows/s")
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
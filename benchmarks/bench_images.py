@@ -0,0 +1,100 @@
+"""Image derivatives: bytes a topic page downloads and what rendering costs.
+
+Renders phone-sized JPEG photos through `image_variants.render_variants`,
+then compares the page weight of originals vs thumbnails vs medium images,
+and the event loop's worst stall while the photos are rendered on the loop
+vs in the image pipeline's process pool.
+
+    python benchmarks/bench_images.py [photos] [page size]
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from PIL import Image, ImageDraw
+from services.image_pipeline import ImagePipeline, IMAGE_ENCODER_OPTIONS
+from services.image_variants import render_variants
+
+PHOTOS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+PAGE_SIZE = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+def make_photo(path: str, seed: int):
+    # Gradient, shapes and sensor-like noise, saved like a phone camera would.
+    size = (4032, 3024)
+    base = Image.linear_gradient("L").resize(size)
+    noise = Image.effect_noise(size, 24)
+    photo = Image.merge("RGB", (base, Image.blend(base, noise, 0.3), noise))
+    draw = ImageDraw.Draw(photo)
+    for i in range(40):
+        x, y = (seed * 997 + i * 613) % size[0], (seed * 389 + i * 241) % size[1]
+        draw.rectangle((x, y, x + 300, y + 120), fill=(30 + i * 5, 40, 90))
+    photo.save(path, "JPEG", quality=92)
+
+async def worst_stall(work) -> tuple[float, float]:
+    """Runs `work` while a 1 ms ticker measures the loop's longest delay."""
+    stalls = []
+
+    async def tick():
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(0.001)
+            stalls.append(time.perf_counter() - start - 0.001)
+
+    ticker = asyncio.create_task(tick())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await work()
+    elapsed = time.perf_counter() - start
+    await asyncio.sleep(0.01)
+    ticker.cancel()
+    return elapsed * 1000, max(stalls, default=0.0) * 1000
+
+async def main():
+    directory = tempfile.mkdtemp()
+    pipeline = ImagePipeline()
+    photos = [os.path.join(directory, f"{i}.jpg") for i in range(PHOTOS)]
+    for i, path in enumerate(photos):
+        make_photo(path, i)
+    arguments = (pipeline.sizes, pipeline.formats, pipeline.ocr_edge, IMAGE_ENCODER_OPTIONS)
+
+    async def on_loop():
+        for path in photos:
+            render_variants(path, *arguments)
+            await asyncio.sleep(0)
+
+    async def in_pool():
+        loop = asyncio.get_running_loop()
+        executor = pipeline._pool()
+        await asyncio.gather(*(loop.run_in_executor(executor, render_variants, path, *arguments) for path in photos))
+
+    # Start the workers before timing, as a running server would have.
+    await asyncio.get_running_loop().run_in_executor(pipeline._pool(), render_variants, photos[0], *arguments)
+    print(f"{PHOTOS} photos of 4032x3024, {pipeline.max_workers} workers, formats {pipeline.formats}")
+    for name, work in (("on the loop", on_loop), ("process pool", in_pool)):
+        elapsed, stall = await worst_stall(work)
+        print(f"{name:>13}: {elapsed:8.1f} ms total  {elapsed / PHOTOS:7.1f} ms/photo  worst loop stall {stall:8.1f} ms")
+    await pipeline.stop()
+
+    variants = render_variants(photos[0], *arguments)
+    original = os.path.getsize(photos[0])
+    print(f"page of {PAGE_SIZE} image notes:")
+    print(f"{'original jpg':>13}: {original * PAGE_SIZE / 1024:9.0f} KiB")
+    for variant in variants:
+        if variant["name"] != "ocr":
+            label = f"{variant['name']} {variant['format']}"
+            print(f"{label:>13}: {variant['size'] * PAGE_SIZE / 1024:9.0f} KiB  "
+                  f"({variant['width']}x{variant['height']}, {original / variant['size']:.0f}x smaller)")
+    ocr = next(variant for variant in variants if variant["name"] == "ocr")
+    print(f"OCR upload: {ocr['size'] / 1024:.0f} KiB grayscale jpg instead of {original / 1024:.0f} KiB")
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
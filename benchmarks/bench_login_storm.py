@@ -0,0 +1,79 @@
+"""Latency of an unrelated endpoint during a burst of bcrypt logins.
+
+`/inline` verifies the password on the event loop, the way the login handler
+used to; `/pooled` goes through `password_hasher`. While a batch of logins is
+in flight, `/ping` is polled and its p50/p99 compared with an idle baseline.
+
+    python benchmarks/bench_login_storm.py [logins] [pings] [rounds]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import httpx
+from fastapi import FastAPI
+from services.hashing_service import PasswordHasher
+
+LOGINS = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+PINGS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+ROUNDS = int(sys.argv[3]) if len(sys.argv) > 3 else 12
+PING_INTERVAL = 0.01
+
+hasher = PasswordHasher(rounds=ROUNDS)
+PASSWORD_HASH = hasher.context.hash("password")
+
+app = FastAPI()
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+@app.post("/inline")
+async def inline_login():
+    assert hasher.context.verify("password", PASSWORD_HASH)
+
+@app.post("/pooled")
+async def pooled_login():
+    assert await hasher.verify("password", PASSWORD_HASH)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def poll(client, latencies):
+    # Latency is measured from when each ping was due, so time spent with the
+    # event loop blocked counts against it instead of silently delaying it.
+    start = time.perf_counter()
+    for i in range(PINGS):
+        due = start + i * PING_INTERVAL
+        await asyncio.sleep(max(0.0, due - time.perf_counter()))
+        await client.get("/ping")
+        latencies.append((time.perf_counter() - due) * 1000)
+
+async def run(login_path: str | None):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        latencies = []
+        logins = [client.post(login_path) for _ in range(LOGINS)] if login_path else []
+        start = time.perf_counter()
+        await asyncio.gather(poll(client, latencies), *logins)
+        return latencies, time.perf_counter() - start
+
+async def main():
+    print(f"{LOGINS} logins at bcrypt cost {ROUNDS}, {PINGS} pings, {hasher.max_workers} hashing threads, "
+          f"{os.cpu_count()} CPUs")
+    for name, path in (("idle", None), ("inline", "/inline"), ("pooled", "/pooled")):
+        latencies, elapsed = await run(path)
+        print(f"{name:>7}: ping p50 {percentile(latencies, 0.5):8.2f} ms  "
+              f"p99 {percentile(latencies, 0.99):8.2f} ms  ({elapsed:.2f} s)")
+    print(f"hasher stats: {hasher.stats()}")
+    hasher.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
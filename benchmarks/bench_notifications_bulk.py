@@ -0,0 +1,82 @@
+"""Marking read and deleting a user's notifications: per row vs set-based.
+
+The per-row runs mirror the old handlers, which loaded every notification
+into the session and changed or deleted them one at a time; the set-based
+runs are the single UPDATE/DELETE statements the bulk endpoints issue.
+
+    python benchmarks/bench_notifications_bulk.py [notifications]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_notifications.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import select, update, delete, insert
+from database import Base, engine, async_engine, AsyncSessionLocal
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.notifications import Notification, NotificationStatusEnum
+from models.user import User
+
+NOTIFICATIONS = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+engine.echo = False
+async_engine.echo = False
+
+
+def seed():
+    with engine.begin() as conn:
+        conn.execute(delete(Notification))
+        conn.execute(insert(Notification), [
+            {"user_id": 1, "message": f"Powiadomienie {i}", "status": NotificationStatusEnum.unread}
+            for i in range(NOTIFICATIONS)
+        ])
+
+async def read_per_row(db):
+    notifications = (await db.scalars(select(Notification).filter(Notification.user_id == 1))).all()
+    for notification in notifications:
+        notification.status = NotificationStatusEnum.read
+    await db.commit()
+
+async def read_set_based(db):
+    await db.execute(update(Notification).where(
+        Notification.user_id == 1, Notification.status == NotificationStatusEnum.unread
+    ).values(status=NotificationStatusEnum.read).execution_options(synchronize_session=False))
+    await db.commit()
+
+async def delete_per_row(db):
+    notifications = (await db.scalars(select(Notification).filter(Notification.user_id == 1))).all()
+    for notification in notifications:
+        await db.delete(notification)
+    await db.commit()
+
+async def delete_set_based(db):
+    await db.execute(delete(Notification).where(Notification.user_id == 1)
+                     .execution_options(synchronize_session=False))
+    await db.commit()
+
+async def main():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(user_id=1, username="user", first_name="Test", last_name="User",
+                                         email="user@example.com", password_hash="x"))
+    print(f"{NOTIFICATIONS} notifications of one user")
+    for name, operation in (("read per row", read_per_row), ("read set-based", read_set_based),
+                            ("delete per row", delete_per_row), ("delete set-based", delete_set_based)):
+        seed()
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await operation(db)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>16}: {elapsed * 1000:9.1f} ms")
+    await async_engine.dispose()
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
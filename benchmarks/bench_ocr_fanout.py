@@ -0,0 +1,75 @@
+"""Latency of OCR-ing a topic's images one by one vs the concurrent fan-out.
+
+A local fake OCR.space server answers every request after a fixed delay.
+The sequential run mirrors the old loop of blocking `requests.post` calls;
+the fan-out run uses `ocr_images` on the shared async client.
+
+    python benchmarks/bench_ocr_fanout.py [images] [latency_ms] [concurrency]
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import requests
+import services.AI_services as AI_services
+from services import http_client
+
+IMAGES = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+LATENCY_MS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+AI_services.OCR_CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+
+class FakeOCRHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(LATENCY_MS / 1000)
+        body = json.dumps({"ParsedResults": [{"ParsedText": "tekst"}]}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def sequential(images):
+    texts = []
+    for image_bytes in images:
+        response = requests.post(AI_services.OCR_API_URL, files={'file': ('image.png', image_bytes)},
+                                 data={'language': 'pol'}, headers={'apikey': 'helloworld'})
+        texts.append(response.json()['ParsedResults'][0]['ParsedText'])
+    return texts
+
+
+def fan_out(images):
+    return http_client.run(AI_services.ocr_images(images))
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOCRHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    AI_services.OCR_API_URL = f"http://127.0.0.1:{server.server_port}/parse/image"
+    images = [os.urandom(64 * 1024) for _ in range(IMAGES)]
+
+    print(f"{IMAGES} images, {LATENCY_MS} ms OCR latency, concurrency {AI_services.OCR_CONCURRENCY}")
+    for name, run in (("sequential", sequential), ("fan-out", fan_out)):
+        start = time.perf_counter()
+        texts = run(images)
+        elapsed = time.perf_counter() - start
+        assert texts == ["tekst"] * IMAGES
+        print(f"{name:>10}: {elapsed:6.2f} s")
+
+    http_client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Note search: SQLite FTS5 (the SQL backend) vs the in-process inverted index.
+
+Seeds notes with Polish-looking text, then times the same queries through
+both backends, and the index's cold start from the table vs from a snapshot.
+
+    python benchmarks/bench_search.py [notes] [queries]
+"""
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_search.db")
+SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_search.idx")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import insert
+from database import Base, engine, async_engine, AsyncSessionLocal
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.note import Note
+from models.user import User
+from services.note_search import SQLSearch, IndexSearch
+
+NOTES = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+QUERIES = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+SYLLABLES = ["ka", "ło", "wy", "pa", "rze", "mi", "sto", "go", "da", "nie", "cho", "li", "że", "tra", "wo", "su"]
+ENDINGS = ["a", "i", "e", "y", "ami", "ach", "om", "ów", ""]
+
+engine.echo = False
+async_engine.echo = False
+
+
+def vocabulary(random_, size: int = 5000) -> list[str]:
+    return ["".join(random_.choices(SYLLABLES, k=random_.randint(2, 4))) for _ in range(size)]
+
+def words(random_, stems: list[str], count: int) -> str:
+    # Zipf-like: a few stems are very common, most are rare.
+    return " ".join(stems[min(int(random_.paretovariate(1.0)) - 1, len(stems) - 1)] + random_.choice(ENDINGS)
+                    for _ in range(count))
+
+def seed():
+    random_ = random.Random(7)
+    stems = vocabulary(random_)
+    random_.shuffle(stems)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(user_id=1, username="user", first_name="Test", last_name="User",
+                                         email="user@example.com", password_hash="x"))
+        conn.execute(insert(Note), [
+            {"title": words(random_, stems, 3), "content": words(random_, stems, 60), "content_type": "text",
+             "topic_id": 1 + i % 50, "organization_id": 1 + i % 5, "user_id": 1}
+            for i in range(NOTES)
+        ])
+    return [words(random_, stems, random_.choice((1, 2))) for _ in range(QUERIES)]
+
+async def time_queries(backend, queries) -> list[float]:
+    timings = []
+    async with AsyncSessionLocal() as db:
+        for query in queries:
+            start = time.perf_counter()
+            await backend.search(db, query, 20, organization_id=1)
+            timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(name: str, timings: list[float]):
+    p95 = statistics.quantiles(timings, n=20)[-1]
+    print(f"{name:>14}: p50 {statistics.median(timings):7.2f} ms  p95 {p95:7.2f} ms")
+
+async def main():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    queries = seed()
+    if os.path.exists(SNAPSHOT_PATH):
+        os.remove(SNAPSHOT_PATH)
+    print(f"{NOTES} notes, {QUERIES} queries, top 20 of one organization")
+
+    report("sql (fts5)", await time_queries(SQLSearch(), queries))
+
+    index = IndexSearch(path=SNAPSHOT_PATH)
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await index.ensure_loaded(db)
+    built = time.perf_counter() - start
+    report("index", await time_queries(index, queries))
+
+    start = time.perf_counter()
+    await index.snapshot()
+    saved = time.perf_counter() - start
+    restarted = IndexSearch(path=SNAPSHOT_PATH)
+    start = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        await restarted.ensure_loaded(db)
+    loaded = time.perf_counter() - start
+    stats = restarted.stats()
+    print(f"index build from table: {built * 1000:8.1f} ms")
+    print(f"snapshot save:          {saved * 1000:8.1f} ms  ({os.path.getsize(SNAPSHOT_PATH) / 1024:.0f} KiB)")
+    print(f"start from snapshot:    {loaded * 1000:8.1f} ms  "
+          f"({stats['terms']} terms, {stats['postings']} postings, {stats['mapped_terms']} still mapped)")
+    report("index (mapped)", await time_queries(restarted, queries))
+
+    await async_engine.dispose()
+    Base.metadata.drop_all(engine)
+    os.remove(SNAPSHOT_PATH)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
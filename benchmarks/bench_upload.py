@@ -0,0 +1,63 @@
+"""Peak memory of storing concurrent uploads: read-all vs chunked copy.
+
+The read-all run mirrors the old handlers (`buffer.write(await image.read())`);
+the chunked run is `media_service.receive_upload`. Uploads are the spooled
+temporary files Starlette hands to the endpoint.
+
+    python benchmarks/bench_upload.py [uploads] [megabytes]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from fastapi import UploadFile
+from services.media_service import receive_upload
+
+UPLOADS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+MEGABYTES = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+
+def make_upload() -> UploadFile:
+    spooled = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    block = os.urandom(1024 * 1024)
+    for _ in range(MEGABYTES):
+        spooled.write(block)
+    spooled.seek(0)
+    return UploadFile(spooled, filename="photo.jpg")
+
+async def read_all(upload: UploadFile, directory: str, index: int):
+    with open(os.path.join(directory, f"{index}.jpg"), "wb") as buffer:
+        buffer.write(await upload.read())
+
+async def chunked(upload: UploadFile, directory: str, index: int):
+    file, _, _ = await receive_upload(upload, directory, max_bytes=(MEGABYTES + 1) * 1024 * 1024)
+    os.replace(file.name, os.path.join(directory, f"{index}.jpg"))
+
+async def run(store) -> tuple[float, float]:
+    uploads = [make_upload() for _ in range(UPLOADS)]
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        start = time.perf_counter()
+        await asyncio.gather(*(store(upload, directory, i) for i, upload in enumerate(uploads)))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    for upload in uploads:
+        upload.file.close()
+    return peak / 1024 / 1024, elapsed
+
+async def main():
+    print(f"{UPLOADS} concurrent uploads of {MEGABYTES} MiB")
+    for name, store in (("read-all", read_all), ("chunked", chunked)):
+        peak, elapsed = await run(store)
+        print(f"{name:>9}: peak {peak:8.1f} MiB  {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
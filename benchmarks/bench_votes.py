@@ -0,0 +1,106 @@
+"""Concurrent likes on one note: read-modify-write vs `apply_vote`.
+
+The read-modify-write run mirrors the old `give_like` handler: counters read
+into Python, incremented and committed in two transactions. Every voter is a
+distinct user, so the final like count should equal the number of votes;
+anything less is a lost update.
+
+    python benchmarks/bench_votes.py [voters] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), "edunotes_bench_votes.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+from sqlalchemy import select, delete, update, insert, NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from database import Base, engine
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.note import Note, NoteContentTypeEnum
+from models.note_like import NoteLike, LikeTypeEnum
+from models.organization import Organization
+from models.topic import Topic
+from models.channel import Channel
+from models.user import User
+from services.rank_service import get_rank_for_score
+from services.vote_service import apply_vote
+
+VOTERS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+CONCURRENCY = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+engine.echo = False
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}", poolclass=NullPool,
+                                   connect_args={"timeout": 30})
+AsyncSession = async_sessionmaker(bind=async_engine, expire_on_commit=False)
+
+
+async def legacy_vote(db, note_id: int, user_id: int):
+    existing = await db.scalar(select(NoteLike).filter_by(note_id=note_id, user_id=user_id))
+    if existing:
+        return
+    note = await db.scalar(select(Note).filter(Note.note_id == note_id))
+    note.likes += 1
+    db.add(NoteLike(note_id=note_id, user_id=user_id, type=LikeTypeEnum.like))
+    await db.commit()
+    author = await db.scalar(select(User).filter(User.user_id == note.user_id))
+    author.score += 1
+    author.rank = get_rank_for_score(author.score)
+    await db.commit()
+
+async def atomic_vote(db, note_id: int, user_id: int):
+    await apply_vote(db, note_id, user_id, LikeTypeEnum.like)
+
+
+def seed():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"user_id": i, "username": f"user{i}", "first_name": "Test", "last_name": "User",
+             "email": f"user{i}@example.com", "password_hash": "x", "score": 0} for i in range(1, VOTERS + 2)
+        ])
+        conn.execute(insert(Organization).values(organization_id=1, organization_name="org"))
+        conn.execute(insert(Channel).values(channel_id=1, channel_name="channel", organization_id=1))
+        conn.execute(insert(Topic).values(topic_id=1, topic_name="topic", channel_id=1, organization_id=1))
+        conn.execute(insert(Note).values(note_id=1, title="note", content_type=NoteContentTypeEnum.text,
+                                         content="tekst", topic_id=1, organization_id=1, user_id=1, likes=0))
+
+def reset():
+    with engine.begin() as conn:
+        conn.execute(delete(NoteLike))
+        conn.execute(update(Note).values(likes=0))
+        conn.execute(update(User).values(score=0))
+
+async def run(vote) -> float:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one(user_id: int):
+        async with semaphore, AsyncSession() as db:
+            await vote(db, 1, user_id)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(user_id) for user_id in range(2, VOTERS + 2)))
+    return time.perf_counter() - start
+
+async def main():
+    seed()
+    print(f"{VOTERS} likes on one note, {CONCURRENCY} concurrent")
+    for name, vote in (("read-modify-write", legacy_vote), ("atomic", atomic_vote)):
+        reset()
+        elapsed = await run(vote)
+        with engine.connect() as conn:
+            likes = conn.scalar(select(Note.likes).filter(Note.note_id == 1))
+            score = conn.scalar(select(User.score).filter(User.user_id == 1))
+        print(f"{name:>17}: {VOTERS / elapsed:7.1f} votes/s  likes {likes}/{VOTERS}  "
+              f"author score {score}/{VOTERS}  lost {VOTERS - likes}")
+    await async_engine.dispose()
+    Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+"""Query plans of the routers' hot filters against a seeded database.
+
+Creates the schema in the database given by EXPLAIN_DATABASE_URL, seeds it,
+and prints the plan of each router query, checking that it uses the index
+added for it. On Postgres the plans come from EXPLAIN ANALYZE, on SQLite
+from EXPLAIN QUERY PLAN. The tables are dropped again afterwards, so point
+it at a throwaway database.
+
+    EXPLAIN_DATABASE_URL=postgresql://... python benchmarks/explain_queries.py [notes]
+"""
+from datetime import datetime, timedelta, UTC
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DATABASE_URL = os.getenv("EXPLAIN_DATABASE_URL",
+                         f"sqlite:///{os.path.join(tempfile.gettempdir(), 'edunotes_explain.db')}")
+os.environ.setdefault("DATABASE_URL", DATABASE_URL)
+
+from sqlalchemy import create_engine, insert, select, text
+from database import Base
+from main import app  # noqa: F401 - registers every model on Base.metadata
+from models.ai_summary import AI_Summary
+from models.channel import Channel
+from models.deadline import Deadline, EventTypeEnum
+from models.note import Note, NoteContentTypeEnum
+from models.notifications import Notification, NotificationStatusEnum
+from models.organization import Organization
+from models.organization_invitations import OrganizationInvitation
+from models.organization_user import OrganizationUser
+from models.topic import Topic
+from models.user import User
+from schemas.responses import keyset_page, DEFAULT_PAGE_LIMIT
+
+NOTES = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+USERS = 500
+ORGANIZATIONS = 50
+CHANNELS_PER_ORGANIZATION = 4
+TOPICS_PER_CHANNEL = 10
+BATCH = 5000
+
+engine = create_engine(DATABASE_URL)
+
+
+def insert_rows(conn, model, rows):
+    for start in range(0, len(rows), BATCH):
+        conn.execute(insert(model), rows[start:start + BATCH])
+
+def seed(conn):
+    random.seed(0)
+    now = datetime.now(UTC)
+    insert_rows(conn, User, [
+        {"user_id": i, "username": f"user{i}", "first_name": "Test", "last_name": "User",
+         "email": f"user{i}@example.com", "password_hash": "x"} for i in range(1, USERS + 1)
+    ])
+    insert_rows(conn, Organization, [
+        {"organization_id": i, "organization_name": f"org{i}"} for i in range(1, ORGANIZATIONS + 1)
+    ])
+    insert_rows(conn, OrganizationUser, [
+        {"organization_id": organization_id, "user_id": user_id}
+        for user_id in range(1, USERS + 1)
+        for organization_id in random.sample(range(1, ORGANIZATIONS + 1), 3)
+    ])
+    channels = [{"channel_id": i, "channel_name": f"channel{i}", "organization_id": (i - 1) // CHANNELS_PER_ORGANIZATION + 1}
+                for i in range(1, ORGANIZATIONS * CHANNELS_PER_ORGANIZATION + 1)]
+    insert_rows(conn, Channel, channels)
+    topics = [{"topic_id": i, "topic_name": f"topic{i}", "channel_id": (i - 1) // TOPICS_PER_CHANNEL + 1,
+               "organization_id": channels[(i - 1) // TOPICS_PER_CHANNEL]["organization_id"]}
+              for i in range(1, len(channels) * TOPICS_PER_CHANNEL + 1)]
+    insert_rows(conn, Topic, topics)
+    insert_rows(conn, Note, [
+        {"note_id": i, "title": f"note{i}", "content_type": NoteContentTypeEnum.text, "content": "tekst",
+         "topic_id": topic["topic_id"], "organization_id": topic["organization_id"],
+         "user_id": random.randint(1, USERS), "likes": 0, "created_at": now - timedelta(seconds=i)}
+        for i, topic in ((i, random.choice(topics)) for i in range(1, NOTES + 1))
+    ])
+    insert_rows(conn, Notification, [
+        {"user_id": random.randint(1, USERS), "message": "Nowe powiadomienie",
+         "status": random.choice(list(NotificationStatusEnum))} for _ in range(NOTES // 2)
+    ])
+    insert_rows(conn, OrganizationInvitation, [
+        {"organization_id": random.randint(1, ORGANIZATIONS), "email": f"user{random.randint(1, USERS)}@example.com",
+         "invited_by_user_id": random.randint(1, USERS)} for _ in range(NOTES // 10)
+    ])
+    insert_rows(conn, Deadline, [
+        {"event_type": EventTypeEnum.exam, "event_name": "Egzamin", "organization_id": random.randint(1, ORGANIZATIONS),
+         "created_by": random.randint(1, USERS), "event_date": now + timedelta(days=random.randint(1, 90))}
+        for _ in range(NOTES // 10)
+    ])
+    insert_rows(conn, AI_Summary, [
+        {"topic_id": random.choice(topics)["topic_id"], "summary_text": "Podsumowanie"} for _ in range(NOTES // 10)
+    ])
+
+
+QUERIES = [
+    ("GET /notes/my", "ix_notes_user_id_created_at",
+     keyset_page(select(Note).filter(Note.user_id == 7), Note.created_at, Note.note_id, DEFAULT_PAGE_LIMIT, None)),
+    ("GET /notes/notes_in_topic", "ix_notes_topic_id_created_at",
+     keyset_page(select(Note).filter(Note.topic_id == 7), Note.created_at, Note.note_id, DEFAULT_PAGE_LIMIT, None)),
+    ("GET /notes/", "ix_notes_created_at_note_id",
+     keyset_page(select(Note), Note.created_at, Note.note_id, DEFAULT_PAGE_LIMIT, None)),
+    ("notes of an organization", "ix_notes_organization_id",
+     select(Note.note_id).filter(Note.organization_id == 7)),
+    ("GET /notifications/my", "ix_notifications_user_id_status",
+     select(Notification).filter(Notification.user_id == 7)),
+    ("unread notifications", "ix_notifications_user_id_status",
+     select(Notification).filter(Notification.user_id == 7, Notification.status == NotificationStatusEnum.unread)),
+    ("GET /organization_user/my", "ix_organization_users_user_id",
+     select(OrganizationUser).filter_by(user_id=7)),
+    ("GET /organizations/my", "ix_organization_users_user_id",
+     select(Organization).join(OrganizationUser).filter(OrganizationUser.user_id == 7)),
+    ("GET /organization_invitations/my", "ix_organization_invitations_email_status",
+     select(OrganizationInvitation).filter(OrganizationInvitation.email == "user7@example.com")),
+    ("GET /organization_invitations/sent", "ix_organization_invitations_invited_by_user_id",
+     select(OrganizationInvitation).filter(OrganizationInvitation.invited_by_user_id == 7)),
+    ("GET /deadlines/my", "ix_deadlines_organization_id_event_date",
+     select(Deadline).filter(Deadline.organization_id.in_([3, 7, 11]))),
+    ("GET /topics/", "ix_topics_channel_id",
+     select(Topic).filter(Topic.channel_id == 7)),
+    ("GET /channels/", "ix_channels_organization_id",
+     select(Channel).filter(Channel.organization_id == 7)),
+    ("latest summary of a topic", "ix_ai_summary_topic_id_created_at",
+     select(AI_Summary).filter(AI_Summary.topic_id == 7).order_by(AI_Summary.created_at.desc()).limit(1)),
+]
+
+
+def explain(conn, statement) -> str:
+    sql = str(statement.compile(conn, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        rows = conn.execute(text(f"EXPLAIN (ANALYZE, BUFFERS) {sql}")).all()
+        return "\n".join(row[0] for row in rows)
+    rows = conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return "\n".join(row[-1] for row in rows)
+
+
+def main():
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    try:
+        with engine.begin() as conn:
+            seed(conn)
+            conn.execute(text("ANALYZE"))
+        missing = []
+        with engine.connect() as conn:
+            print(f"{engine.dialect.name}, {NOTES} notes")
+            for name, index, statement in QUERIES:
+                plan = explain(conn, statement)
+                used = index in plan
+                if not used:
+                    missing.append(name)
+                print(f"\n== {name} ({'uses' if used else 'MISSING'} {index})")
+                print(plan)
+    finally:
+        Base.metadata.drop_all(engine)
+    if missing:
+        print(f"\n{len(missing)} queries don't use their index: {', '.join(missing)}")
+        sys.exit(1)
+    print(f"\nAll {len(QUERIES)} queries use their index.")
+
+
+if __name__ == "__main__":
+    main()
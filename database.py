@@ -1,5 +1,7 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker, declarative_base, Session
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from dotenv import load_dotenv
 from fastapi import Depends
 from typing import Annotated
@@ -7,10 +9,30 @@ import os
 
 load_dotenv()
 
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def get_async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
 engine = create_engine(os.getenv("DATABASE_URL"), echo=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+async_engine = create_async_engine(get_async_database_url(os.getenv("DATABASE_URL")), echo=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+def dialect_insert(db, model):
+    """INSERT construct of the session's dialect, which supports ON CONFLICT
+    and RETURNING on both Postgres and SQLite."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert(model)
+    return sqlite.insert(model)
+
 def get_db():
     db = SessionLocal()
     try:
@@ -18,4 +40,15 @@ def get_db():
     finally:
         db.close()
 
-db_dependency = Annotated[Session, Depends(get_db)]
\ No newline at end of file
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_session_factory():
+    """For work that outlives the request, like a streamed response body:
+    the get_db session is closed before such a body is sent."""
+    return SessionLocal
+
+db_dependency = Annotated[Session, Depends(get_db)]
+session_factory_dependency = Annotated[sessionmaker, Depends(get_session_factory)]
+async_db_dependency = Annotated[AsyncSession, Depends(get_async_db)]
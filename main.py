@@ -1,10 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from routers import (auth, users, organizations, channels, topics, notes, organization_user, organization_invitations,
                      ranking, notifications, deadlines, ai_summary)
+from services.ai_jobs import job_backend
+from services import http_client
+from services.hashing_service import password_hasher
+from services.vote_buffer import vote_buffer
+from services.leaderboard import leaderboard
+from services.notification_bus import notification_bus
+from services.note_search import note_search
+from services.image_pipeline import image_pipeline
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_backend.recover()
+    vote_buffer.start()
+    await leaderboard.start()
+    await notification_bus.start()
+    await note_search.start()
+    await image_pipeline.start()
+    yield
+    await image_pipeline.stop()
+    await note_search.stop()
+    await notification_bus.stop()
+    await leaderboard.stop()
+    await vote_buffer.stop()
+    job_backend.shutdown()
+    http_client.close()
+    password_hasher.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:3000",
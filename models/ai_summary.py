@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, Index, func
 from sqlalchemy.orm import relationship
 
 class AI_Summary(Base):
@@ -8,7 +8,11 @@ class AI_Summary(Base):
     summary_id = Column(Integer, primary_key=True)
     topic_id = Column(Integer, ForeignKey("topics.topic_id"), nullable=False)
     summary_text = Column(String, nullable=False)
+    covered_notes = Column(JSON, nullable=True)  # {note_id: version} the summary was built from
+    timings = Column(JSON, nullable=True)  # per-stage durations of the last generation, in ms
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
-    topic = relationship("Topic", back_populates="ai_summaries")
\ No newline at end of file
+    topic = relationship("Topic", back_populates="ai_summaries")
+
+    __table_args__ = (Index("ix_ai_summary_topic_id_created_at", "topic_id", "created_at"),)
\ No newline at end of file
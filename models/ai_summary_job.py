@@ -0,0 +1,24 @@
+from database import Base
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, func
+from sqlalchemy.orm import relationship
+import enum
+
+class JobStatusEnum(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+class AISummaryJob(Base):
+    __tablename__ = "ai_summary_jobs"
+
+    job_id = Column(Integer, primary_key=True)
+    topic_id = Column(Integer, ForeignKey("topics.topic_id", ondelete="CASCADE"), nullable=False)
+    status = Column(Enum(JobStatusEnum), default=JobStatusEnum.queued, nullable=False)
+    summary_id = Column(Integer, ForeignKey("ai_summary.summary_id", ondelete="SET NULL"), nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    topic = relationship("Topic")
+    summary = relationship("AI_Summary")
@@ -0,0 +1,13 @@
+from database import Base
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+
+class AISummaryLease(Base):
+    """Marks an in-flight summary of a topic's current note set; concurrent
+    requests for the same topic and notes join `job_id` instead of starting
+    their own."""
+    __tablename__ = "ai_summary_leases"
+
+    topic_id = Column(Integer, ForeignKey("topics.topic_id", ondelete="CASCADE"), primary_key=True)
+    fingerprint = Column(String(64), primary_key=True)
+    job_id = Column(Integer, ForeignKey("ai_summary_jobs.job_id", ondelete="CASCADE"), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Enum, Index
 from sqlalchemy.orm import relationship
 import enum
 
@@ -23,4 +23,6 @@ class Deadline(Base):
     organization = relationship("Organization", back_populates="deadlines")
     creator = relationship("User")
 
+    __table_args__ = (Index("ix_deadlines_organization_id_event_date", "organization_id", "event_date"),)
+
 
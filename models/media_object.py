@@ -0,0 +1,25 @@
+from database import Base
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, JSON, func
+
+class MediaObject(Base):
+    """One stored file, shared by every note image and avatar with the same
+    bytes; the file is removed when `ref_count` drops to zero."""
+    __tablename__ = "media_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)  # relative to the app root, e.g. media/objects/ab/cd/abcd….png
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    # Derivatives from the image pipeline: None until rendered, [] when the
+    # file is not an image Pillow can read.
+    variants = Column(JSON, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    def served_variants(self) -> list[dict]:
+        """Derivatives for clients, smallest first; the OCR input is internal."""
+        return [
+            {"name": variant["name"], "format": variant["format"], "width": variant["width"],
+             "height": variant["height"], "size": variant["size"], "url": "/" + variant["path"].replace("\\", "/")}
+            for variant in sorted(self.variants or [], key=lambda variant: (variant["width"], variant["size"]))
+            if variant["name"] != "ocr"
+        ]
@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Index, DDL, event, func, inspect
 from sqlalchemy.orm import relationship
 import enum
 
@@ -15,10 +15,13 @@ class Note(Base):
     content_type = Column(Enum(NoteContentTypeEnum), nullable=False)
     content = Column(Text, nullable=True)  # for text content
     image_url = Column(String, nullable=True)  # for images
+    media_hash = Column(String(64), ForeignKey("media_objects.sha256"), nullable=True)  # stored image
+    ocr_text = Column(Text, nullable=True)  # text read from the image, for search
+    search_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped when searched text changes
     topic_id = Column(Integer, ForeignKey("topics.topic_id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
     likes = Column(Integer, default=0)  # Number of likes
-    organization_id = Column(Integer, ForeignKey("organizations.organization_id", ondelete="CASCADE"), nullable=False)
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -26,3 +29,77 @@ class Note(Base):
     user = relationship("User", back_populates="notes")
     organization = relationship("Organization", back_populates="notes")
     note_likes = relationship("NoteLike", back_populates="note", cascade="all, delete-orphan")
+    # Joined so the variant URLs are there for every response, also on async sessions.
+    media = relationship("MediaObject", lazy="joined")
+
+    @property
+    def image_variants(self) -> list[dict]:
+        return self.media.served_variants() if self.media else []
+
+    # Match the keyset pagination order (created_at, note_id) of the note lists.
+    __table_args__ = (
+        Index("ix_notes_topic_id_created_at", "topic_id", "created_at", "note_id"),
+        Index("ix_notes_user_id_created_at", "user_id", "created_at", "note_id"),
+        Index("ix_notes_created_at_note_id", "created_at", "note_id"),
+    )
+
+
+SEARCHED_COLUMNS = ("title", "content", "ocr_text")
+
+def bump_search_version(mapper, connection, note):
+    """Lets the in-process search index spot notes edited while it was not
+    listening; Core UPDATEs of these columns bump search_version themselves."""
+    state = inspect(note)
+    if any(state.attrs[name].history.has_changes() for name in SEARCHED_COLUMNS):
+        note.search_version = Note.search_version + 1
+
+event.listen(Note, "before_update", bump_search_version)
+
+
+# Full-text search index. It is not a mapped column because each dialect
+# builds it differently: Postgres keeps a generated tsvector column with a GIN
+# index, SQLite an FTS5 table kept in sync by triggers.
+#
+# Postgres ships no Polish configuration; until a Polish dictionary is
+# installed and mapped into it, "polish" is a copy of "simple" (no stemming).
+SEARCH_CONFIG = "polish"
+
+POSTGRES_SEARCH_DDL = [
+    f"""DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{SEARCH_CONFIG}') THEN
+            CREATE TEXT SEARCH CONFIGURATION {SEARCH_CONFIG} (COPY = simple);
+        END IF;
+    END $$""",
+    f"""ALTER TABLE notes ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, coalesce(content, '') || ' ' || coalesce(ocr_text, '')), 'B')
+    ) STORED""",
+    "CREATE INDEX ix_notes_search_vector ON notes USING gin (search_vector)",
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE notes_fts USING fts5(
+        title, content, ocr_text, content='notes', content_rowid='note_id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, title, content, ocr_text)
+        VALUES (new.note_id, new.title, new.content, new.ocr_text);
+    END""",
+    """CREATE TRIGGER notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, ocr_text)
+        VALUES ('delete', old.note_id, old.title, old.content, old.ocr_text);
+    END""",
+    """CREATE TRIGGER notes_fts_update AFTER UPDATE OF title, content, ocr_text ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, title, content, ocr_text)
+        VALUES ('delete', old.note_id, old.title, old.content, old.ocr_text);
+        INSERT INTO notes_fts(rowid, title, content, ocr_text)
+        VALUES (new.note_id, new.title, new.content, new.ocr_text);
+    END""",
+]
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(Note.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(Note.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+event.listen(Note.__table__, "after_drop", DDL("DROP TABLE IF EXISTS notes_fts").execute_if(dialect="sqlite"))
@@ -1,7 +1,7 @@
 import enum
 
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Enum
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func, Enum, Index
 from sqlalchemy.orm import relationship
 
 class NotificationStatusEnum(str, enum.Enum):
@@ -18,3 +18,5 @@ class Notification(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="notifications")
+
+    __table_args__ = (Index("ix_notifications_user_id_status", "user_id", "status"),)
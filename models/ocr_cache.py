@@ -0,0 +1,9 @@
+from database import Base
+from sqlalchemy import Column, String, Text, DateTime, func
+
+class OCRCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+
+    content_hash = Column(String(64), primary_key=True)  # SHA-256 of the image bytes
+    text = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
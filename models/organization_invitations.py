@@ -1,5 +1,5 @@
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Index, func
 from sqlalchemy.orm import relationship
 import enum
 
@@ -22,10 +22,12 @@ class OrganizationInvitation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     role = Column(Enum(InvitedUserRoleEnum), default=InvitedUserRoleEnum.user, nullable=False)
     status = Column(Enum(StatusEnum), default=StatusEnum.pending, nullable=False)
-    invited_by_user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    invited_by_user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False, index=True)
 
     organization = relationship("Organization", back_populates="invitations")
     invited_by_user = relationship("User", back_populates="invitations_sent")
 
+    __table_args__ = (Index("ix_organization_invitations_email_status", "email", "status"),)
+
 
 
@@ -0,0 +1,14 @@
+from database import Base
+from sqlalchemy import Column, Integer, ForeignKey, Date
+
+
+class OrganizationScoreBucket(Base):
+    """Score an author earned in an organization on one day, rolled up from
+    vote_events as votes come in. The primary key leads with
+    (organization_id, day) so windowed rankings read a contiguous range."""
+    __tablename__ = "organization_score_buckets"
+
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    score = Column(Integer, nullable=False, default=0)
@@ -1,6 +1,6 @@
 from datetime import datetime
 from database import Base
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Index, func
 from sqlalchemy.orm import relationship
 import enum
 
@@ -19,4 +19,8 @@ class OrganizationUser(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     organization = relationship("Organization", back_populates="users")
-    user = relationship("User", back_populates="organizations")
\ No newline at end of file
+    user = relationship("User", back_populates="organizations")
+
+    # The primary key leads with organization_id; lookups by user need their
+    # own index, covering the role so membership checks stay index-only.
+    __table_args__ = (Index("ix_organization_users_user_id", "user_id", postgresql_include=["role"]),)
\ No newline at end of file
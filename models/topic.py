@@ -8,7 +8,7 @@ class Topic(Base):
 
     topic_id = Column(Integer, primary_key=True)
     topic_name = Column(String, nullable=False)
-    channel_id = Column(Integer, ForeignKey("channels.channel_id"), nullable=False)
+    channel_id = Column(Integer, ForeignKey("channels.channel_id"), nullable=False, index=True)
     organization_id = Column(Integer, ForeignKey("organizations.organization_id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, func, Enum
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, func, Enum
 from sqlalchemy.orm import relationship
 from models.organization_invitations import OrganizationInvitation
 from database import Base
@@ -19,10 +19,12 @@ class User(Base):
     user_id = Column(Integer, primary_key=True)
     username = Column(String, nullable=False, unique=True)
     avatar_url = Column(String, nullable=True)
+    avatar_hash = Column(String(64), ForeignKey("media_objects.sha256"), nullable=True)
     first_name = Column(String, nullable=False)
     last_name = Column(String, nullable=False)
     email = Column(String, nullable=False, unique=True)
     password_hash = Column(String, nullable=False)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped to revoke issued tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     score = Column(Integer, default=0)
@@ -33,3 +35,8 @@ class User(Base):
     note_likes = relationship("NoteLike", cascade="all, delete-orphan")
     organizations = relationship("OrganizationUser", back_populates="user", cascade="all, delete-orphan")
     notifications = relationship("Notification", back_populates="user", cascade="all, delete-orphan")
+    avatar = relationship("MediaObject", lazy="joined")
+
+    @property
+    def avatar_variants(self) -> list[dict]:
+        return self.avatar.served_variants() if self.avatar else []
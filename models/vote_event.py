@@ -0,0 +1,16 @@
+from database import Base
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, Index, func
+
+
+class VoteEvent(Base):
+    __tablename__ = "vote_events"
+
+    event_id = Column(Integer, primary_key=True)
+    voter_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    author_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), nullable=False)
+    note_id = Column(Integer, ForeignKey("notes.note_id", ondelete="SET NULL"), nullable=True)
+    organization_id = Column(Integer, ForeignKey("organizations.organization_id", ondelete="CASCADE"), nullable=False)
+    delta = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    __table_args__ = (Index("ix_vote_events_organization_id_created_at", "organization_id", "created_at"),)
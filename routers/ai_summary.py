@@ -1,15 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from services.AI_services import summarize_notes_with_deepseek
-from database import db_dependency
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Annotated
+from services.AI_services import summarize_topic, prepare_topic_summary, stream_deepseek_completion, SummaryError
+from services.metrics import LatencyStats
+from services.ai_jobs import JobBackend, get_job_backend, enqueue_summary_job
+from services.ocr_cache import ocr_cache
+from database import db_dependency, session_factory_dependency
 from models.ai_summary import AI_Summary
-from schemas.ai_summary import ReadAISummary
+from models.ai_summary_job import AISummaryJob
+from models.topic import Topic
+from schemas.ai_summary import ReadAISummary, ReadAISummaryJob
 from schemas.responses import StandardResponse
+import json
+import time
 
 router = APIRouter(
     prefix="/ai_summary",
     tags=["AI Summary"],
 )
 
+stream_ttft = LatencyStats()
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def save_summary(db, topic_id: int, summary_text: str, covered_notes: dict, timings: dict):
+    summary = AI_Summary(topic_id=topic_id, summary_text=summary_text, covered_notes=covered_notes, timings=timings)
+    db.add(summary)
+    db.commit()
+    db.refresh(summary)
+    return summary
+
 @router.get("/", response_model=StandardResponse[list[ReadAISummary]])
 async def get_ai_summary(db: db_dependency):
     summaries = db.query(AI_Summary).all()
@@ -21,35 +43,117 @@ async def get_ai_summary(db: db_dependency):
         data=summaries
     )
 
-@router.post("/", response_model=StandardResponse[ReadAISummary])
-async def create_ai_summary(db: db_dependency, topic_id: int):
-    summary_text = summarize_notes_with_deepseek(topic_id, db)
-    if not summary_text:
-        raise HTTPException(status_code=400, detail="Failed to generate summary")
+@router.post("/", status_code=status.HTTP_202_ACCEPTED, response_model=StandardResponse[ReadAISummaryJob])
+async def create_ai_summary(db: db_dependency, topic_id: int,
+                            job_backend: Annotated[JobBackend, Depends(get_job_backend)]):
+    topic = db.query(Topic).filter(Topic.topic_id == topic_id).first()
+    if not topic:
+        raise HTTPException(status_code=404, detail="Topic not found")
 
-    new_summary = AI_Summary(topic_id=topic_id, summary_text=summary_text)
-    db.add(new_summary)
-    db.commit()
-    db.refresh(new_summary)
+    job, created = enqueue_summary_job(topic_id, db)
+    if not created:
+        return StandardResponse(
+            success=True,
+            message="AI Summary job already in progress",
+            data=job
+        )
+    job_backend.submit(job.job_id)
+
+    return StandardResponse(
+        success=True,
+        message="AI Summary job queued successfully",
+        data=job
+    )
+
+@router.get("/jobs/{job_id}", response_model=StandardResponse[ReadAISummaryJob])
+async def get_ai_summary_job(job_id: int, db: db_dependency):
+    job = db.query(AISummaryJob).filter(AISummaryJob.job_id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="AI Summary job not found")
+    return StandardResponse(
+        success=True,
+        message="AI Summary job retrieved successfully",
+        data=job
+    )
+
+def save_new_summary(session_factory, topic_id: int, summary_text: str, covered_notes: dict, timings: dict):
+    with session_factory() as db:
+        return save_summary(db, topic_id, summary_text, covered_notes, timings)
+
+@router.get("/stream")
+async def stream_ai_summary(topic_id: int, session_factory: session_factory_dependency):
+    # The body is streamed after request dependencies are torn down, so this
+    # endpoint opens its own sessions instead of using db_dependency.
+    start = time.perf_counter()
+    with session_factory() as db:
+        topic = db.query(Topic).filter(Topic.topic_id == topic_id).first()
+        if not topic:
+            raise HTTPException(status_code=404, detail="Topic not found")
+        try:
+            # Condensing or map-reducing many notes calls DeepSeek before the stream starts.
+            result = await run_in_threadpool(prepare_topic_summary, topic_id, db)
+        except SummaryError:
+            raise HTTPException(status_code=400, detail="Failed to generate summary")
+
+    async def event_stream():
+        parts = []
+        if result.prompt is None:
+            parts.append(result.text)
+            yield sse_event("token", {"text": result.text})
+        else:
+            try:
+                async for delta in stream_deepseek_completion(result.prompt):
+                    if not parts:
+                        ttft = (time.perf_counter() - start) * 1000
+                        stream_ttft.observe(ttft)
+                        result.timings["ttft_ms"] = round(ttft, 1)
+                    parts.append(delta)
+                    yield sse_event("token", {"text": delta})
+            except SummaryError as e:
+                yield sse_event("error", {"detail": str(e)})
+                return
+        result.timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        summary = await run_in_threadpool(save_new_summary, session_factory, topic_id, "".join(parts),
+                                          result.covered_notes, result.timings)
+        yield sse_event("done", {"summary_id": summary.summary_id, "ttft_ms": result.timings.get("ttft_ms")})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.get("/metrics", response_model=StandardResponse[dict])
+async def get_ai_summary_metrics():
+    return StandardResponse(
+        success=True,
+        message="AI Summary metrics retrieved successfully",
+        data={"stream_ttft": stream_ttft.snapshot()}
+    )
 
+@router.get("/ocr_cache", response_model=StandardResponse[dict])
+async def get_ocr_cache_stats():
     return StandardResponse(
         success=True,
-        message="AI Summary created successfully",
-        data=new_summary
+        message="OCR cache stats retrieved successfully",
+        data=ocr_cache.stats()
     )
 
 @router.put("/{summary_id}", response_model=StandardResponse[ReadAISummary])
-async def update_ai_summary(summary_id: int, topic_id: int, db: db_dependency):
+async def update_ai_summary(summary_id: int, topic_id: int, db: db_dependency, full_regeneration: bool = False):
     summary = db.query(AI_Summary).filter(AI_Summary.summary_id == summary_id).first()
     if not summary:
         raise HTTPException(status_code=404, detail="AI Summary not found")
 
-    summary_text = summarize_notes_with_deepseek(topic_id, db)
-    if not summary_text:
+    try:
+        # OCR and DeepSeek round trips block the calling thread.
+        result = await run_in_threadpool(summarize_topic, topic_id, db, None if full_regeneration else summary)
+    except SummaryError:
+        result = None
+    if not result or not result.text:
         raise HTTPException(status_code=400, detail="Failed to generate summary")
 
     summary.topic_id = topic_id
-    summary.summary_text = summary_text
+    summary.summary_text = result.text
+    summary.covered_notes = result.covered_notes
+    summary.timings = result.timings
     db.commit()
     db.refresh(summary)
 
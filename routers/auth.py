@@ -3,13 +3,16 @@ from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Annotated
 from starlette import status
-from database import db_dependency
+from database import async_db_dependency
 from models.user import User
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from schemas.auth import Token
 from schemas.user import CreateUserRequest, ReadUsersResponse
 from schemas.responses import StandardResponse
-from services.auth_serivce import authenticate_user, create_access_token, bcrypt_context
+from services.auth_serivce import authenticate_user, create_access_token
+from services.hashing_service import password_hasher
+from services.token_cache import token_cache
+from services.leaderboard import leaderboard
 
 
 router = APIRouter(
@@ -18,27 +21,28 @@ router = APIRouter(
 )
 
 @router.post("/register", status_code=status.HTTP_201_CREATED, response_model=StandardResponse[ReadUsersResponse])
-async def create_user(db: db_dependency,
+async def create_user(db: async_db_dependency,
                      create_user_request: CreateUserRequest):
     user_model = User(
         username=create_user_request.username,
         email=create_user_request.email,
-        password_hash=bcrypt_context.hash(create_user_request.password),
+        password_hash=await password_hasher.hash(create_user_request.password),
         first_name=create_user_request.first_name,
         last_name=create_user_request.last_name
     )
-    existing_user = db.query(User).filter(
+    existing_user = await db.scalar(select(User).filter(
         or_(User.username == create_user_request.username,
             User.email == create_user_request.email)
-    ).first()
+    ))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already exists"
         )
     db.add(user_model)
-    db.commit()
-    db.refresh(user_model)
+    await db.commit()
+    await db.refresh(user_model)
+    leaderboard.update(user_model.user_id, user_model.score, user_model.rank, user_model.username)
     return StandardResponse(
         success=True,
         message="User registered successfully",
@@ -46,13 +50,28 @@ async def create_user(db: db_dependency,
     )
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(db: db_dependency,
+async def login_for_access_token(db: async_db_dependency,
                                  form_data: Annotated[OAuth2PasswordRequestForm, Depends()]):
-    user = authenticate_user(form_data.username, form_data.password, db)
+    user = await authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="Could not validate credentials")
-    token = create_access_token(user.username, user.user_id, user.email, timedelta(minutes=30))
+    token = create_access_token(user.username, user.user_id, user.email, timedelta(minutes=30), user.token_version)
 
     return {"access_token": token, "token_type": "bearer"}
 
+@router.get("/hashing_stats", response_model=StandardResponse[dict])
+async def get_hashing_stats():
+    return StandardResponse(
+        success=True,
+        message="Password hashing stats retrieved successfully",
+        data=password_hasher.stats()
+    )
+
+@router.get("/token_cache", response_model=StandardResponse[dict])
+async def get_token_cache_stats():
+    return StandardResponse(
+        success=True,
+        message="Token cache stats retrieved successfully",
+        data=token_cache.stats()
+    )
@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Form
 from models.deadline import Deadline, EventTypeEnum
 from models.organization_user import OrganizationUser
 from models.user import User
 from database import db_dependency
 from services.auth_serivce import user_dependency
+from services.notification_fanout import notification_fanout
 from schemas.responses import StandardResponse
 from schemas.deadline import ReadDeadline, CreateDeadline, UpdateDeadline
 
@@ -52,7 +53,8 @@ async def read_deadline(deadline_id: int, db: db_dependency):
     )
 
 @router.post("/", response_model=StandardResponse[ReadDeadline])
-async def create_deadline(user: user_dependency,db: db_dependency, deadline: CreateDeadline = Form(...)):
+async def create_deadline(user: user_dependency,db: db_dependency, background_tasks: BackgroundTasks,
+                          deadline: CreateDeadline = Form(...)):
     new_deadline = Deadline(
         event_type=deadline.event_type,
         event_name=deadline.event_name,
@@ -64,6 +66,13 @@ async def create_deadline(user: user_dependency,db: db_dependency, deadline: Cre
     db.add(new_deadline)
     db.commit()
     db.refresh(new_deadline)
+    background_tasks.add_task(
+        notification_fanout.fan_out,
+        new_deadline.organization_id,
+        f"New {new_deadline.event_type.value} in your organization: {new_deadline.event_name}"
+        f" on {new_deadline.event_date:%Y-%m-%d}.",
+        exclude_user_id=user["user_id"]
+    )
     return StandardResponse(
         success=True,
         message="Deadline created successfully",
@@ -1,108 +1,137 @@
-from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, UploadFile, File, Form, Query
 from models.note import Note, NoteContentTypeEnum
-from models.user import User
-from models.note_like import NoteLike, LikeTypeEnum
-from database import db_dependency
+from models.note_like import LikeTypeEnum
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from database import async_db_dependency
 from schemas.note import ReadNoteResponse
-from schemas.responses import StandardResponse
-from services.rank_service import get_rank_for_score
-from uuid import uuid4
+from schemas.responses import (StandardResponse, PaginatedResponse, keyset_page, next_page_cursor,
+                               offset_from_cursor, next_offset_cursor, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT)
+from services.note_search import note_search
+from services.media_service import store_media, release_media, remove_media_file, NOTE_IMAGE_MAX_BYTES
+from services.image_pipeline import image_pipeline
+from services.vote_service import apply_vote
+from services.vote_buffer import vote_buffer
 from services.auth_serivce import user_dependency
-import os
 
 
 router = APIRouter(
     prefix="/notes",
     tags=["notes"],
 )
-@router.get("/my", response_model=StandardResponse[list[ReadNoteResponse]])
-async def read_my_notes(user: user_dependency, db: db_dependency):
-    notes = db.query(Note).filter(Note.user_id == user["user_id"]).all()
-    if not notes:
+
+async def paginate_notes(db, query, limit: int, cursor: str | None):
+    notes = (await db.scalars(keyset_page(query, Note.created_at, Note.note_id, limit, cursor))).all()
+    vote_buffer.merge_notes(notes)
+    return next_page_cursor(notes, "created_at", "note_id", limit)
+
+@router.get("/my", response_model=PaginatedResponse[ReadNoteResponse])
+async def read_my_notes(user: user_dependency, db: async_db_dependency,
+                        limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                        cursor: str | None = None):
+    query = select(Note).filter(Note.user_id == user["user_id"])
+    notes, next_cursor = await paginate_notes(db, query, limit, cursor)
+    if not notes and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notes found for this user")
-    return StandardResponse(
+    return PaginatedResponse(
         success=True,
         message="Your notes retrieved successfully",
-        data=notes
+        data=notes,
+        limit=limit,
+        next_cursor=next_cursor
     )
-@router.get("/notes_in_topic", response_model=StandardResponse[list[ReadNoteResponse]])
-async def read_notes_in_topic(topic_id: int, db: db_dependency):
-    notes = db.query(Note).filter(Note.topic_id == topic_id).all()
-    if not notes:
+@router.get("/notes_in_topic", response_model=PaginatedResponse[ReadNoteResponse])
+async def read_notes_in_topic(topic_id: int, db: async_db_dependency,
+                              limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                              cursor: str | None = None):
+    query = select(Note).filter(Note.topic_id == topic_id)
+    notes, next_cursor = await paginate_notes(db, query, limit, cursor)
+    if not notes and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notes found in this topic")
-    return StandardResponse(
+    return PaginatedResponse(
+        success=True,
+        message="Notes retrieved successfully",
+        data=notes,
+        limit=limit,
+        next_cursor=next_cursor
+    )
+
+@router.get("/search", response_model=PaginatedResponse[ReadNoteResponse])
+async def read_note_search(q: str = Query(..., min_length=1, max_length=200), db: async_db_dependency = None,
+                           organization_id: int | None = None, channel_id: int | None = None, topic_id: int | None = None,
+                           limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                           cursor: str | None = None):
+    offset = offset_from_cursor(cursor)
+    notes = await note_search.search(db, q, limit, offset, organization_id=organization_id,
+                                     channel_id=channel_id, topic_id=topic_id)
+    vote_buffer.merge_notes(notes)
+    notes, next_cursor = next_offset_cursor(notes, offset, limit)
+    if not notes and cursor is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notes match this search")
+    return PaginatedResponse(
         success=True,
         message="Notes retrieved successfully",
-        data=notes
+        data=notes,
+        limit=limit,
+        next_cursor=next_cursor
+    )
+
+@router.get("/search_stats", response_model=StandardResponse[dict])
+async def get_search_stats():
+    return StandardResponse(
+        success=True,
+        message="Search stats retrieved successfully",
+        data=note_search.stats()
+    )
+
+@router.get("/image_stats", response_model=StandardResponse[dict])
+async def get_image_stats():
+    return StandardResponse(
+        success=True,
+        message="Image pipeline stats retrieved successfully",
+        data=image_pipeline.stats()
     )
 
 @router.post("/give_like", response_model=StandardResponse[dict])
-async def give_like(note_id: int, user: user_dependency, db: db_dependency):
-    existing = db.query(NoteLike).filter_by(note_id=note_id, user_id=user["user_id"]).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="You have already like/disliked this note")
-    note = db.query(Note).filter(Note.note_id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note does not exist")
-    note.likes += 1
-    db.add(NoteLike(note_id=note_id, user_id=user["user_id"], type=LikeTypeEnum.like))
-    db.commit()
-    db.refresh(note)
-    author = db.query(User).filter(User.user_id == note.user_id).first()
-    author.score += 1
-    author.rank = get_rank_for_score(author.score)
-    db.commit()
-    db.refresh(author)
+async def give_like(note_id: int, user: user_dependency, db: async_db_dependency):
+    vote = await apply_vote(db, note_id, user["user_id"], LikeTypeEnum.like)
     return StandardResponse(
         success=True,
         message=f"Note has been liked",
-        data={"likes": note.likes, "author_score": author.score,
-              "author_rank": author.rank, "author_id": author.user_id,
-              "note_id": note.note_id}
+        data=vote
     )
 
 @router.post("/give_dislike", response_model=StandardResponse[dict])
-async def give_dislike(note_id: int, user: user_dependency, db: db_dependency):
-    existing = db.query(NoteLike).filter_by(note_id=note_id, user_id=user["user_id"]).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="You have already like/disliked this note")
-    note = db.query(Note).filter(Note.note_id == note_id).first()
-    if not note:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note does not exist")
-    note.likes -= 1
-    db.add(NoteLike(note_id=note_id, user_id=user["user_id"], type=LikeTypeEnum.dislike))
-    db.commit()
-    db.refresh(note)
-    author = db.query(User).filter(User.user_id == note.user_id).first()
-    author.score -= 1
-    author.rank = get_rank_for_score(author.score)
-    db.commit()
-    db.refresh(author)
+async def give_dislike(note_id: int, user: user_dependency, db: async_db_dependency):
+    vote = await apply_vote(db, note_id, user["user_id"], LikeTypeEnum.dislike)
     return StandardResponse(
         success=True,
         message=f"Note has been disliked",
-        data={"likes": note.likes, "author_score": author.score,
-              "author_rank": author.rank, "author_id": author.user_id,
-              "note_id": note.note_id}
+        data=vote
     )
 # CRUD
 
-@router.get("/", response_model=StandardResponse[list[ReadNoteResponse]])
-async def read_notes(db: db_dependency):
-    notes = db.query(Note).all()
-    if not notes:
+@router.get("/", response_model=PaginatedResponse[ReadNoteResponse])
+async def read_notes(db: async_db_dependency,
+                     limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                     cursor: str | None = None):
+    notes, next_cursor = await paginate_notes(db, select(Note), limit, cursor)
+    if not notes and cursor is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notes found")
-    return StandardResponse(
+    return PaginatedResponse(
         success=True,
         message="Notes retrieved successfully",
-        data=notes
+        data=notes,
+        limit=limit,
+        next_cursor=next_cursor
     )
 
 @router.get("/{note_id}", response_model=StandardResponse[ReadNoteResponse])
-async def read_note(db: db_dependency, note_id: int):
-    note = db.query(Note).filter_by(note_id=note_id).first()
+async def read_note(db: async_db_dependency, note_id: int):
+    note = await db.scalar(select(Note).filter_by(note_id=note_id))
     if not note:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notes found")
+    vote_buffer.merge_notes([note])
     return StandardResponse(
         success=True,
         message="Note retrieved successfully",
@@ -112,22 +141,23 @@ async def read_note(db: db_dependency, note_id: int):
 @router.post("/", response_model=StandardResponse[ReadNoteResponse])
 async def create_note(
     user: user_dependency,
+    background_tasks: BackgroundTasks,
     title: str = Form(...),
     topic_id: int = Form(...),
     organization_id: int = Form(...),
     content_type: NoteContentTypeEnum = Form(...),
     content: str | None = Form(None),
     image: UploadFile | None = File(None),
-    db: db_dependency = None
+    db: async_db_dependency = None
 ):
     image_url = None
+    media_hash = None
     if content_type == "image" and image:
-        filename = f"{uuid4()}_{image.filename}"
-        file_path = os.path.join("media", "note_imgs", filename)
-        with open(file_path, "wb") as buffer:
-            buffer.write(await image.read())
-        image_url = f"/media/note_imgs/{filename}"
+        stored = await store_media(db, image, NOTE_IMAGE_MAX_BYTES)
+        image_url = stored.url
+        media_hash = stored.sha256
         content = None
+        background_tasks.add_task(image_pipeline.process, stored.sha256)
     elif content_type == "text":
         image_url = None
 
@@ -138,11 +168,13 @@ async def create_note(
         user_id=user["user_id"],
         content_type=content_type,
         content=content,
-        image_url=image_url
+        image_url=image_url,
+        media_hash=media_hash
     )
     db.add(new_note)
-    db.commit()
-    db.refresh(new_note)
+    await db.commit()
+    await db.refresh(new_note)
+    note_search.note_saved(new_note)
     return StandardResponse(
         success=True,
         message="Note created successfully",
@@ -150,13 +182,20 @@ async def create_note(
     )
 
 @router.delete("/{note_id}", response_model=StandardResponse[ReadNoteResponse])
-async def delete_note(db: db_dependency, note_id: int):
-    note = db.query(Note).filter(Note.note_id == note_id).first()
+async def delete_note(db: async_db_dependency, note_id: int):
+    note = await db.scalar(
+        select(Note).options(selectinload(Note.note_likes)).filter(Note.note_id == note_id)
+    )
     if not note:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note not found")
 
-    db.delete(note)
-    db.commit()
+    media_hash = note.media_hash
+    await db.delete(note)
+    await db.flush()
+    path = await release_media(db, media_hash)
+    await db.commit()
+    await remove_media_file(db, media_hash, path)
+    note_search.note_deleted(note_id)
     return StandardResponse(
         success=True,
         message="Note deleted successfully",
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Annotated
 from services.auth_serivce import user_dependency
-from database import db_dependency
+from services.notification_bus import (notification_bus, notification_payload,
+                                       NOTIFICATION_HEARTBEAT_SECONDS)
+from services.unread_counter import unread_counter
+from services.notification_fanout import notification_fanout
+from database import async_db_dependency
+from sqlalchemy import select, update, delete
 from models.notifications import Notification, NotificationStatusEnum
 from schemas.notifications import ReadNotifications
-from schemas.responses import StandardResponse
+from schemas.responses import StandardResponse, MAX_PAGE_LIMIT
+from datetime import datetime
+import asyncio
+import json
 
 
 router = APIRouter(
@@ -12,8 +22,8 @@ router = APIRouter(
 )
 
 @router.get("/my", response_model=StandardResponse[list[ReadNotifications]])
-async def get_my_notifications(user: user_dependency, db: db_dependency):
-    notifications = db.query(Notification).filter(Notification.user_id == user["user_id"]).all()
+async def get_my_notifications(user: user_dependency, db: async_db_dependency):
+    notifications = (await db.scalars(select(Notification).filter(Notification.user_id == user["user_id"]))).all()
     if not notifications:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notifications found for this user")
     return StandardResponse(
@@ -22,19 +32,136 @@ async def get_my_notifications(user: user_dependency, db: db_dependency):
         data=notifications
     )
 
+@router.get("/unread_count", response_model=StandardResponse[dict])
+async def get_my_unread_count(user: user_dependency, db: async_db_dependency):
+    return StandardResponse(
+        success=True,
+        message="Unread notifications count retrieved successfully",
+        data={"unread_count": await unread_counter.get(db, user["user_id"])}
+    )
+
+@router.get("/fanout_stats", response_model=StandardResponse[dict])
+async def get_fanout_stats():
+    return StandardResponse(
+        success=True,
+        message="Notification fan-out stats retrieved successfully",
+        data=notification_fanout.stats()
+    )
+
+def sse_notification(payload: dict) -> str:
+    return f"id: {payload['notification_id']}\nevent: notification\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+async def notification_stream(user_id: int, db, last_event_id: int | None = None,
+                              heartbeat: float = NOTIFICATION_HEARTBEAT_SECONDS):
+    """SSE events of the user's new notifications.
+
+    The subscription is taken before the backlog after `last_event_id` is
+    read, so nothing created in between is missed; ids already sent are
+    skipped. The backlog is read in pages until it is exhausted: live events
+    have higher ids, so anything left unread would never be sent. A comment line goes out every `heartbeat` seconds of silence to
+    keep proxies from closing the connection."""
+    subscription = notification_bus.subscribe(user_id)
+    backlog = []
+    if last_event_id is not None:
+        try:
+            after = last_event_id
+            while True:
+                page = (await db.scalars(select(Notification).filter(
+                    Notification.user_id == user_id,
+                    Notification.notification_id > after
+                ).order_by(Notification.notification_id).limit(MAX_PAGE_LIMIT))).all()
+                backlog += page
+                if len(page) < MAX_PAGE_LIMIT:
+                    break
+                after = page[-1].notification_id
+        except BaseException:
+            notification_bus.unsubscribe(subscription)
+            raise
+
+    async def events():
+        last_id = last_event_id or 0
+        try:
+            for notification in backlog:
+                last_id = notification.notification_id
+                yield sse_notification(notification_payload(notification))
+            while True:
+                try:
+                    payload = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+                except TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                if payload["notification_id"] <= last_id:
+                    continue
+                last_id = payload["notification_id"]
+                yield sse_notification(payload)
+        finally:
+            notification_bus.unsubscribe(subscription)
+
+    return events()
+
+@router.get("/stream")
+async def stream_my_notifications(user: user_dependency, db: async_db_dependency,
+                                  last_event_id: Annotated[int | None, Header()] = None):
+    events = await notification_stream(user["user_id"], db, last_event_id)
+    return StreamingResponse(events, media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.put("/read", response_model=StandardResponse[dict])
+async def mark_my_notifications_as_read(user: user_dependency, db: async_db_dependency,
+                                        ids: Annotated[list[int] | None, Query()] = None,
+                                        older_than: datetime | None = None):
+    filters = [Notification.user_id == user["user_id"], Notification.status == NotificationStatusEnum.unread]
+    if ids is not None:
+        filters.append(Notification.notification_id.in_(ids))
+    if older_than is not None:
+        filters.append(Notification.created_at < older_than)
+    result = await db.execute(
+        update(Notification).where(*filters).values(status=NotificationStatusEnum.read)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    unread_counter.add(user["user_id"], -result.rowcount)
+    return StandardResponse(
+        success=True,
+        message="Notifications marked as read successfully",
+        data={"updated": result.rowcount}
+    )
+
+@router.delete("/batch", response_model=StandardResponse[dict])
+async def delete_my_notifications_batch(user: user_dependency, db: async_db_dependency,
+                                        ids: Annotated[list[int], Query()]):
+    result = await db.execute(
+        delete(Notification).where(
+            Notification.user_id == user["user_id"],
+            Notification.notification_id.in_(ids)
+        ).execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    if not result.rowcount:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notifications not found")
+    unread_counter.invalidate(user["user_id"])
+    return StandardResponse(
+        success=True,
+        message="Notifications deleted successfully",
+        data={"deleted": result.rowcount}
+    )
+
 @router.put('/{notification_id}/read', response_model=StandardResponse[ReadNotifications])
-async def mark_notification_as_read(notification_id: int, user: user_dependency, db: db_dependency):
-    notification = db.query(Notification).filter(
+async def mark_notification_as_read(notification_id: int, user: user_dependency, db: async_db_dependency):
+    notification = await db.scalar(select(Notification).filter(
         Notification.notification_id == notification_id,
         Notification.user_id == user["user_id"]
-    ).first()
+    ))
 
     if not notification:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found")
 
+    was_unread = notification.status == NotificationStatusEnum.unread
     notification.status = NotificationStatusEnum.read
-    db.commit()
-    db.refresh(notification)
+    await db.commit()
+    await db.refresh(notification)
+    if was_unread:
+        unread_counter.add(user["user_id"], -1)
     return StandardResponse(
         success=True,
         message="Notification marked as read successfully",
@@ -42,43 +169,50 @@ async def mark_notification_as_read(notification_id: int, user: user_dependency,
     )
 
 @router.delete("/{notification_id}", response_model=StandardResponse[ReadNotifications])
-async def delete_my_notification(notification_id: int, user: user_dependency, db: db_dependency):
-    notification = db.query(Notification).filter(
+async def delete_my_notification(notification_id: int, user: user_dependency, db: async_db_dependency):
+    notification = await db.scalar(select(Notification).filter(
         Notification.notification_id == notification_id,
         Notification.user_id == user["user_id"]
-    ).first()
+    ))
 
     if not notification:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found")
 
-    db.delete(notification)
-    db.commit()
+    await db.delete(notification)
+    await db.commit()
+    if notification.status == NotificationStatusEnum.unread:
+        unread_counter.add(user["user_id"], -1)
     return StandardResponse(
         success=True,
         message="Notification deleted successfully",
         data=notification
     )
 
-@router.delete("/", response_model=StandardResponse[list[ReadNotifications]])
-async def delete_all_my_notifications(user: user_dependency, db: db_dependency):
-    notifications = db.query(Notification).filter(Notification.user_id == user["user_id"]).all()
-    if not notifications:
+@router.delete("/", response_model=StandardResponse[dict])
+async def delete_all_my_notifications(user: user_dependency, db: async_db_dependency,
+                                      older_than: datetime | None = None):
+    filters = [Notification.user_id == user["user_id"]]
+    if older_than is not None:
+        filters.append(Notification.created_at < older_than)
+    result = await db.execute(delete(Notification).where(*filters).execution_options(synchronize_session=False))
+    await db.commit()
+    if not result.rowcount:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notifications found for this user")
-
-    for notification in notifications:
-        db.delete(notification)
-    db.commit()
+    if older_than is None:
+        unread_counter.set(user["user_id"], 0)
+    else:
+        unread_counter.invalidate(user["user_id"])
     return StandardResponse(
         success=True,
         message="All notifications deleted successfully",
-        data=notifications
+        data={"deleted": result.rowcount}
     )
 
 
 # CRUD
 @router.get("/", response_model=StandardResponse[list[ReadNotifications]])
-async def get_notifications(db: db_dependency):
-    notifications = db.query(Notification).all()
+async def get_notifications(db: async_db_dependency):
+    notifications = (await db.scalars(select(Notification))).all()
     if not notifications:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No notifications found")
     return StandardResponse(
@@ -88,8 +222,8 @@ async def get_notifications(db: db_dependency):
     )
 
 @router.get("/{notification_id}", response_model=StandardResponse[ReadNotifications])
-async def get_notification(notification_id: int, db: db_dependency):
-    notification = db.query(Notification).filter(Notification.notification_id == notification_id).first()
+async def get_notification(notification_id: int, db: async_db_dependency):
+    notification = await db.scalar(select(Notification).filter(Notification.notification_id == notification_id))
     if not notification:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Notification not found")
     return StandardResponse(
@@ -7,6 +7,8 @@ from database import db_dependency
 from schemas.organization_user import ReadOrganizationUserResponse
 from schemas.responses import StandardResponse
 from services.auth_serivce import user_dependency
+from services.notification_bus import notification_bus
+from services.unread_counter import unread_counter
 from models.user import User
 
 
@@ -112,6 +114,9 @@ async def remove_user_from_organization(
     notification = Notification(user_id=user_id, message=f"You have been removed from organization {organization.organization_name}.", status="unread")
     db.add(notification)
     db.commit()
+    db.refresh(notification)
+    notification_bus.publish(notification)
+    unread_counter.add(user_id, 1)
 
     return StandardResponse(
         success=True,
@@ -1,44 +1,94 @@
+from datetime import timedelta
 from models.user import User
-from schemas.responses import StandardResponse
-from fastapi import APIRouter, HTTPException, status
-from database import db_dependency
+from models.organization import Organization
+from schemas.responses import (StandardResponse, CountedPaginatedResponse, DEFAULT_PAGE_LIMIT, MAX_PAGE_LIMIT,
+                               offset_from_cursor, next_offset_cursor)
+from fastapi import APIRouter, HTTPException, Query, status
+from database import async_db_dependency
+from sqlalchemy import select
 from services.auth_serivce import user_dependency
-from services.rank_service import get_rank_for_score
+from services.vote_buffer import vote_buffer
+from services.leaderboard import leaderboard
+from services.organization_ranking import organization_ranking, parse_window, today
 
 router = APIRouter(
     prefix="/ranking",
     tags=["ranking"],
 )
+
+def score_entry(user: User) -> dict:
+    score, rank = vote_buffer.merge_score(user.user_id, user.score, user.rank)
+    return {"username": user.username, "score": score, "rank": rank.value}
+
 @router.get("/my", response_model=StandardResponse[dict])
-async def get_my_score(user: user_dependency, db: db_dependency):
-    user = db.query(User).filter(User.user_id == user["user_id"]).first()
+async def get_my_score(user: user_dependency, db: async_db_dependency):
+    user = await db.scalar(select(User).filter(User.user_id == user["user_id"]))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return StandardResponse(
         success=True,
         message="User score retrieved successfully",
-        data={"username": user.username, "score": user.score, "rank": user.rank.value}
+        data=score_entry(user)
     )
 
-@router.get("/", response_model=StandardResponse[list[dict]])
-async def get_all_users_score(db: db_dependency):
-    users = db.query(User).order_by(User.score.desc()).all()
-    if not users:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No users found")
+@router.get("/my/around", response_model=StandardResponse[list[dict]])
+async def get_my_position(user: user_dependency, db: async_db_dependency,
+                          neighbours: int = Query(5, ge=0, le=50)):
+    await leaderboard.ensure_loaded(db)
+    entries = leaderboard.around(user["user_id"], neighbours)
+    if entries is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return StandardResponse(
+        success=True,
+        message="User position retrieved successfully",
+        data=entries
+    )
+
+@router.get("/", response_model=CountedPaginatedResponse[dict])
+async def get_all_users_score(db: async_db_dependency,
+                              limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT),
+                              cursor: str | None = None):
+    """Users by score, one page at a time: follow next_cursor until it is
+    null. `total` counts every ranked user. Entries carry position and
+    user_id next to username, score and rank."""
+    await leaderboard.ensure_loaded(db)
+    offset = offset_from_cursor(cursor)
+    entries, next_cursor = next_offset_cursor(leaderboard.top(limit + 1, offset), offset, limit)
+    if not entries and cursor is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No users found")
+    return CountedPaginatedResponse(
         success=True,
         message="All users scores retrieved successfully",
-        data=[{"username": user.username, "score": user.score, "rank": user.rank.value} for user in users]
+        data=entries,
+        limit=limit,
+        next_cursor=next_cursor,
+        total=len(leaderboard)
+    )
+
+@router.get("/organization/{organization_id}", response_model=StandardResponse[list[dict]])
+async def get_organization_ranking(organization_id: int, db: async_db_dependency, window: str = "7d",
+                                   limit: int = Query(DEFAULT_PAGE_LIMIT, ge=1, le=MAX_PAGE_LIMIT)):
+    days = parse_window(window)
+    if not await db.scalar(select(Organization).filter(Organization.organization_id == organization_id)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Organization not found")
+    pending = vote_buffer.pending_organization_scores(organization_id, today() - timedelta(days=days - 1))
+    entries = await organization_ranking(db, organization_id, days, limit, pending)
+    if not entries:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No scores found in this window")
+    return StandardResponse(
+        success=True,
+        message="Organization ranking retrieved successfully",
+        data=entries
     )
 
 @router.get("/{user_id}", response_model=StandardResponse[dict])
-async def get_user_score(user_id: int, db: db_dependency):
-    user = db.query(User).filter(User.user_id == user_id).first()
+async def get_user_score(user_id: int, db: async_db_dependency):
+    user = await db.scalar(select(User).filter(User.user_id == user_id))
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return StandardResponse(
         success=True,
         message="User score retrieved successfully",
-        data={"username": user.username, "score": user.score, "rank": user.rank.value}
+        data=score_entry(user)
     )
 
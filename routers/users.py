@@ -1,31 +1,33 @@
-from fastapi import APIRouter, HTTPException, status, Form, Depends, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, Form, Depends, File, UploadFile
 from schemas.user import ReadUsersResponse, UpdateUserRequest
 from database import db_dependency
 from models.user import User
 from models.organization_invitations import OrganizationInvitation
-from passlib.context import CryptContext
-from uuid import uuid4
 from services.auth_serivce import user_dependency
+from services.hashing_service import password_hasher
+from services.token_cache import token_cache
+from services.leaderboard import leaderboard
+from services.media_service import store_media, release_media, remove_media_file, AVATAR_MAX_BYTES
+from services.image_pipeline import image_pipeline
 from schemas.responses import StandardResponse
-import os
 
 router = APIRouter(
     prefix="/users",
     tags=["users"],
 )
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 @router.put("/{user_id}/change_password")
 async def change_password(user: user_dependency, db: db_dependency,
                           old_password: str = Form(...), new_password: str = Form(...)):
     user = db.query(User).filter(User.user_id == user["user_id"]).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    if not bcrypt_context.verify(old_password, user.password_hash):
+    if not await password_hasher.verify(old_password, user.password_hash):
         raise HTTPException(status_code=400, detail="Old password is incorrect")
-    user.password_hash = bcrypt_context.hash(new_password)
+    user.password_hash = await password_hasher.hash(new_password)
+    user.token_version = User.token_version + 1
     db.commit()
+    token_cache.evict_user(user.user_id)
     db.refresh(user)
     return StandardResponse(
         success=True,
@@ -33,19 +35,22 @@ async def change_password(user: user_dependency, db: db_dependency,
     )
 
 @router.put("/{user_id}/avatar")
-async def update_user_avatar(db: db_dependency, user: user_dependency, file: UploadFile = File(...)):
+async def update_user_avatar(db: db_dependency, user: user_dependency, background_tasks: BackgroundTasks,
+                             file: UploadFile = File(...)):
     target_user = db.query(User).filter(User.user_id == user["user_id"]).first()
     if not target_user:
         raise HTTPException(status_code=404, detail="User not found")
     if user["user_id"] != target_user.user_id:
         raise HTTPException(status_code=403, detail="You can only update your own avatar")
-    ext = file.filename.split(".")[-1]
-    filename = f"{uuid4()}.{ext}"
-    file_path = os.path.join("media", "avatars", filename)
-    with open(file_path, "wb") as buffer:
-        buffer.write(await file.read())
-    target_user.avatar_url = f"/media/avatars/{filename}"
+    stored = await store_media(db, file, AVATAR_MAX_BYTES)
+    previous_hash = target_user.avatar_hash
+    target_user.avatar_url = stored.url
+    target_user.avatar_hash = stored.sha256
+    db.flush()
+    path = await release_media(db, previous_hash)
     db.commit()
+    await remove_media_file(db, previous_hash, path)
+    background_tasks.add_task(image_pipeline.process, stored.sha256)
     db.refresh(target_user)
     return StandardResponse(
         success=True,
@@ -85,8 +90,17 @@ async def delete_user(user: user_dependency, db: db_dependency):
     db.query(OrganizationInvitation).filter(
         OrganizationInvitation.invited_by_user_id == user["user_id"]
     ).delete()
+    avatar_hash = user_to_delete.avatar_hash
+    if user_to_delete.avatar is not None:
+        # Keep it as loaded for the response; remove_media_file may delete its row.
+        db.expunge(user_to_delete.avatar)
     db.delete(user_to_delete)
+    db.flush()
+    path = await release_media(db, avatar_hash)
     db.commit()
+    await remove_media_file(db, avatar_hash, path)
+    token_cache.evict_user(user["user_id"])
+    leaderboard.remove(user["user_id"])
     return StandardResponse(
         success=True,
         message=f"User deleted successfully",
@@ -110,9 +124,13 @@ async def update_user(
     if user_update.last_name is not None:
         user_to_update.last_name = user_update.last_name
     if user_update.password:
-        user_to_update.password_hash = bcrypt_context.hash(user_update.password)
+        user_to_update.password_hash = await password_hasher.hash(user_update.password)
+        user_to_update.token_version = User.token_version + 1
     db.commit()
+    if user_update.password:
+        token_cache.evict_user(user_to_update.user_id)
     db.refresh(user_to_update)
+    leaderboard.update(user_to_update.user_id, user_to_update.score, user_to_update.rank, user_to_update.username)
     return StandardResponse(
         success=True,
         message="User updated successfully",
@@ -1,10 +1,22 @@
 from pydantic import BaseModel
 from datetime import datetime
 import models.ai_summary
+from models.ai_summary_job import JobStatusEnum
 
 class ReadAISummary(BaseModel):
     summary_id: int
     topic_id: int
     summary_text: str
+    covered_notes: dict[str, str] | None = None
+    timings: dict[str, float] | None = None
+    created_at: datetime
+    updated_at: datetime | None = None
+
+class ReadAISummaryJob(BaseModel):
+    job_id: int
+    topic_id: int
+    status: JobStatusEnum
+    summary_id: int | None = None
+    error: str | None = None
     created_at: datetime
     updated_at: datetime | None = None
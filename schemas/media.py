@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+
+class MediaVariant(BaseModel):
+    name: str  # "thumb" or "medium"
+    format: str  # "avif" or "webp"
+    width: int
+    height: int
+    size: int  # bytes
+    url: str
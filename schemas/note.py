@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
+from schemas.media import MediaVariant
 
 class ReadNoteResponse(BaseModel):
     note_id: int
@@ -10,6 +11,7 @@ class ReadNoteResponse(BaseModel):
     content_type: str
     content: str | None = None
     image_url: str | None = None
+    image_variants: list[MediaVariant] = []
     likes: int
     created_at: datetime
     updated_at: datetime | None = None
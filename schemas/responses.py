@@ -1,9 +1,91 @@
 from typing import Generic, TypeVar, Optional
+from datetime import datetime
+from fastapi import HTTPException, status
 from pydantic import BaseModel
+from sqlalchemy import DateTime, and_, literal, or_
+from sqlalchemy.dialects import sqlite
+import base64
+import binascii
+import json
 
 T = TypeVar('T')
 
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 200
+
+# SQLite stores server_default timestamps without microseconds, so the cursor
+# value has to be bound in the same format for the keyset comparison to work.
+_cursor_datetime = DateTime(timezone=True).with_variant(sqlite.DATETIME(truncate_microseconds=True), "sqlite")
+
 class StandardResponse(BaseModel, Generic[T]):
     success: bool
     message: str
-    data: Optional[T] = None
\ No newline at end of file
+    data: Optional[T] = None
+
+class PaginatedResponse(BaseModel, Generic[T]):
+    success: bool
+    message: str
+    data: list[T] = []
+    limit: int
+    next_cursor: str | None = None
+
+class CountedPaginatedResponse(PaginatedResponse[T], Generic[T]):
+    total: int
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+def keyset_page(query, created_column, id_column, limit: int, cursor: str | None = None):
+    """Applies (created_at, id) keyset pagination to a query.
+
+    Returns the query limited to one page (plus one row used to detect whether
+    another page exists); pass the fetched rows to `next_page_cursor`.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        try:
+            last_created = datetime.fromisoformat(values["created_at"])
+            last_id = int(values["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+        last_created = literal(last_created, _cursor_datetime)
+        query = query.filter(or_(
+            created_column > last_created,
+            and_(created_column == last_created, id_column > last_id)
+        ))
+    return query.order_by(created_column, id_column).limit(limit + 1)
+
+def next_page_cursor(rows: list, created_attr: str, id_attr: str, limit: int) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor({
+        "created_at": getattr(last, created_attr).isoformat(),
+        "id": getattr(last, id_attr)
+    })
+
+def offset_from_cursor(cursor: str | None) -> int:
+    """Position encoded in the cursor of a ranked (not keyset-paginated) list."""
+    if not cursor:
+        return 0
+    offset = decode_cursor(cursor).get("offset")
+    if not isinstance(offset, int) or isinstance(offset, bool) or offset < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return offset
+
+def next_offset_cursor(rows: list, offset: int, limit: int) -> tuple[list, str | None]:
+    if len(rows) <= limit:
+        return rows, None
+    return rows[:limit], encode_cursor({"offset": offset + limit})
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from models.user import RankEnum
+from schemas.media import MediaVariant
 
 class CreateUserRequest(BaseModel):
     username: str
@@ -17,6 +18,7 @@ class ReadUsersResponse(BaseModel):
     last_name: str
     score: int
     avatar_url: str | None = None
+    avatar_variants: list[MediaVariant] = []
     rank: RankEnum
 
 class UpdateUserRequest(BaseModel):
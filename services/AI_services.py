@@ -1,79 +1,234 @@
-import requests
+import httpx
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 from models.note import Note
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from services import http_client
+from services.ocr_cache import ocr_cache, content_hash
+from services.note_search import note_search
+from services.image_variants import ocr_variant_path
 from urllib.parse import urlparse
+import asyncio
+import json
 import os
+import time
 
 load_dotenv()
 
+OCR_API_URL = os.getenv("OCR_API_URL", "https://api.ocr.space/parse/image")
+DEEPSEEK_API_URL = os.getenv("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions")
+AI_REQUEST_TIMEOUT = float(os.getenv("AI_REQUEST_TIMEOUT", "60"))
+OCR_TIMEOUT = float(os.getenv("OCR_TIMEOUT", "30"))
+OCR_CONCURRENCY = int(os.getenv("OCR_CONCURRENCY", "8"))
+OCR_MAX_RETRIES = int(os.getenv("OCR_MAX_RETRIES", "2"))
+OCR_RETRY_BACKOFF = float(os.getenv("OCR_RETRY_BACKOFF", "0.5"))
+AI_CHUNK_TOKENS = int(os.getenv("AI_CHUNK_TOKENS", "3000"))
+AI_MAP_PARALLELISM = int(os.getenv("AI_MAP_PARALLELISM", "4"))
+AI_TOKEN_BUDGET = int(os.getenv("AI_TOKEN_BUDGET", "60000"))
+AI_MAX_MAP_ROUNDS = int(os.getenv("AI_MAX_MAP_ROUNDS", "3"))
 
-def get_text_notes(topic_id: int, db):
-    notes = db.query(Note).filter_by(topic_id=topic_id, content_type='text').all()
-    return [note.content for note in notes]
+class SummaryError(Exception):
+    pass
 
-def get_image_notes(topic_id: int, db):
-    notes = db.query(Note).filter_by(topic_id=topic_id, content_type='image').all()
-    return [note.image_url for note in notes]
+class OCRError(Exception):
+    pass
 
-def ocr_space_image_file(image_url: str, key: str = 'helloworld'):
+async def fetch_image_bytes(image_url: str) -> bytes:
+    img_response = await http_client.get_client().get(image_url, timeout=10)
+    if img_response.status_code != 200:
+        raise OCRError(f"Błąd pobierania obrazu: {img_response.status_code}")
+    return img_response.content
+
+def load_image_bytes(image_url: str) -> bytes:
     if image_url.startswith('/'):
         local_path = f"./{image_url.lstrip('/')}"
         if not os.path.exists(local_path):
-            return f"Błąd: plik {local_path} nie istnieje."
+            raise OCRError(f"Błąd: plik {local_path} nie istnieje.")
         with open(local_path, "rb") as img_file:
-            files = {'file': ('image.png', img_file)}
-            payload = {'language': 'pol', 'isOverlayRequired': False}
-            headers = {'apikey': key}
-            response = requests.post('https://api.ocr.space/parse/image', files=files, data=payload, headers=headers)
-            result = response.json()
-            if result.get('ParsedResults'):
-                return result['ParsedResults'][0]['ParsedText']
-            else:
-                return f"Błąd OCR: {result.get('ErrorMessage', 'Unknown Error')}"
-    else:
-        img_response = requests.get(image_url, timeout=10)
-        if img_response.status_code != 200:
-            return f"Błąd pobierania obrazu: {img_response.status_code}"
-        files = {'file': ('image.png', img_response.content)}
-        payload = {'language': 'pol', 'isOverlayRequired': False}
-        headers = {'apikey': key}
-        response = requests.post('https://api.ocr.space/parse/image', files=files, data=payload, headers=headers)
+            return img_file.read()
+    return http_client.run(fetch_image_bytes(image_url))
+
+def load_ocr_image(image_url: str) -> tuple[str, bytes]:
+    """Cache key and bytes to send to OCR. Stored images send their
+    downscaled grayscale derivative once the image pipeline has made it,
+    still keyed by the SHA-256 of the original so cached texts stay valid."""
+    if image_url.startswith('/media/objects/'):
+        local_path = f"./{image_url.lstrip('/')}"
+        variant = ocr_variant_path(local_path)
+        if os.path.exists(variant):
+            with open(variant, "rb") as img_file:
+                return os.path.basename(os.path.splitext(local_path)[0]), img_file.read()
+    image_bytes = load_image_bytes(image_url)
+    return content_hash(image_bytes), image_bytes
+
+async def ocr_space_image_bytes(image_bytes: bytes, key: str = 'helloworld'):
+    files = {'file': ('image.png', image_bytes)}
+    payload = {'language': 'pol', 'isOverlayRequired': 'false'}
+    headers = {'apikey': key}
+    for attempt in range(max(OCR_MAX_RETRIES, 0) + 1):
+        if attempt:
+            await asyncio.sleep(OCR_RETRY_BACKOFF * 2 ** (attempt - 1))
+        try:
+            response = await http_client.get_client().post(OCR_API_URL, files=files, data=payload,
+                                                            headers=headers, timeout=OCR_TIMEOUT)
+        except httpx.TransportError as e:
+            error = OCRError(f"Błąd OCR: {e!r}")
+            continue
+        if response.status_code == 429 or response.status_code >= 500:
+            error = OCRError(f"Błąd OCR: {response.status_code}")
+            continue
         result = response.json()
         if result.get('ParsedResults'):
             return result['ParsedResults'][0]['ParsedText']
-        else:
-            return f"Błąd OCR: {result.get('ErrorMessage', 'Unknown Error')}"
+        raise OCRError(f"Błąd OCR: {result.get('ErrorMessage', 'Unknown Error')}")
+    raise error
+
+async def ocr_images(images: list[bytes]) -> list:
+    """OCRs images concurrently, at most OCR_CONCURRENCY at a time. Failed
+    images come back as their exception instead of a text."""
+    semaphore = asyncio.Semaphore(OCR_CONCURRENCY)
 
-def get_all_image_notes(topic_id: int, db):
-    image_urls = get_image_notes(topic_id, db)
-    list_of_text_notes = []
-    for url in image_urls:
+    async def ocr_one(image_bytes: bytes):
+        async with semaphore:
+            return await ocr_space_image_bytes(image_bytes)
+
+    return await asyncio.gather(*(ocr_one(image_bytes) for image_bytes in images), return_exceptions=True)
+
+def ocr_image_results(image_urls: list[str], db):
+    """Texts of the images, in order; failed images come back as an OCRError."""
+    list_of_text_notes = [None] * len(image_urls)
+    pending = {}
+    for i, url in enumerate(image_urls):
         try:
-            text = ocr_space_image_file(url)
-            if isinstance(text, str):
-                text = text.replace('\r', '').replace('\n', ' ')
-            list_of_text_notes.append(text)
+            key, image_bytes = load_ocr_image(url)
+        except OCRError as e:
+            list_of_text_notes[i] = e
+            continue
         except Exception as e:
-            list_of_text_notes.append(f"Błąd OCR: {e}")
+            list_of_text_notes[i] = OCRError(f"Błąd OCR: {e}")
+            continue
+        pending.setdefault(key, (image_bytes, []))[1].append(i)
+
+    missing = {}
+    for key, (image_bytes, indexes) in pending.items():
+        text = ocr_cache.get(db, key)
+        if text is None:
+            missing[key] = (image_bytes, indexes)
+            continue
+        for i in indexes:
+            list_of_text_notes[i] = text
+
+    results = http_client.run(ocr_images([image_bytes for image_bytes, _ in missing.values()]))
+    for (key, (_, indexes)), text in zip(missing.items(), results):
+        if not isinstance(text, Exception):
+            text = text.replace('\r', '').replace('\n', ' ')
+            ocr_cache.put(db, key, text)
+        elif not isinstance(text, OCRError):
+            text = OCRError(f"Błąd OCR: {text}")
+        for i in indexes:
+            list_of_text_notes[i] = text
     return list_of_text_notes
 
-def get_all_notes(topic_id: int, db):
-    text_notes = get_text_notes(topic_id, db)
-    image_notes = get_all_image_notes(topic_id, db)
-    return text_notes + image_notes
+def store_ocr_texts(db, notes, texts):
+    """Keeps the OCR text of image notes for full-text search. updated_at is
+    left alone: the note itself did not change, and summaries track it."""
+    for note, text in zip(notes, texts):
+        if not isinstance(text, OCRError) and note.ocr_text != text:
+            version = db.execute(update(Note).where(Note.note_id == note.note_id)
+                                 .values(ocr_text=text, search_version=Note.search_version + 1,
+                                         updated_at=Note.updated_at)
+                                 .returning(Note.search_version)
+                                 .execution_options(synchronize_session=False)).scalar()
+            set_committed_value(note, "ocr_text", text)
+            set_committed_value(note, "search_version", version)
+            note_search.note_saved(note)
 
-def summarize_notes_with_deepseek(topic_id: int, db):
-    notes = get_all_notes(topic_id, db)
-    if not notes:
-        return "Brak notatek do podsumowania."
-    prompt = (
+def get_topic_notes(topic_id: int, db):
+    return db.query(Note).filter_by(topic_id=topic_id).order_by(Note.note_id).all()
+
+def note_version(note) -> str:
+    return (note.updated_at or note.created_at).isoformat()
+
+def notes_fingerprint(notes) -> str:
+    """Identifies a topic's note set; two requests with the same fingerprint
+    would produce the same summary."""
+    versions = "\n".join(f"{note.note_id}:{note_version(note)}" for note in notes)
+    return content_hash(versions.encode())
+
+def notes_to_texts(notes, db):
+    image_notes = [note for note in notes if note.content_type == 'image']
+    results = ocr_image_results([note.image_url for note in image_notes], db)
+    store_ocr_texts(db, image_notes, results)
+    image_texts = iter(str(text) if isinstance(text, OCRError) else text for text in results)
+    return [next(image_texts) if note.content_type == 'image' else note.content for note in notes]
+
+def build_summary_prompt(notes):
+    return (
         "Oto lista notatek z danego tematu. Na ich podstawie wygeneruj krótkie podsumowanie najważniejszych informacji:\n\n"
         + "\n".join(f"- {note}" for note in notes)
         + "Pisz w języku polskim i nie używaj emotikonów. Najlepiej staraj się zamykać w paru zdaniach\n\n"
         + "Nie pisz nic poza podsumowaniem, nie pisz też, że to jest podsumowanie. "
     )
+
+def build_refine_prompt(previous_summary: str, notes):
+    return (
+        "Oto dotychczasowe podsumowanie tematu:\n\n" + previous_summary + "\n\n"
+        + "Od tego czasu w temacie pojawiły się nowe lub zmienione notatki:\n\n"
+        + "\n".join(f"- {note}" for note in notes)
+        + "\n\nZaktualizuj podsumowanie tak, aby uwzględniało te informacje. "
+        + "Pisz w języku polskim i nie używaj emotikonów. Najlepiej staraj się zamykać w paru zdaniach\n\n"
+        + "Nie pisz nic poza podsumowaniem, nie pisz też, że to jest podsumowanie. "
+    )
+
+def build_chunk_prompt(notes):
+    return (
+        "Oto fragment notatek z danego tematu. Wypisz zwięźle najważniejsze informacje, które zawierają:\n\n"
+        + "\n".join(f"- {note}" for note in notes)
+        + "\n\nPisz w języku polskim i nie używaj emotikonów. Nie pisz nic poza samymi informacjami. "
+    )
+
+def estimate_tokens(text) -> int:
+    # Rough estimate (about 4 characters per token); good enough for budgeting.
+    return len(str(text)) // 4 + 1
+
+def apply_token_budget(notes, budget: int):
+    """Keeps notes in order until the token budget runs out; the note that
+    crosses the budget is cut short and later ones are dropped."""
+    kept = []
+    for note in notes:
+        tokens = estimate_tokens(note)
+        if tokens > budget:
+            if budget > 1:
+                kept.append(str(note)[:(budget - 1) * 4])
+            break
+        kept.append(note)
+        budget -= tokens
+    return kept
+
+def chunk_notes(notes, chunk_tokens: int):
+    chunks, current, current_tokens = [], [], 0
+    for note in notes:
+        note = str(note)
+        if estimate_tokens(note) > chunk_tokens and current:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        while estimate_tokens(note) > chunk_tokens:
+            # Notes longer than a whole chunk are split into chunk-sized pieces.
+            chunks.append([note[:(chunk_tokens - 1) * 4]])
+            note = note[(chunk_tokens - 1) * 4:]
+        tokens = estimate_tokens(note)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(note)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def deepseek_completion(prompt: str):
     api_key = os.getenv("DEEPSEEK_API_KEY")
-    url = "https://api.deepseek.com/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json"
@@ -86,8 +241,128 @@ def summarize_notes_with_deepseek(topic_id: int, db):
         ],
         "temperature": 0.7
     }
-    response = requests.post(url, headers=headers, json=data)
+    try:
+        response = await http_client.get_client().post(DEEPSEEK_API_URL, headers=headers, json=data,
+                                                        timeout=AI_REQUEST_TIMEOUT)
+    except httpx.HTTPError as e:
+        raise SummaryError(f"Błąd DeepSeek API: {e!r}")
     if response.status_code != 200:
-        return f"Błąd DeepSeek API: {response.status_code} - {response.text}"
+        raise SummaryError(f"Błąd DeepSeek API: {response.status_code} - {response.text}")
     result = response.json()
     return result["choices"][0]["message"]["content"]
+
+def request_deepseek_completion(prompt: str):
+    return http_client.run(deepseek_completion(prompt))
+
+async def summarize_chunks(chunks):
+    semaphore = asyncio.Semaphore(AI_MAP_PARALLELISM)
+
+    async def summarize_chunk(chunk):
+        async with semaphore:
+            return await deepseek_completion(build_chunk_prompt(chunk))
+
+    return await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+
+def condense_notes(notes, timings: dict):
+    """Map stage: while the notes don't fit into one AI_CHUNK_TOKENS prompt,
+    summarizes each chunk in parallel and continues with the partial results."""
+    start = time.perf_counter()
+    notes = apply_token_budget(notes, AI_TOKEN_BUDGET)
+    rounds = 0
+    while len(chunks := chunk_notes(notes, AI_CHUNK_TOKENS)) > 1:
+        if rounds == AI_MAX_MAP_ROUNDS:
+            notes = apply_token_budget(notes, AI_CHUNK_TOKENS)
+            break
+        notes = http_client.run(summarize_chunks(chunks))
+        rounds += 1
+    timings["map_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    timings["map_rounds"] = rounds
+    return notes
+
+@dataclass
+class SummaryResult:
+    text: str
+    covered_notes: dict
+    timings: dict = field(default_factory=dict)
+    prompt: str | None = None  # final LLM prompt; None when no LLM call is needed
+
+def prepare_topic_summary(topic_id: int, db, previous_summary=None):
+    """Collects and condenses a topic's notes into the final LLM prompt.
+
+    Given the previous AI_Summary of the topic, only notes added or changed
+    since then are used and merged into the old text with a refine prompt.
+    Deleted notes can't be taken out of a summary that way, so they force a
+    full regeneration. Stage timings are kept in milliseconds."""
+    notes = get_topic_notes(topic_id, db)
+    result = SummaryResult(text="", covered_notes={str(note.note_id): note_version(note) for note in notes})
+    if not notes:
+        result.text = "Brak notatek do podsumowania."
+        return result
+
+    previous_notes = previous_summary.covered_notes if previous_summary is not None else None
+    refine = (previous_notes is not None and previous_summary.topic_id == topic_id
+              and previous_notes.keys() <= result.covered_notes.keys())
+    if refine:
+        notes = [note for note in notes if previous_notes.get(str(note.note_id)) != result.covered_notes[str(note.note_id)]]
+        if not notes:
+            result.text = previous_summary.summary_text
+            return result
+
+    collect_start = time.perf_counter()
+    texts = notes_to_texts(notes, db)
+    result.timings["collect_ms"] = round((time.perf_counter() - collect_start) * 1000, 1)
+    texts = condense_notes(texts, result.timings)
+    if refine:
+        result.prompt = build_refine_prompt(previous_summary.summary_text, texts)
+    else:
+        result.prompt = build_summary_prompt(texts)
+    return result
+
+def summarize_topic(topic_id: int, db, previous_summary=None):
+    """Summarizes a topic and records which {note_id: version} it covers."""
+    start = time.perf_counter()
+    result = prepare_topic_summary(topic_id, db, previous_summary)
+    if result.prompt is None:
+        return result
+    reduce_start = time.perf_counter()
+    result.text = request_deepseek_completion(result.prompt)
+    result.timings["reduce_ms"] = round((time.perf_counter() - reduce_start) * 1000, 1)
+    result.timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+async def stream_deepseek_completion(prompt: str):
+    """Yields content deltas of a streamed DeepSeek chat completion.
+
+    A stream holds its connection for the whole answer, so it uses its own
+    client on the caller's event loop rather than the shared one."""
+    api_key = os.getenv("DEEPSEEK_API_KEY")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    data = {
+        "model": "deepseek-chat",
+        "messages": [
+            {"role": "system", "content": "Jesteś pomocnym asystentem edukacyjnym."},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.7,
+        "stream": True
+    }
+    try:
+        async with httpx.AsyncClient(timeout=AI_REQUEST_TIMEOUT) as client:
+            async with client.stream("POST", DEEPSEEK_API_URL, headers=headers, json=data) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise SummaryError(f"Błąd DeepSeek API: {response.status_code} - {response.text}")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = line[len("data:"):].strip()
+                    if payload == "[DONE]":
+                        break
+                    delta = json.loads(payload)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+    except httpx.HTTPError as e:
+        raise SummaryError(f"Błąd DeepSeek API: {e!r}")
@@ -0,0 +1,220 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, UTC
+from dotenv import load_dotenv
+from database import SessionLocal, dialect_insert
+from models.ai_summary import AI_Summary
+from models.ai_summary_job import AISummaryJob, JobStatusEnum
+from models.ai_summary_lease import AISummaryLease
+from services.AI_services import summarize_topic, get_topic_notes, notes_fingerprint
+import logging
+import os
+import threading
+
+load_dotenv()
+
+AI_JOB_BACKEND = os.getenv("AI_JOB_BACKEND", "thread")
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "2"))
+AI_SUMMARY_LEASE_SECONDS = int(os.getenv("AI_SUMMARY_LEASE_SECONDS", "600"))
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_summary_job(topic_id: int, db) -> tuple[AISummaryJob, bool]:
+    """Returns the job summarizing the topic's current notes and whether it
+    was created by this call.
+
+    A lease row keyed by (topic_id, notes fingerprint) is inserted with ON
+    CONFLICT DO NOTHING, so concurrent requests - from any worker - for the
+    same note set join the in-flight job instead of queueing another one.
+    A running job keeps renewing its lease; leases of crashed jobs expire
+    after AI_SUMMARY_LEASE_SECONDS."""
+    fingerprint = notes_fingerprint(get_topic_notes(topic_id, db))
+    now = datetime.now(UTC)
+    db.query(AISummaryLease).filter(
+        AISummaryLease.topic_id == topic_id,
+        AISummaryLease.expires_at < now
+    ).delete(synchronize_session=False)
+
+    job = AISummaryJob(topic_id=topic_id)
+    db.add(job)
+    db.flush()
+    leased = db.execute(
+        dialect_insert(db, AISummaryLease).values(
+            topic_id=topic_id, fingerprint=fingerprint, job_id=job.job_id,
+            expires_at=now + timedelta(seconds=AI_SUMMARY_LEASE_SECONDS)
+        ).on_conflict_do_nothing().returning(AISummaryLease.job_id)
+    ).scalar()
+    if leased is not None:
+        db.commit()
+        db.refresh(job)
+        return job, True
+
+    db.rollback()
+    existing = db.query(AISummaryJob).join(
+        AISummaryLease, AISummaryLease.job_id == AISummaryJob.job_id
+    ).filter(
+        AISummaryLease.topic_id == topic_id,
+        AISummaryLease.fingerprint == fingerprint
+    ).first()
+    if existing is None:
+        # The lease holder finished between our insert and this lookup.
+        return enqueue_summary_job(topic_id, db)
+    return existing, False
+
+
+def release_lease(db, job_id: int):
+    db.query(AISummaryLease).filter(AISummaryLease.job_id == job_id).delete(synchronize_session=False)
+
+
+def renew_lease(db, job_id: int):
+    db.query(AISummaryLease).filter(AISummaryLease.job_id == job_id).update(
+        {AISummaryLease.expires_at: datetime.now(UTC) + timedelta(seconds=AI_SUMMARY_LEASE_SECONDS)},
+        synchronize_session=False
+    )
+
+
+def keep_lease(job_id: int, session_factory, stopped: threading.Event):
+    """Renews the job's lease a few times per lease period until `stopped`
+    is set, so a slow summary on a live worker is neither joined by a
+    duplicate job nor re-queued by another worker's `recover`."""
+    while not stopped.wait(AI_SUMMARY_LEASE_SECONDS / 3):
+        db = session_factory()
+        try:
+            renew_lease(db, job_id)
+            db.commit()
+        except Exception:
+            logger.exception("Renewing the lease of AI summary job %s failed", job_id)
+        finally:
+            db.close()
+
+
+def run_summary_job(job_id: int, session_factory=SessionLocal):
+    db = session_factory()
+    try:
+        # Claiming the row with a conditional UPDATE keeps a job from running
+        # twice when several workers (or processes) pick up the same id.
+        claimed = db.query(AISummaryJob).filter(
+            AISummaryJob.job_id == job_id,
+            AISummaryJob.status == JobStatusEnum.queued
+        ).update({AISummaryJob.status: JobStatusEnum.running}, synchronize_session=False)
+        if not claimed:
+            db.commit()
+            return
+        renew_lease(db, job_id)
+        db.commit()
+        stopped = threading.Event()
+        heartbeat = threading.Thread(target=keep_lease, args=(job_id, session_factory, stopped),
+                                     name=f"ai-summary-lease-{job_id}", daemon=True)
+        heartbeat.start()
+        try:
+            run_claimed_job(db, job_id)
+        finally:
+            stopped.set()
+            heartbeat.join()
+    finally:
+        db.close()
+
+
+def run_claimed_job(db, job_id: int):
+    job = db.query(AISummaryJob).filter(AISummaryJob.job_id == job_id).first()
+    try:
+        result = summarize_topic(job.topic_id, db)
+        if not result.text:
+            raise ValueError("Failed to generate summary")
+        summary = AI_Summary(topic_id=job.topic_id, summary_text=result.text,
+                             covered_notes=result.covered_notes, timings=result.timings)
+        db.add(summary)
+        db.flush()
+        job.summary_id = summary.summary_id
+        job.status = JobStatusEnum.done
+        release_lease(db, job_id)
+    except Exception as e:
+        logger.exception("AI summary job %s failed", job_id)
+        db.rollback()
+        job = db.query(AISummaryJob).filter(AISummaryJob.job_id == job_id).first()
+        job.status = JobStatusEnum.failed
+        job.error = str(e)
+        release_lease(db, job_id)
+    db.commit()
+
+
+class JobBackend(ABC):
+    """Runs queued AI summary jobs. Job rows live in the database, so a backend
+    only needs the job id; `recover` re-submits jobs left queued by a restart
+    and jobs whose worker died while running them."""
+
+    def __init__(self, session_factory=SessionLocal):
+        self.session_factory = session_factory
+
+    @abstractmethod
+    def submit(self, job_id: int) -> None:
+        ...
+
+    def recover(self) -> None:
+        db = self.session_factory()
+        try:
+            # A running job whose lease has expired (or was already swept by
+            # enqueue_summary_job) lost its worker; put it back in the queue.
+            live_lease = db.query(AISummaryLease).filter(
+                AISummaryLease.job_id == AISummaryJob.job_id,
+                AISummaryLease.expires_at >= datetime.now(UTC)
+            ).exists()
+            stale = [job_id for (job_id,) in db.query(AISummaryJob.job_id).filter(
+                AISummaryJob.status == JobStatusEnum.running, ~live_lease
+            )]
+            if stale:
+                db.query(AISummaryJob).filter(
+                    AISummaryJob.job_id.in_(stale),
+                    AISummaryJob.status == JobStatusEnum.running
+                ).update({AISummaryJob.status: JobStatusEnum.queued}, synchronize_session=False)
+                db.query(AISummaryLease).filter(
+                    AISummaryLease.job_id.in_(stale)
+                ).delete(synchronize_session=False)
+                db.commit()
+            job_ids = [job_id for (job_id,) in db.query(AISummaryJob.job_id).filter(
+                AISummaryJob.status == JobStatusEnum.queued
+            ).order_by(AISummaryJob.job_id)]
+        finally:
+            db.close()
+        for job_id in job_ids:
+            self.submit(job_id)
+
+    def shutdown(self) -> None:
+        pass
+
+
+class ThreadPoolJobBackend(JobBackend):
+    def __init__(self, session_factory=SessionLocal, max_workers: int = AI_JOB_WORKERS):
+        super().__init__(session_factory)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ai-summary")
+        self._futures = set()
+        self._lock = threading.Lock()
+
+    def submit(self, job_id: int) -> None:
+        future = self.executor.submit(run_summary_job, job_id, self.session_factory)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def wait_idle(self, timeout: float | None = None) -> None:
+        with self._lock:
+            futures = list(self._futures)
+        wait(futures, timeout=timeout)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+JOB_BACKENDS = {
+    "thread": ThreadPoolJobBackend,
+}
+
+job_backend = JOB_BACKENDS[AI_JOB_BACKEND]()
+
+def get_job_backend() -> JobBackend:
+    return job_backend
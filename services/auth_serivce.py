@@ -1,13 +1,14 @@
 from dotenv import load_dotenv
-from passlib.context import CryptContext
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from database import db_dependency
+from database import async_db_dependency
 from typing import Annotated
 from datetime import datetime, timedelta, UTC
 from fastapi import Depends, HTTPException, status
 from models.user import User
-from sqlalchemy import or_
+from sqlalchemy import or_, select
+from services.hashing_service import password_hasher
+from services.token_cache import token_cache
 import os
 
 load_dotenv()
@@ -16,24 +17,34 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM")
 
-bcrypt_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_bearer = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def authenticate_user(username: str, password: str, db: db_dependency):
-    user = db.query(User).filter(or_(User.username == username, User.email == username)).first()
+async def authenticate_user(username: str, password: str, db: async_db_dependency):
+    user = await db.scalar(select(User).filter(or_(User.username == username, User.email == username)))
     if not user:
         return False
-    if not bcrypt_context.verify(password, user.password_hash):
+    verified, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+    if not verified:
         return False
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made.
+        user.password_hash = new_hash
+        await db.commit()
     return user
 
-def create_access_token(username: str, user_id: int, email: str, expires_delta: timedelta):
-    encode = {'sub': username, 'user_id': user_id, 'email': email}
+def create_access_token(username: str, user_id: int, email: str, expires_delta: timedelta, token_version: int = 0):
+    encode = {'sub': username, 'user_id': user_id, 'email': email, 'ver': token_version}
     expires = datetime.now(UTC) + expires_delta
     encode.update({'exp': int(expires.timestamp())})
     return jwt.encode(encode, SECRET_KEY, algorithm=ALGORITHM)
 
-async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
+async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)], db: async_db_dependency):
+    """Claims of a valid token. A token is only decoded and checked against
+    the user's token_version when it is not cached, so revoking tokens has
+    to evict them from the token cache too."""
+    user = token_cache.get(token)
+    if user is not None:
+        return user
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -45,7 +56,14 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_bearer)]):
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                             detail="could not validate credentials")
+    # Tokens issued before a password change, or for a deleted user, are revoked.
+    token_version = await db.scalar(select(User.token_version).filter(User.user_id == user_id))
+    if token_version is None or token_version != payload.get("ver", 0):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
+                            detail="could not validate credentials")
 
-    return {"username": username, "user_id": user_id, "email": email}
+    user = {"username": username, "user_id": user_id, "email": email}
+    token_cache.put(token, user, payload.get("exp"))
+    return user
 
 user_dependency = Annotated[dict, Depends(get_current_user)]
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from passlib.context import CryptContext
+import asyncio
+import os
+import threading
+import time
+
+load_dotenv()
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# One core is left to the event loop: hashing threads beyond the free cores
+# add no throughput and only take CPU time from request handling.
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", str(max(1, min(4, (os.cpu_count() or 1) - 1)))))
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded thread pool instead of the event loop.
+
+    bcrypt releases the GIL while hashing, so a login burst only occupies the
+    pool's threads and other requests keep being served, though not at idle
+    latency: the hashing threads still compete with the event loop for CPU,
+    which benchmarks/bench_login_storm.py measures. Hashes made with a
+    different work factor than BCRYPT_ROUNDS are reported by
+    `verify_and_update`, so they get rehashed on the user's next login."""
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, max_workers: int = HASHING_WORKERS):
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.max_pending = 0
+        self.completed = 0
+        self.total_wait_ms = 0.0
+        self.total_run_ms = 0.0
+
+    def _timed(self, submitted: float, func, *args):
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_wait_ms += (started - submitted) * 1000
+                self.total_run_ms += (finished - started) * 1000
+
+    async def _run(self, func, *args):
+        with self._lock:
+            self.pending += 1
+            self.max_pending = max(self.max_pending, self.pending)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._timed, time.perf_counter(), func, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(self.context.verify, password, password_hash)
+
+    async def verify_and_update(self, password: str, password_hash: str) -> tuple[bool, str | None]:
+        """Returns whether the password matches and, if the stored hash is
+        outdated, a new hash to save in its place."""
+        return await self._run(self.context.verify_and_update, password, password_hash)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0.0,
+                "avg_run_ms": round(self.total_run_ms / self.completed, 2) if self.completed else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+
+password_hasher = PasswordHasher()
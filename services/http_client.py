@@ -0,0 +1,50 @@
+from dotenv import load_dotenv
+import asyncio
+import httpx
+import os
+import threading
+
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+
+# One pooled httpx.AsyncClient for outbound API calls (OCR, LLM). It lives on a
+# dedicated event loop thread so that sync code such as the AI summary job
+# workers can share it through `run`.
+_loop: asyncio.AbstractEventLoop | None = None
+_client: httpx.AsyncClient | None = None
+_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="http-client", daemon=True).start()
+            _client = httpx.AsyncClient(limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                                            max_keepalive_connections=HTTP_MAX_CONNECTIONS))
+            _loop = loop
+        return _loop
+
+
+def get_client() -> httpx.AsyncClient:
+    """The shared client; only use it from coroutines passed to `run`."""
+    _get_loop()
+    return _client
+
+
+def run(coro):
+    """Runs a coroutine on the client loop and blocks until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
+def close():
+    global _loop, _client
+    with _lock:
+        if _loop is None:
+            return
+        loop, client = _loop, _client
+        _loop = _client = None
+    asyncio.run_coroutine_threadsafe(client.aclose(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
@@ -0,0 +1,81 @@
+"""Image derivatives, rendered in the image pipeline's worker processes.
+
+Only Pillow is imported here, so spawned workers start without loading the
+app, its database engines or the models."""
+from PIL import Image, ImageOps, features
+import glob
+import math
+import os
+
+FORMATS = {"webp": "WEBP", "avif": "AVIF"}
+OCR_FORMAT = "jpg"
+
+
+def variant_path(base: str, name: str, extension: str) -> str:
+    """media/objects/ab/cd/<sha256>.<name>.<extension>, next to the original."""
+    return f"{base}.{name}.{extension}"
+
+def ocr_variant_path(path: str) -> str:
+    return variant_path(os.path.splitext(path)[0], "ocr", OCR_FORMAT)
+
+def supported_formats(formats) -> list[str]:
+    return [extension for extension in formats if extension in FORMATS and features.check(extension)]
+
+def _fit(image: Image.Image, edge: int) -> Image.Image:
+    """Scales the image down so its longest side is at most `edge`."""
+    if max(image.size) <= edge:
+        return image
+    scale = edge / max(image.size)
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+def _save(image: Image.Image, path: str, image_format: str, **options) -> int:
+    temporary = f"{path}.tmp"
+    image.save(temporary, image_format, **options)
+    os.replace(temporary, path)
+    return os.path.getsize(path)
+
+def render_variants(source: str, sizes: list[tuple[str, int]], formats: list[str],
+                    ocr_edge: int, options: dict[str, dict]) -> list[dict]:
+    """Decodes `source` once and writes its derivatives next to it.
+
+    `sizes` are (name, longest edge) pairs. Each size is encoded in every
+    supported format, resized from the next larger one. The OCR input is a
+    grayscale JPEG no larger than `ocr_edge`. Images are never scaled up.
+    `options` are the encoder settings per extension, e.g. {"avif": {"speed": 8}}.
+    Returns one dict per file, with its name, format, path, width, height
+    and size in bytes."""
+    base = os.path.splitext(source)[0]
+    formats = supported_formats(formats)
+    variants = []
+    with Image.open(source) as original:
+        scale = max([ocr_edge] + [edge for _, edge in sizes]) / max(original.size)
+        # JPEGs decode straight at 1/2, 1/4 or 1/8 scale when that is still large enough.
+        original.draft(None, (math.ceil(original.width * scale), math.ceil(original.height * scale)))
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA" if image.has_transparency_data else "RGB")
+
+        image = _fit(image, ocr_edge)
+        ocr = image.convert("L")
+        path = variant_path(base, "ocr", OCR_FORMAT)
+        size = _save(ocr, path, "JPEG", **options.get(OCR_FORMAT, {}))
+        variants.append({"name": "ocr", "format": OCR_FORMAT, "path": path,
+                         "width": ocr.width, "height": ocr.height, "size": size})
+
+        for name, edge in sorted(sizes, key=lambda size: -size[1]):
+            image = _fit(image, edge)
+            for extension in formats:
+                path = variant_path(base, name, extension)
+                size = _save(image, path, FORMATS[extension], **options.get(extension, {}))
+                variants.append({"name": name, "format": extension, "path": path,
+                                 "width": image.width, "height": image.height, "size": size})
+    return variants
+
+def remove_variants(path: str):
+    """Deletes every derivative of the stored file at `path`."""
+    for variant in glob.glob(glob.escape(os.path.splitext(path)[0]) + ".*.*"):
+        try:
+            os.remove(variant)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,131 @@
+from bisect import bisect_left, insort
+from dotenv import load_dotenv
+from sqlalchemy import select
+from database import AsyncSessionLocal
+from models.user import User
+from services.vote_buffer import vote_buffer
+import asyncio
+import logging
+import os
+import threading
+
+load_dotenv()
+
+LEADERBOARD_RECONCILE_SECONDS = int(os.getenv("LEADERBOARD_RECONCILE_SECONDS", "300"))
+
+logger = logging.getLogger(__name__)
+
+
+class Leaderboard:
+    """Users ordered by score, kept in process as a sorted array.
+
+    Entries are keyed by (-score, user_id), so positions are found with
+    bisect and ties go to the older account. Votes, registrations and
+    account changes update it incrementally; `reconcile` rebuilds it from the
+    users table every LEADERBOARD_RECONCILE_SECONDS to pick up writes made by
+    other workers. Until the first rebuild, updates are ignored."""
+
+    def __init__(self, reconcile_seconds: int = LEADERBOARD_RECONCILE_SECONDS, session_factory=AsyncSessionLocal):
+        self.reconcile_seconds = reconcile_seconds
+        self.session_factory = session_factory
+        self._keys = []
+        self._users = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.loaded = False
+
+    @staticmethod
+    def _key(user_id: int, score: int):
+        return (-score, user_id)
+
+    def _entry(self, index: int) -> dict:
+        _, user_id = self._keys[index]
+        username, score, rank = self._users[user_id]
+        return {"position": index + 1, "user_id": user_id, "username": username, "score": score, "rank": rank.value}
+
+    async def rebuild(self, db):
+        rows = (await db.execute(select(User.user_id, User.username, User.score, User.rank))).all()
+        users = {}
+        for user_id, username, score, rank in rows:
+            score, rank = vote_buffer.merge_score(user_id, score or 0, rank)
+            users[user_id] = (username, score, rank)
+        keys = sorted(self._key(user_id, score) for user_id, (_, score, _) in users.items())
+        with self._lock:
+            self._keys, self._users = keys, users
+            self.loaded = True
+
+    async def ensure_loaded(self, db):
+        if not self.loaded:
+            await self.rebuild(db)
+
+    def _remove(self, user_id: int):
+        current = self._users.pop(user_id, None)
+        if current is not None:
+            del self._keys[bisect_left(self._keys, self._key(user_id, current[1]))]
+        return current
+
+    def update(self, user_id: int, score: int, rank, username: str | None = None):
+        with self._lock:
+            if not self.loaded:
+                return
+            current = self._remove(user_id)
+            if username is None and current is not None:
+                username = current[0]
+            self._users[user_id] = (username, score, rank)
+            insort(self._keys, self._key(user_id, score))
+
+    def remove(self, user_id: int):
+        with self._lock:
+            if self.loaded:
+                self._remove(user_id)
+
+    def top(self, limit: int, offset: int = 0) -> list[dict]:
+        with self._lock:
+            return [self._entry(index) for index in range(offset, min(offset + limit, len(self._keys)))]
+
+    def around(self, user_id: int, neighbours: int) -> list[dict] | None:
+        """The user's entry with up to `neighbours` entries on either side."""
+        with self._lock:
+            current = self._users.get(user_id)
+            if current is None:
+                return None
+            index = bisect_left(self._keys, self._key(user_id, current[1]))
+            return [self._entry(i) for i in range(max(0, index - neighbours),
+                                                  min(index + neighbours + 1, len(self._keys)))]
+
+    def __len__(self):
+        return len(self._keys)
+
+    async def reconcile(self):
+        try:
+            async with self.session_factory() as db:
+                await self.rebuild(db)
+        except Exception:
+            logger.exception("Reconciling the leaderboard failed")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.reconcile_seconds)
+            await self.reconcile()
+
+    async def start(self):
+        await self.reconcile()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def clear(self):
+        with self._lock:
+            self._keys, self._users = [], {}
+            self.loaded = False
+
+
+leaderboard = Leaderboard()
@@ -0,0 +1,53 @@
+"""Removes note images and avatars left over from before the content-addressed
+media store, once migration d6a2f8c4b0e7 has been committed.
+
+    python -m services.media_cleanup
+"""
+from sqlalchemy import select
+from database import SessionLocal
+from models.media_object import MediaObject
+from models.note import Note
+from models.user import User
+import hashlib
+import os
+
+LEGACY_MEDIA_DIRS = [os.path.join("media", "note_imgs"), os.path.join("media", "avatars")]
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_legacy_media(db) -> list[str]:
+    """Deletes files in the legacy directories that no note or user points
+    at any more and whose bytes are in the media store; returns their paths.
+
+    Anything still referenced, e.g. because the migration was rolled back,
+    and anything the store has no copy of is kept."""
+    referenced = {url.lstrip("/") for url in db.scalars(select(Note.image_url).filter(Note.image_url.is_not(None)))}
+    referenced |= {url.lstrip("/") for url in db.scalars(select(User.avatar_url).filter(User.avatar_url.is_not(None)))}
+    removed = []
+    for directory in LEGACY_MEDIA_DIRS:
+        if not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            if not os.path.isfile(path) or path.replace(os.sep, "/") in referenced:
+                continue
+            stored = db.scalar(select(MediaObject.path).filter(MediaObject.sha256 == file_sha256(path)))
+            if stored is None or not os.path.exists(stored):
+                continue
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+
+if __name__ == "__main__":
+    with SessionLocal() as session:
+        removed = remove_legacy_media(session)
+    for path in removed:
+        print(f"removed {path}")
+    print(f"{len(removed)} legacy media files removed")
@@ -0,0 +1,166 @@
+from dataclasses import dataclass
+from dotenv import load_dotenv
+from fastapi import HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update, delete
+from database import dialect_insert
+from models.media_object import MediaObject
+from services.image_variants import remove_variants
+import hashlib
+import inspect
+import os
+import re
+import tempfile
+
+load_dotenv()
+
+MEDIA_CHUNK_BYTES = int(os.getenv("MEDIA_CHUNK_BYTES", str(1024 * 1024)))
+NOTE_IMAGE_MAX_BYTES = int(os.getenv("NOTE_IMAGE_MAX_BYTES", str(25 * 1024 * 1024)))
+AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", str(5 * 1024 * 1024)))
+
+MEDIA_OBJECTS_DIR = os.path.join("media", "objects")
+
+EXTENSION_PATTERN = re.compile(r"^[a-z0-9]{1,8}$")
+
+
+@dataclass
+class StoredUpload:
+    path: str
+    url: str
+    size: int
+    sha256: str
+
+
+def upload_filename(upload: UploadFile) -> str:
+    """The client's file name without any directory part."""
+    return os.path.basename((upload.filename or "").replace("\\", "/"))
+
+def upload_extension(upload: UploadFile) -> str:
+    extension = os.path.splitext(upload_filename(upload))[1][1:].lower()
+    return f".{extension}" if EXTENSION_PATTERN.match(extension) else ""
+
+def media_url(path: str) -> str:
+    return "/" + path.replace(os.sep, "/")
+
+def object_path(sha256: str, extension: str = "") -> str:
+    """Sharded location of an object, media/objects/ab/cd/abcd…, so no
+    directory grows past 65536 entries per level."""
+    return os.path.join(MEDIA_OBJECTS_DIR, sha256[:2], sha256[2:4], sha256 + extension)
+
+async def _execute(db, statement):
+    """Runs a statement on a sync or an async session."""
+    result = db.execute(statement)
+    if inspect.isawaitable(result):
+        result = await result
+    return result
+
+async def _commit(db):
+    result = db.commit()
+    if inspect.isawaitable(result):
+        await result
+
+def _write_chunk(file, digest, chunk: bytes):
+    digest.update(chunk)
+    file.write(chunk)
+
+def _finish(file, path: str):
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(file.name, path)
+
+def _discard(file):
+    file.close()
+    try:
+        os.remove(file.name)
+    except FileNotFoundError:
+        pass
+
+async def receive_upload(upload: UploadFile, directory: str, max_bytes: int):
+    """Copies an upload into a temporary file in `directory` without holding
+    it in memory; returns the open file, its size and SHA-256.
+
+    The upload is read MEDIA_CHUNK_BYTES at a time and hashed as it goes.
+    Going over `max_bytes` stops the copy with a 413. Disk writes run in the
+    threadpool."""
+    await run_in_threadpool(os.makedirs, directory, exist_ok=True)
+    file = await run_in_threadpool(tempfile.NamedTemporaryFile, dir=directory, prefix=".upload-", delete=False)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while chunk := await upload.read(MEDIA_CHUNK_BYTES):
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="File too large")
+            await run_in_threadpool(_write_chunk, file, digest, chunk)
+    except BaseException:
+        await run_in_threadpool(_discard, file)
+        raise
+    return file, size, digest.hexdigest()
+
+async def store_media(db, upload: UploadFile, max_bytes: int) -> StoredUpload:
+    """Stores an upload by content and takes a reference to it.
+
+    Bytes already stored under the same SHA-256 are reused: the row's
+    reference count goes up and the new copy is dropped. Otherwise the file
+    is fsynced and renamed into its sharded place, so a half-written object
+    is never visible. The reference is part of the caller's transaction.
+
+    The reference is taken before the file is looked at: the upsert waits
+    for a concurrent `remove_media_file` of the same object, so either that
+    sees the new reference and keeps the file, or the file is gone by the
+    time it is checked here and this copy takes its place."""
+    file, size, sha256 = await receive_upload(upload, MEDIA_OBJECTS_DIR, max_bytes)
+    try:
+        statement = dialect_insert(db, MediaObject).values(
+            sha256=sha256, path=object_path(sha256, upload_extension(upload)), size=size, ref_count=1
+        )
+        path = (await _execute(db, statement.on_conflict_do_update(
+            index_elements=["sha256"], set_={"ref_count": MediaObject.ref_count + 1}
+        ).returning(MediaObject.path))).scalar()
+        if await run_in_threadpool(os.path.exists, path):
+            await run_in_threadpool(_discard, file)
+        else:
+            await run_in_threadpool(_finish, file, path)
+    except BaseException:
+        await run_in_threadpool(_discard, file)
+        raise
+    return StoredUpload(path=path, url=media_url(path), size=size, sha256=sha256)
+
+async def release_media(db, sha256: str | None) -> str | None:
+    """Drops a reference; when it was the last one, returns the file's path
+    for `remove_media_file` after commit. The row stays, with ref_count 0,
+    until the file is removed."""
+    if sha256 is None:
+        return None
+    released = (await _execute(db, update(MediaObject).where(MediaObject.sha256 == sha256)
+                               .values(ref_count=MediaObject.ref_count - 1)
+                               .returning(MediaObject.ref_count, MediaObject.path)
+                               .execution_options(synchronize_session=False))).first()
+    if released is None or released.ref_count > 0:
+        return None
+    return released.path
+
+async def remove_media_file(db, sha256: str, path: str | None):
+    """Deletes an unreferenced object's row, file and derivatives, unless an
+    upload of the same bytes has stored it again since the reference was
+    released.
+
+    The row is deleted first and the file removed before that commits, so a
+    concurrent `store_media` of the same bytes waits on the row and then
+    finds the file gone."""
+    if path is None:
+        return
+    path = (await _execute(db, delete(MediaObject).where(
+        MediaObject.sha256 == sha256, MediaObject.ref_count <= 0
+    ).returning(MediaObject.path))).scalar()
+    try:
+        if path is not None:
+            try:
+                await run_in_threadpool(os.remove, path)
+            except FileNotFoundError:
+                pass
+            await run_in_threadpool(remove_variants, path)
+    finally:
+        await _commit(db)
@@ -0,0 +1,41 @@
+from collections import deque
+import threading
+
+
+class LatencyStats:
+    """Keeps the most recent latency samples (in ms) for percentile reporting."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._samples = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def observe(self, value_ms: float):
+        with self._lock:
+            self._samples.append(value_ms)
+            self.count += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+            last = self._samples[-1] if self._samples else None
+        if not samples:
+            return {"count": count, "last_ms": None, "avg_ms": None, "p50_ms": None, "p95_ms": None, "max_ms": None}
+
+        def percentile(p: float) -> float:
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))], 1)
+
+        return {
+            "count": count,
+            "last_ms": round(last, 1),
+            "avg_ms": round(sum(samples) / len(samples), 1),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(samples[-1], 1),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self.count = 0
@@ -0,0 +1,228 @@
+from dotenv import load_dotenv
+from sqlalchemy import select, func, cast, literal_column, text
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from database import AsyncSessionLocal
+from models.note import Note, SEARCH_CONFIG
+from models.topic import Topic
+from services.search_index import InvertedIndex
+import asyncio
+import logging
+import os
+import re
+
+load_dotenv()
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "sql")
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", os.path.join("search_index", "notes.idx"))
+SEARCH_INDEX_SNAPSHOT_SECONDS = int(os.getenv("SEARCH_INDEX_SNAPSHOT_SECONDS", "300"))
+
+MAX_SEARCH_TERMS = 16
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+")
+
+# Title matches count ten times more than content or OCR text, like the 'A'
+# and 'B' weights of the Postgres search vector.
+SQLITE_RANK = "-bm25(notes_fts, 10.0, 1.0, 1.0)"
+
+logger = logging.getLogger(__name__)
+
+
+def fts5_match(query: str) -> str | None:
+    """The words of a user query as an FTS5 expression matching all of them.
+
+    Each word is quoted, so punctuation and FTS5 operators in the input are
+    searched for literally instead of raising a syntax error."""
+    terms = SEARCH_TERM_PATTERN.findall(query)[:MAX_SEARCH_TERMS]
+    return " ".join(f'"{term}"' for term in terms) or None
+
+def postgres_matches(query: str):
+    tsquery = func.websearch_to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), query)
+    vector = literal_column("notes.search_vector")
+    rank = func.ts_rank_cd(vector, tsquery)
+    return select(Note).filter(vector.op("@@")(tsquery)), rank
+
+def sqlite_matches(query: str):
+    match = fts5_match(query)
+    if match is None:
+        return None, None
+    matches = select(literal_column("rowid").label("note_id"), literal_column(SQLITE_RANK).label("rank")) \
+        .select_from(text("notes_fts")) \
+        .where(text("notes_fts MATCH :match").bindparams(match=match)) \
+        .subquery()
+    return select(Note).join(matches, matches.c.note_id == Note.note_id), matches.c.rank
+
+def note_body(note) -> str:
+    return " ".join(part for part in (note.content, note.ocr_text) if part)
+
+
+class SQLSearch:
+    """Searches with the database's own full-text index (tsvector or FTS5),
+    which the database keeps up to date by itself."""
+
+    async def search(self, db, query: str, limit: int, offset: int = 0, organization_id: int | None = None,
+                     channel_id: int | None = None, topic_id: int | None = None) -> list[Note]:
+        if db.get_bind().dialect.name == "postgresql":
+            statement, rank = postgres_matches(query)
+        else:
+            statement, rank = sqlite_matches(query)
+        if statement is None:
+            return []
+        if organization_id is not None:
+            statement = statement.filter(Note.organization_id == organization_id)
+        if topic_id is not None:
+            statement = statement.filter(Note.topic_id == topic_id)
+        if channel_id is not None:
+            statement = statement.filter(Note.topic_id.in_(select(Topic.topic_id).filter(Topic.channel_id == channel_id)))
+        statement = statement.order_by(rank.desc(), Note.note_id.desc()).offset(offset).limit(limit + 1)
+        return (await db.scalars(statement)).all()
+
+    def note_saved(self, note):
+        pass
+
+    def note_deleted(self, note_id: int):
+        pass
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def stats(self) -> dict:
+        return {"backend": "sql"}
+
+    def clear(self):
+        pass
+
+
+class IndexSearch:
+    """Searches an in-process InvertedIndex, for databases without a usable
+    full-text index.
+
+    The index is loaded on first use: from the snapshot at SEARCH_INDEX_PATH
+    when there is a readable one, then caught up with notes created, deleted
+    or given a new search_version since, otherwise built from the notes
+    table. Note events keep it current, and it
+    is snapshotted every SEARCH_INDEX_SNAPSHOT_SECONDS and on shutdown.
+    Until it is loaded, note events are ignored."""
+
+    def __init__(self, path: str = SEARCH_INDEX_PATH, snapshot_seconds: int = SEARCH_INDEX_SNAPSHOT_SECONDS,
+                 session_factory=AsyncSessionLocal):
+        self.path = path
+        self.snapshot_seconds = snapshot_seconds
+        self.session_factory = session_factory
+        self.index = InvertedIndex()
+        self.loaded = False
+        self.dirty = False
+        self._task = None
+
+    def _add(self, note):
+        self.index.add(note.note_id, note.title, note_body(note), note.organization_id, note.topic_id,
+                       note.search_version)
+
+    async def _index_notes(self, db, note_ids=None):
+        query = select(Note.note_id, Note.title, Note.content, Note.ocr_text, Note.organization_id, Note.topic_id,
+                       Note.search_version)
+        if note_ids is not None:
+            query = query.filter(Note.note_id.in_(note_ids))
+        for note in (await db.execute(query)).all():
+            self._add(note)
+
+    async def ensure_loaded(self, db):
+        if self.loaded:
+            return
+        try:
+            snapshot_loaded = await asyncio.to_thread(self.index.load, self.path)
+        except Exception:
+            logger.exception("Loading the search index snapshot %s failed; rebuilding it", self.path)
+            self.index.clear()
+            snapshot_loaded = False
+        if snapshot_loaded:
+            stored = dict((await db.execute(select(Note.note_id, Note.search_version))).all())
+            indexed = self.index.note_versions()
+            removed = indexed.keys() - stored.keys()
+            for note_id in removed:
+                self.index.remove(note_id)
+            # New notes, and notes whose text changed after the snapshot.
+            stale = {note_id for note_id, version in stored.items() if indexed.get(note_id) != version}
+            if stale:
+                await self._index_notes(db, stale)
+            self.dirty = bool(stale or removed)
+        else:
+            await self._index_notes(db)
+            self.dirty = True
+        self.loaded = True
+
+    async def search(self, db, query: str, limit: int, offset: int = 0, organization_id: int | None = None,
+                     channel_id: int | None = None, topic_id: int | None = None) -> list[Note]:
+        await self.ensure_loaded(db)
+        topic_ids = None
+        if channel_id is not None:
+            topic_ids = set((await db.scalars(select(Topic.topic_id).filter(Topic.channel_id == channel_id))).all())
+        if topic_id is not None:
+            topic_ids = {topic_id} if topic_ids is None else topic_ids & {topic_id}
+        results = self.index.search(query, organization_id=organization_id, topic_ids=topic_ids,
+                                    limit=offset + limit + 1)
+        note_ids = [note_id for note_id, _ in results[offset:]]
+        notes = {note.note_id: note for note in (await db.scalars(select(Note).filter(Note.note_id.in_(note_ids)))).all()}
+        return [notes[note_id] for note_id in note_ids if note_id in notes]
+
+    def note_saved(self, note):
+        if self.loaded:
+            self._add(note)
+            self.dirty = True
+
+    def note_deleted(self, note_id: int):
+        if self.loaded:
+            self.index.remove(note_id)
+            self.dirty = True
+
+    async def snapshot(self):
+        if not self.dirty:
+            return
+        self.dirty = False
+        try:
+            await asyncio.to_thread(self.index.save, self.path)
+        except Exception:
+            self.dirty = True
+            logger.exception("Saving the search index snapshot failed")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.snapshot_seconds)
+            await self.snapshot()
+
+    async def start(self):
+        try:
+            async with self.session_factory() as db:
+                await self.ensure_loaded(db)
+        except Exception:
+            logger.exception("Loading the search index failed")
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot()
+
+    def stats(self) -> dict:
+        return {"backend": "index", "loaded": self.loaded, **self.index.stats()}
+
+    def clear(self):
+        self.index.clear()
+        self.loaded = False
+        self.dirty = False
+
+
+SEARCH_BACKENDS = {
+    "sql": SQLSearch,
+    "index": IndexSearch,
+}
+
+note_search = SEARCH_BACKENDS[SEARCH_BACKEND]()
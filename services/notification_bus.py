@@ -0,0 +1,190 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from dotenv import load_dotenv
+from sqlalchemy import text
+from database import async_engine
+import asyncio
+import json
+import logging
+import os
+import threading
+
+load_dotenv()
+
+NOTIFICATION_CHANNEL = "notifications"
+NOTIFICATION_TRANSPORT = os.getenv(
+    "NOTIFICATION_TRANSPORT", "postgres" if async_engine.dialect.name == "postgresql" else "memory"
+)
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", "15"))
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+logger = logging.getLogger(__name__)
+
+
+def notification_payload(notification) -> dict:
+    return {
+        "notification_id": notification.notification_id,
+        "user_id": notification.user_id,
+        "message": notification.message,
+        "status": notification.status.value if hasattr(notification.status, "value") else notification.status,
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+    }
+
+
+def notify_batches(payloads: list[dict], limit: int = NOTIFY_PAYLOAD_LIMIT) -> list[str]:
+    """Packs payloads into JSON arrays of at most `limit` bytes each (a
+    payload over the limit on its own still gets its own array)."""
+    batches, batch, size = [], [], 2
+    for payload in payloads:
+        encoded = json.dumps(payload)  # ASCII only, so characters are bytes
+        if batch and size + len(encoded) + 1 > limit:
+            batches.append("[" + ",".join(batch) + "]")
+            batch, size = [], 2
+        batch.append(encoded)
+        size += len(encoded) + 1
+    if batch:
+        batches.append("[" + ",".join(batch) + "]")
+    return batches
+
+
+@dataclass(eq=False)
+class Subscription:
+    user_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=asyncio.Queue)
+
+
+class InMemoryTransport:
+    """Delivers notifications to subscribers of this process only."""
+
+    def __init__(self, bus: "NotificationBus"):
+        self.bus = bus
+
+    async def start(self):
+        pass
+
+    def send_many(self, payloads: list[dict]):
+        for payload in payloads:
+            self.bus.dispatch(payload)
+
+    async def stop(self):
+        pass
+
+
+class PostgresTransport:
+    """Fans notifications out to every worker through LISTEN/NOTIFY.
+
+    One connection per worker stays checked out and LISTENs on the channel;
+    `send_many` NOTIFYs from a pooled connection, and Postgres hands the
+    payloads to all listeners, including this worker's own. Payloads travel
+    as JSON arrays under the NOTIFY size limit, all sent in one transaction,
+    so a fan-out to thousands of members costs one checkout and commit."""
+
+    def __init__(self, bus: "NotificationBus"):
+        self.bus = bus
+        self.loop = None
+        self._connection = None
+
+    def _on_notify(self, connection, pid, channel, payload):
+        for notification in json.loads(payload):
+            self.bus.dispatch(notification)
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self._connection = await async_engine.connect()
+        raw_connection = await self._connection.get_raw_connection()
+        await raw_connection.driver_connection.add_listener(NOTIFICATION_CHANNEL, self._on_notify)
+
+    async def _notify(self, batches: list[str]):
+        async with async_engine.begin() as connection:
+            for batch in batches:
+                await connection.execute(text("SELECT pg_notify(:channel, :payload)"),
+                                         {"channel": NOTIFICATION_CHANNEL, "payload": batch})
+
+    def send_many(self, payloads: list[dict]):
+        if self.loop is None:
+            # Not started (e.g. a script outside the app); deliver locally.
+            for payload in payloads:
+                self.bus.dispatch(payload)
+            return
+        future = asyncio.run_coroutine_threadsafe(self._notify(notify_batches(payloads)), self.loop)
+        future.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(future):
+        if future.exception() is not None:
+            logger.error("Publishing a notification failed", exc_info=future.exception())
+
+    async def stop(self):
+        if self._connection is not None:
+            await self._connection.close()
+            self._connection = None
+        self.loop = None
+
+
+NOTIFICATION_TRANSPORTS = {
+    "memory": InMemoryTransport,
+    "postgres": PostgresTransport,
+}
+
+
+class NotificationBus:
+    """In-process pub/sub of new notifications, keyed by recipient.
+
+    `publish` may be called from any thread (sync routers, background jobs);
+    delivery goes through the transport and ends in `dispatch`, which hands
+    the payload to each subscriber's queue on the subscriber's own loop."""
+
+    def __init__(self, transport: str = NOTIFICATION_TRANSPORT):
+        self.transport = NOTIFICATION_TRANSPORTS[transport](self)
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id=user_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def dispatch(self, payload: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(payload["user_id"], ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, payload)
+            except RuntimeError:
+                # The subscriber's loop is closed; it unsubscribes on its way out.
+                pass
+
+    def publish(self, *notifications):
+        """Publishes committed notifications (they need their ids)."""
+        if notifications:
+            self.transport.send_many([notification_payload(notification) for notification in notifications])
+
+    async def start(self):
+        try:
+            await self.transport.start()
+        except Exception:
+            logger.exception("Starting the %s notification transport failed, delivering in-process only",
+                             type(self.transport).__name__)
+            self.transport = InMemoryTransport(self)
+
+    async def stop(self):
+        await self.transport.stop()
+
+
+notification_bus = NotificationBus()
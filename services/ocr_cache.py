@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from models.ocr_cache import OCRCacheEntry
+import hashlib
+import os
+import threading
+
+load_dotenv()
+
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "1024"))
+
+
+def content_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+class OCRCache:
+    """OCR results keyed by the SHA-256 of the image bytes.
+
+    Lookups go through an in-memory LRU first and fall back to the ocr_cache
+    table, so the same image is only sent to OCR once across restarts."""
+
+    def __init__(self, max_entries: int = OCR_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, text: str):
+        self._entries[key] = text
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, db, key: str) -> str | None:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return self._entries[key]
+        entry = db.query(OCRCacheEntry).filter(OCRCacheEntry.content_hash == key).first()
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.db_hits += 1
+            self._remember(key, entry.text)
+        return entry.text
+
+    def put(self, db, key: str, text: str):
+        db.add(OCRCacheEntry(content_hash=key, text=text))
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another worker stored the same image first.
+            db.rollback()
+        with self._lock:
+            self._remember(key, text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.memory_hits + self.db_hits + self.misses
+            hits = self.memory_hits + self.db_hits
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "memory_hits": self.memory_hits,
+                "db_hits": self.db_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.memory_hits = self.db_hits = self.misses = 0
+
+
+ocr_cache = OCRCache()
@@ -0,0 +1,55 @@
+from datetime import date, datetime, timedelta, UTC
+from fastapi import HTTPException
+from sqlalchemy import select, func
+from database import dialect_insert
+from models.organization_score_bucket import OrganizationScoreBucket
+from models.user import User
+import re
+
+MAX_WINDOW_DAYS = 365
+
+WINDOW_PATTERN = re.compile(r"^(\d+)d$")
+
+
+def today() -> date:
+    return datetime.now(UTC).date()
+
+def parse_window(window: str) -> int:
+    """Number of days in a window like "7d" or "30d"."""
+    match = WINDOW_PATTERN.match(window)
+    if not match or not 1 <= int(match.group(1)) <= MAX_WINDOW_DAYS:
+        raise HTTPException(status_code=400, detail="Invalid window")
+    return int(match.group(1))
+
+def upsert_score_bucket(db, organization_id: int, user_id: int, day: date, delta: int):
+    """Adds `delta` to the author's bucket for the day, creating it if needed."""
+    statement = dialect_insert(db, OrganizationScoreBucket).values(
+        organization_id=organization_id, day=day, user_id=user_id, score=delta
+    )
+    return statement.on_conflict_do_update(
+        index_elements=["organization_id", "day", "user_id"],
+        set_={"score": OrganizationScoreBucket.score + statement.excluded.score}
+    )
+
+async def organization_ranking(db, organization_id: int, days: int, limit: int,
+                               pending: dict[int, int] | None = None) -> list[dict]:
+    """Top authors of an organization over the last `days` days, summed from
+    the daily buckets. `pending` adds score deltas not flushed yet."""
+    since = today() - timedelta(days=days - 1)
+    total = func.sum(OrganizationScoreBucket.score).label("score")
+    query = select(OrganizationScoreBucket.user_id, total).filter(
+        OrganizationScoreBucket.organization_id == organization_id,
+        OrganizationScoreBucket.day >= since
+    ).group_by(OrganizationScoreBucket.user_id).order_by(total.desc(), OrganizationScoreBucket.user_id)
+    if not pending:
+        query = query.limit(limit)
+    scores = dict((await db.execute(query)).all())
+    for user_id, delta in (pending or {}).items():
+        scores[user_id] = scores.get(user_id, 0) + delta
+    top = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+    usernames = dict((await db.execute(
+        select(User.user_id, User.username).filter(User.user_id.in_([user_id for user_id, _ in top]))
+    )).all())
+    return [{"position": position, "user_id": user_id, "username": usernames.get(user_id), "score": score}
+            for position, (user_id, score) in enumerate(top, start=1)]
@@ -1,4 +1,5 @@
-from models.user import RankEnum
+from models.user import User, RankEnum
+from sqlalchemy import case, literal
 
 RANK_THRESHOLD = [
     (0, RankEnum.incompetent),
@@ -12,4 +13,13 @@ def get_rank_for_score(score: int) -> RankEnum:
     for threshold, rank in reversed(RANK_THRESHOLD):
         if score >= threshold:
             return rank
-    return RankEnum.incompetent
\ No newline at end of file
+    return RankEnum.incompetent
+
+def rank_for_score_expression(score):
+    """SQL counterpart of `get_rank_for_score`, so an UPDATE can set the rank
+    from the same score expression it writes."""
+    rank_type = User.rank.type
+    return case(
+        *((score >= threshold, literal(rank, rank_type)) for threshold, rank in reversed(RANK_THRESHOLD)),
+        else_=literal(RankEnum.incompetent, rank_type)
+    )
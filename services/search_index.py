@@ -0,0 +1,313 @@
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from datetime import datetime, UTC
+from functools import lru_cache
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import sys
+import threading
+
+WORD_PATTERN = re.compile(r"\w+")
+
+POLISH_FOLD = str.maketrans("ąćęłńóśźż", "acelnoszz")
+
+STOPWORDS = frozenset({
+    "a", "aby", "ale", "by", "czy", "dla", "do", "i", "jak", "jest", "lub", "na", "nie", "o", "od",
+    "oraz", "po", "przez", "się", "są", "ten", "to", "w", "we", "z", "za", "ze", "że",
+})
+
+# Inflectional endings of Polish nouns and adjectives; the longest one that
+# fits is cut. That maps "całki", "całkami" and "całkach" to one stem; it is
+# not a full morphological analyser, but it needs no dictionary.
+SUFFIXES = frozenset({
+    "owania", "owanie", "ami", "ach", "owi", "owie", "ego", "emu", "ymi", "imi", "ych", "ich",
+    "ów", "om", "em", "ie", "ia", "iu", "ii", "ią", "ię", "ej", "ym", "im",
+    "ą", "ę", "a", "e", "i", "o", "u", "y",
+})
+
+MIN_STEM_LENGTH = 3
+
+# Title words count as often as the body words of three notes, so title
+# matches rank first (like the 'A' weight of the Postgres search vector).
+TITLE_WEIGHT = 3
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Removed notes leave stale postings behind; rewrite the lists once they
+# make up this share of all indexed notes.
+COMPACT_RATIO = 0.25
+
+SNAPSHOT_MAGIC = b"EDUIDX2\n"
+
+
+def copy_array(values) -> array:
+    """A writable uint32 array with the contents of an array or mapped view."""
+    copy = array("I")
+    copy.frombytes(values if isinstance(values, array) else values.cast("B"))
+    return copy
+
+SUFFIX_LENGTHS = sorted({len(suffix) for suffix in SUFFIXES}, reverse=True)
+
+def result_order(result: tuple[int, float]):
+    """Best score first; ties go to the newer note, as in the SQL backend."""
+    return (-result[1], -result[0])
+
+def stem(word: str) -> str:
+    for length in SUFFIX_LENGTHS:
+        if len(word) - length >= MIN_STEM_LENGTH and word[-length:] in SUFFIXES:
+            return word[:-length]
+    return word
+
+@lru_cache(maxsize=100_000)
+def search_term(word: str) -> str:
+    return stem(word).translate(POLISH_FOLD)
+
+def tokenize(text: str | None) -> list[str]:
+    """Search terms of a text: lowercased, stemmed, without stopwords and
+    with Polish letters folded, so "Całki" and "calkami" meet."""
+    if not text:
+        return []
+    return [search_term(word) for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+class InvertedIndex:
+    """BM25 index of notes kept in flat uint32 arrays.
+
+    Every indexed version of a note gets a slot; per-slot arrays hold the
+    note id, its length in terms, organization, topic and search version,
+    and each term's posting list is a pair of arrays of slots and term
+    frequencies. Adding a note again or removing it only retires its slot,
+    and the lists are compacted once retired slots pile up.
+
+    `save` writes the arrays into one file and `load` maps it back with mmap:
+    posting lists stay views of the file until a term is next written to, so
+    startup does not copy or parse them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._terms = {}
+        self._slot_note = array("I")
+        self._slot_length = array("I")
+        self._slot_organization = array("I")
+        self._slot_topic = array("I")
+        self._slot_version = array("I")
+        self._docs = {}
+        self._total_length = 0
+        self._mmap = None
+        self.saved_at = None
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _postings(self, term: str):
+        """The term's posting arrays, copied out of the snapshot on first write."""
+        postings = self._terms.get(term)
+        if postings is None:
+            postings = self._terms[term] = (array("I"), array("I"))
+        elif not isinstance(postings[0], array):
+            postings = self._terms[term] = (copy_array(postings[0]), copy_array(postings[1]))
+        return postings
+
+    def add(self, note_id: int, title: str | None, body: str | None, organization_id: int, topic_id: int,
+            version: int = 0):
+        counts = Counter(tokenize(body))
+        for term in tokenize(title):
+            counts[term] += TITLE_WEIGHT
+        length = sum(counts.values())
+        with self._lock:
+            self._retire(note_id)
+            slot = len(self._slot_note)
+            self._slot_note.append(note_id)
+            self._slot_length.append(length)
+            self._slot_organization.append(organization_id)
+            self._slot_topic.append(topic_id)
+            self._slot_version.append(version)
+            self._docs[note_id] = slot
+            self._total_length += length
+            for term, frequency in counts.items():
+                slots, frequencies = self._postings(term)
+                slots.append(slot)
+                frequencies.append(frequency)
+
+    def remove(self, note_id: int):
+        with self._lock:
+            self._retire(note_id)
+
+    def _retire(self, note_id: int):
+        slot = self._docs.pop(note_id, None)
+        if slot is not None:
+            self._total_length -= self._slot_length[slot]
+            if len(self._slot_note) - len(self._docs) > COMPACT_RATIO * max(len(self._docs), 1):
+                self._compact()
+
+    def _compact(self):
+        live = sorted(self._docs.values())
+        renumbered = {slot: new_slot for new_slot, slot in enumerate(live)}
+        terms = {}
+        for term, (slots, frequencies) in self._terms.items():
+            kept = [(renumbered[slot], frequency) for slot, frequency in zip(slots, frequencies)
+                    if slot in renumbered]
+            if kept:
+                terms[term] = (array("I", (slot for slot, _ in kept)), array("I", (frequency for _, frequency in kept)))
+        self._terms = terms
+        for name in ("_slot_note", "_slot_length", "_slot_organization", "_slot_topic", "_slot_version"):
+            values = getattr(self, name)
+            setattr(self, name, array("I", (values[slot] for slot in live)))
+        self._docs = {self._slot_note[slot]: slot for slot in range(len(live))}
+
+    def search(self, query: str, organization_id: int | None = None, topic_ids: set[int] | None = None,
+               limit: int | None = None) -> list[tuple[int, float]]:
+        """(note_id, score) of the best `limit` (default all) notes containing
+        every query term, best first.
+
+        Posting lists are sorted by slot, so the rarest term's list drives
+        the intersection and the others are probed with bisect. Document
+        frequencies include retired postings, which compaction keeps to a
+        small share."""
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+        with self._lock:
+            documents = len(self._docs)
+            if not documents:
+                return []
+            average_length = self._total_length / documents
+            retired = len(self._slot_note) != documents
+            postings = []
+            for term in terms:
+                if term not in self._terms:
+                    return []
+                postings.append(self._terms[term])
+            postings.sort(key=lambda posting: len(posting[0]))
+            idfs = [math.log(1 + (documents - len(slots) + 0.5) / (len(slots) + 0.5)) for slots, _ in postings]
+
+            slot_note, slot_length = self._slot_note, self._slot_length
+            slot_organization, slot_topic, docs = self._slot_organization, self._slot_topic, self._docs
+            others = postings[1:]
+            length_factor = BM25_K1 * BM25_B / average_length
+            base_norm = BM25_K1 * (1 - BM25_B)
+            results = []
+            for slot, frequency in zip(*postings[0]):
+                if organization_id is not None and slot_organization[slot] != organization_id:
+                    continue
+                if topic_ids is not None and slot_topic[slot] not in topic_ids:
+                    continue
+                note_id = slot_note[slot]
+                if retired and docs.get(note_id) != slot:
+                    continue
+                frequencies = [frequency]
+                for slots, term_frequencies in others:
+                    position = bisect_left(slots, slot)
+                    if position == len(slots) or slots[position] != slot:
+                        break
+                    frequencies.append(term_frequencies[position])
+                else:
+                    norm = base_norm + length_factor * slot_length[slot]
+                    score = 0.0
+                    for idf, frequency in zip(idfs, frequencies):
+                        score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    results.append((note_id, score))
+        if limit is not None:
+            return heapq.nsmallest(limit, results, key=result_order)
+        return sorted(results, key=result_order)
+
+    def note_ids(self) -> set[int]:
+        with self._lock:
+            return set(self._docs)
+
+    def note_versions(self) -> dict[int, int]:
+        """The search version each note was indexed at."""
+        with self._lock:
+            return {note_id: self._slot_version[slot] for note_id, slot in self._docs.items()}
+
+    def save(self, path: str):
+        """Writes a snapshot next to `path` and moves it into place."""
+        with self._lock:
+            if len(self._slot_note) != len(self._docs):
+                self._compact()
+            header = {
+                "byteorder": sys.byteorder,
+                "slots": len(self._slot_note),
+                "terms": [[term, len(slots)] for term, (slots, _) in self._terms.items()],
+                "saved_at": datetime.now(UTC).isoformat(),
+            }
+            arrays = [self._slot_note, self._slot_length, self._slot_organization, self._slot_topic,
+                      self._slot_version]
+            for slots, frequencies in self._terms.values():
+                arrays += [slots, frequencies]
+            encoded = json.dumps(header, ensure_ascii=False).encode()
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary_path = f"{path}.tmp"
+            with open(temporary_path, "wb") as snapshot:
+                snapshot.write(SNAPSHOT_MAGIC)
+                snapshot.write(len(encoded).to_bytes(8, "little"))
+                snapshot.write(encoded)
+                snapshot.write(b"\0" * (-snapshot.tell() % 4))
+                for values in arrays:
+                    snapshot.write(values)
+            os.replace(temporary_path, path)
+            self.saved_at = header["saved_at"]
+
+    def load(self, path: str) -> bool:
+        """Maps a snapshot written by `save`; False when there is no usable one."""
+        try:
+            with open(path, "rb") as snapshot:
+                mapped = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return False
+        if mapped[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            return False
+        position = len(SNAPSHOT_MAGIC) + 8
+        header_length = int.from_bytes(mapped[len(SNAPSHOT_MAGIC):position], "little")
+        header = json.loads(mapped[position:position + header_length])
+        if header["byteorder"] != sys.byteorder:
+            return False
+        position += header_length
+        position += -position % 4
+        view = memoryview(mapped)
+
+        def take(count: int):
+            nonlocal position
+            values = view[position:position + 4 * count].cast("I")
+            position += 4 * count
+            return values
+
+        slots = header["slots"]
+        slot_arrays = [copy_array(take(slots)) for _ in range(5)]
+        terms = {term: (take(count), take(count)) for term, count in header["terms"]}
+        with self._lock:
+            self._reset()
+            (self._slot_note, self._slot_length, self._slot_organization, self._slot_topic,
+             self._slot_version) = slot_arrays
+            self._terms = terms
+            self._docs = {note_id: slot for slot, note_id in enumerate(self._slot_note)}
+            self._total_length = sum(self._slot_length)
+            self._mmap = mapped
+            self.saved_at = header["saved_at"]
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "notes": len(self._docs),
+                "slots": len(self._slot_note),
+                "terms": len(self._terms),
+                "postings": sum(len(slots) for slots, _ in self._terms.values()),
+                "mapped_terms": sum(1 for slots, _ in self._terms.values() if not isinstance(slots, array)),
+                "saved_at": self.saved_at,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._reset()
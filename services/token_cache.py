@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from dotenv import load_dotenv
+import hashlib
+import os
+import threading
+import time
+
+load_dotenv()
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", "300"))
+
+
+def token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenCache:
+    """Claims of already verified JWTs, keyed by the SHA-256 of the token.
+
+    Entries live for at most TOKEN_CACHE_TTL seconds and never past the
+    token's own `exp`, so an expired token is always decoded (and rejected)
+    again. The least recently used entries are dropped past `max_entries`."""
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE, ttl: int = TOKEN_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> dict | None:
+        key = token_digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token: str, claims: dict, exp: int | None):
+        expires_at = time.time() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, exp)
+        key = token_digest(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def evict(self, token: str):
+        with self._lock:
+            self._entries.pop(token_digest(token), None)
+
+    def evict_user(self, user_id: int):
+        with self._lock:
+            for key in [key for key, (claims, _) in self._entries.items() if claims["user_id"] == user_id]:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+token_cache = TokenCache()
@@ -0,0 +1,80 @@
+from dotenv import load_dotenv
+from sqlalchemy import select, func
+from models.notifications import Notification, NotificationStatusEnum
+import os
+import threading
+import time
+
+load_dotenv()
+
+UNREAD_COUNT_TTL = float(os.getenv("UNREAD_COUNT_TTL", "60"))
+
+
+class UnreadCounter:
+    """Per-user count of unread notifications.
+
+    Counts are loaded from the database on first use and then moved by the
+    code that creates, reads and deletes notifications. Each count is
+    re-read from the database after UNREAD_COUNT_TTL seconds, which corrects
+    drift from changes made by other workers."""
+
+    def __init__(self, ttl: float = UNREAD_COUNT_TTL):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, user_id: int) -> int | None:
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    async def get(self, db, user_id: int) -> int:
+        count = self._cached(user_id)
+        if count is not None:
+            return count
+        count = await db.scalar(select(func.count()).select_from(Notification).filter(
+            Notification.user_id == user_id,
+            Notification.status == NotificationStatusEnum.unread
+        ))
+        self.set(user_id, count)
+        return count
+
+    def set(self, user_id: int, count: int):
+        with self._lock:
+            self._counts[user_id] = (count, time.monotonic())
+
+    def add(self, user_id: int, delta: int):
+        """Moves a loaded count; unloaded ones are read fresh on next use."""
+        with self._lock:
+            entry = self._counts.get(user_id)
+            if entry is not None:
+                self._counts[user_id] = (max(0, entry[0] + delta), entry[1])
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._counts.pop(user_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._counts),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+            self.hits = self.misses = 0
+
+
+unread_counter = UnreadCounter()
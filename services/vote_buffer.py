@@ -0,0 +1,166 @@
+from collections import Counter
+from dotenv import load_dotenv
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+from database import AsyncSessionLocal
+from models.note import Note
+from models.user import User
+from services.rank_service import get_rank_for_score, rank_for_score_expression
+from services.organization_ranking import upsert_score_bucket, today
+import asyncio
+import logging
+import os
+import threading
+
+load_dotenv()
+
+VOTE_AGGREGATION = os.getenv("VOTE_AGGREGATION", "off") == "memory"
+VOTE_FLUSH_INTERVAL_MS = int(os.getenv("VOTE_FLUSH_INTERVAL_MS", "500"))
+
+logger = logging.getLogger(__name__)
+
+
+class VoteBuffer:
+    """Write-behind buffer for the `likes`/`score` counters of voted notes.
+
+    With VOTE_AGGREGATION=memory, votes only insert their NoteLike row and
+    leave the counter deltas here; `flush` applies them every
+    VOTE_FLUSH_INTERVAL_MS as one UPDATE per note and author, so a viral note
+    doesn't serialize every like on its row lock. Reads served by this
+    process add the pending deltas back in."""
+
+    def __init__(self, enabled: bool = VOTE_AGGREGATION, flush_interval_ms: int = VOTE_FLUSH_INTERVAL_MS,
+                 session_factory=AsyncSessionLocal):
+        self.enabled = enabled
+        self.flush_interval_ms = flush_interval_ms
+        self.session_factory = session_factory
+        self._likes = Counter()
+        self._scores = Counter()
+        self._buckets = Counter()  # (organization_id, day, user_id) -> delta
+        self._votes = 0
+        # Deltas taken by a running flush stay visible to reads until committed.
+        self._flushing_likes = {}
+        self._flushing_scores = {}
+        self._flushing_buckets = {}
+        self._lock = threading.Lock()
+        self._task = None
+        self.flushes = 0
+        self.flushed_votes = 0
+
+    def add(self, note_id: int, author_id: int, organization_id: int, delta: int):
+        with self._lock:
+            self._likes[note_id] += delta
+            self._scores[author_id] += delta
+            self._buckets[(organization_id, today(), author_id)] += delta
+            self._votes += 1
+
+    def pending_likes(self, note_id: int) -> int:
+        with self._lock:
+            return self._likes.get(note_id, 0) + self._flushing_likes.get(note_id, 0)
+
+    def pending_score(self, user_id: int) -> int:
+        with self._lock:
+            return self._scores.get(user_id, 0) + self._flushing_scores.get(user_id, 0)
+
+    def pending_organization_scores(self, organization_id: int, since) -> dict[int, int]:
+        scores = Counter()
+        with self._lock:
+            for buckets in (self._buckets, self._flushing_buckets):
+                for (bucket_organization_id, day, user_id), delta in buckets.items():
+                    if bucket_organization_id == organization_id and day >= since:
+                        scores[user_id] += delta
+        return dict(scores)
+
+    def merge_notes(self, notes):
+        """Adds pending likes to loaded notes without marking them dirty."""
+        for note in notes:
+            pending = self.pending_likes(note.note_id)
+            if pending:
+                set_committed_value(note, "likes", note.likes + pending)
+        return notes
+
+    def merge_score(self, user_id: int, score: int, rank):
+        pending = self.pending_score(user_id)
+        if not pending:
+            return score, rank
+        return score + pending, get_rank_for_score(score + pending)
+
+    async def flush(self):
+        with self._lock:
+            if self._flushing_likes or self._flushing_scores or self._flushing_buckets:
+                return
+            likes = {note_id: delta for note_id, delta in self._likes.items() if delta}
+            scores = {user_id: delta for user_id, delta in self._scores.items() if delta}
+            buckets = {key: delta for key, delta in self._buckets.items() if delta}
+            votes = self._votes
+            self._likes, self._scores, self._buckets, self._votes = Counter(), Counter(), Counter(), 0
+            self._flushing_likes, self._flushing_scores, self._flushing_buckets = likes, scores, buckets
+        if not likes and not scores and not buckets:
+            return
+        try:
+            async with self.session_factory() as db:
+                for note_id, delta in likes.items():
+                    await db.execute(update(Note).where(Note.note_id == note_id).values(likes=Note.likes + delta))
+                for user_id, delta in scores.items():
+                    await db.execute(update(User).where(User.user_id == user_id).values(
+                        score=User.score + delta, rank=rank_for_score_expression(User.score + delta)
+                    ))
+                for (organization_id, day, user_id), delta in buckets.items():
+                    await db.execute(upsert_score_bucket(db, organization_id, user_id, day, delta))
+                await db.commit()
+        except Exception:
+            logger.exception("Flushing vote deltas failed, keeping them for the next flush")
+            with self._lock:
+                self._likes.update(likes)
+                self._scores.update(scores)
+                self._buckets.update(buckets)
+                self._votes += votes
+                self._flushing_likes, self._flushing_scores, self._flushing_buckets = {}, {}, {}
+            return
+        with self._lock:
+            self._flushing_likes, self._flushing_scores, self._flushing_buckets = {}, {}, {}
+            self.flushes += 1
+            self.flushed_votes += votes
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval_ms / 1000)
+            await self.flush()
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "flush_interval_ms": self.flush_interval_ms,
+                "pending_notes": len(self._likes),
+                "pending_authors": len(self._scores),
+                "pending_votes": self._votes,
+                "flushes": self.flushes,
+                "flushed_votes": self.flushed_votes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._likes.clear()
+            self._scores.clear()
+            self._buckets.clear()
+            self._flushing_likes, self._flushing_scores, self._flushing_buckets = {}, {}, {}
+            self._votes = 0
+            self.flushes = self.flushed_votes = 0
+
+
+vote_buffer = VoteBuffer()
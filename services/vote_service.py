@@ -0,0 +1,94 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import dialect_insert
+from models.note import Note
+from models.note_like import NoteLike, LikeTypeEnum
+from models.user import User
+from models.vote_event import VoteEvent
+from services.rank_service import rank_for_score_expression
+from services.vote_buffer import vote_buffer
+from services.leaderboard import leaderboard
+from services.organization_ranking import upsert_score_bucket, today
+
+VOTE_DELTAS = {
+    LikeTypeEnum.like: 1,
+    LikeTypeEnum.dislike: -1,
+}
+
+
+def add_vote_event(db: AsyncSession, voter_id: int, note, delta: int):
+    db.add(VoteEvent(voter_id=voter_id, author_id=note.user_id, note_id=note.note_id,
+                     organization_id=note.organization_id, delta=delta))
+
+
+async def apply_vote(db: AsyncSession, note_id: int, user_id: int, vote_type: LikeTypeEnum) -> dict:
+    """Records a like/dislike, its vote event and moves the note's, author's
+    and daily organization bucket's counters in a single transaction.
+
+    Duplicates are rejected by the unique (note_id, user_id) constraint via
+    ON CONFLICT DO NOTHING, and the counters are incremented in SQL with
+    RETURNING, so concurrent votes can't overwrite each other. With vote
+    aggregation on, the counters are left to `vote_buffer` instead.
+
+    The note is looked up before the like is inserted: ON CONFLICT DO
+    NOTHING does not cover the foreign key, so a vote on a missing note
+    would otherwise fail with an IntegrityError."""
+    delta = VOTE_DELTAS[vote_type]
+    note = (await db.execute(
+        select(Note.note_id, Note.likes, Note.user_id, Note.organization_id).where(Note.note_id == note_id)
+    )).first()
+    if note is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note does not exist")
+    try:
+        inserted = await db.scalar(
+            dialect_insert(db, NoteLike).values(note_id=note_id, user_id=user_id, type=vote_type)
+            .on_conflict_do_nothing().returning(NoteLike.id)
+        )
+    except IntegrityError:
+        # The note was deleted since it was looked up.
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note does not exist")
+    if inserted is None:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="You have already like/disliked this note")
+    if vote_buffer.enabled:
+        return await buffer_vote(db, note, user_id, delta)
+
+    note = (await db.execute(
+        update(Note).where(Note.note_id == note_id)
+        .values(likes=Note.likes + delta)
+        .returning(Note.note_id, Note.likes, Note.user_id, Note.organization_id)
+    )).first()
+    if note is None:
+        await db.rollback()
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Note does not exist")
+    add_vote_event(db, user_id, note, delta)
+    await db.execute(upsert_score_bucket(db, note.organization_id, note.user_id, today(), delta))
+
+    author = (await db.execute(
+        update(User).where(User.user_id == note.user_id)
+        .values(score=User.score + delta, rank=rank_for_score_expression(User.score + delta))
+        .returning(User.user_id, User.score, User.rank)
+    )).first()
+    await db.commit()
+    leaderboard.update(author.user_id, author.score, author.rank)
+    return {"likes": note.likes, "author_score": author.score,
+            "author_rank": author.rank, "author_id": author.user_id,
+            "note_id": note.note_id}
+
+
+async def buffer_vote(db: AsyncSession, note, user_id: int, delta: int) -> dict:
+    add_vote_event(db, user_id, note, delta)
+    author = (await db.execute(
+        select(User.user_id, User.score, User.rank).where(User.user_id == note.user_id)
+    )).first()
+    await db.commit()
+    vote_buffer.add(note.note_id, author.user_id, note.organization_id, delta)
+    author_score, author_rank = vote_buffer.merge_score(author.user_id, author.score, author.rank)
+    leaderboard.update(author.user_id, author_score, author_rank)
+    return {"likes": note.likes + vote_buffer.pending_likes(note.note_id), "author_score": author_score,
+            "author_rank": author_rank, "author_id": author.user_id,
+            "note_id": note.note_id}
@@ -1,19 +1,40 @@
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine, StaticPool
+from sqlalchemy import create_engine, NullPool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from main import app
-from database import get_db, Base
+from database import get_db, get_async_db, get_session_factory, Base
 from services.auth_serivce import get_current_user
+from services.ai_jobs import ThreadPoolJobBackend, get_job_backend
+from services.ocr_cache import ocr_cache
+from services.token_cache import token_cache
+from services.vote_buffer import vote_buffer
+from services.leaderboard import leaderboard
+from services.unread_counter import unread_counter
+from services.notification_fanout import notification_fanout
+from services.note_search import note_search
+from services.image_pipeline import image_pipeline
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import services.AI_services as AI_services
+import asyncio
+import threading
+import json
 from fastapi import HTTPException, status, Request
 import pytest
+import tempfile
+import os
 
-DATABASE_URL = "sqlite:///:memory:"
+# Sync and async routers have to see the same data, so the tests use a
+# temporary SQLite file shared by both engines instead of :memory:.
+DATABASE_PATH = os.path.join(tempfile.gettempdir(), f"edunotes_test_{os.getpid()}.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool
+    connect_args={"check_same_thread": False}
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{DATABASE_PATH}", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 async def override_get_current_user(request: Request):
     if "authorization" not in request.headers:
@@ -32,17 +53,113 @@ def override_get_db():
     finally:
         db.close()
 
+async def override_get_async_db():
+    async with TestingAsyncSessionLocal() as db:
+        yield db
+
+test_job_backend = ThreadPoolJobBackend(session_factory=TestingSessionLocal, max_workers=2)
+
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
+app.dependency_overrides[get_session_factory] = lambda: TestingSessionLocal
 app.dependency_overrides[get_current_user] = override_get_current_user
+app.dependency_overrides[get_job_backend] = lambda: test_job_backend
+vote_buffer.session_factory = TestingAsyncSessionLocal
+leaderboard.session_factory = TestingAsyncSessionLocal
+notification_fanout.session_factory = TestingSessionLocal
+image_pipeline.session_factory = TestingAsyncSessionLocal
+
+def authenticate(token: str) -> dict:
+    """Resolves a bearer token with the real get_current_user, which the
+    app's routes have overridden."""
+    async def resolve():
+        async with TestingAsyncSessionLocal() as db:
+            return await get_current_user(token, db)
+    return asyncio.run(resolve())
 
 def setup_database():
     Base.metadata.create_all(bind=engine)
 
 def teardown_database():
+    test_job_backend.wait_idle()
     Base.metadata.drop_all(bind=engine)
+    ocr_cache.clear()
+    token_cache.clear()
+    vote_buffer.clear()
+    leaderboard.clear()
+    unread_counter.clear()
+    notification_fanout.clear()
+    note_search.clear()
+    image_pipeline.clear()
+    # Its workers keep the directory they were spawned in; see media_root.
+    asyncio.run(image_pipeline.stop())
+
+class StandInAIHandler(BaseHTTPRequestHandler):
+    """Answers like OCR.space on /parse/image and like DeepSeek on /v1/chat/completions."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.server.requests.append((self.path, body))
+        if self.path.startswith("/v1/chat") and json.loads(body).get("stream"):
+            return self.stream_completion()
+        if self.path.startswith("/parse/image") and self.server.ocr_failures:
+            self.server.ocr_failures -= 1
+            status_code, payload = 503, {"ErrorMessage": "Service unavailable"}
+        elif self.path.startswith("/parse/image"):
+            status_code, payload = 200, {"ParsedResults": [{"ParsedText": self.server.ocr_text}]}
+        else:
+            status_code, payload = self.server.llm_status, {"choices": [{"message": {"content": self.server.llm_text}}]}
+        response = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def stream_completion(self):
+        self.send_response(self.server.llm_status)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in self.server.llm_text.split(" "):
+            chunk = {"choices": [{"delta": {"content": word + " "}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+    def log_message(self, format, *args):
+        pass
 
 # Test fixtures
 
+@pytest.fixture(autouse=True)
+def media_root(tmp_path, monkeypatch):
+    """Runs every test from its own empty directory. Stored media paths are
+    relative to the app root, so uploads, image derivatives and the search
+    index snapshot land in tmp_path instead of the repository."""
+    os.makedirs(tmp_path / "media" / "note_imgs")
+    os.makedirs(tmp_path / "media" / "avatars")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+@pytest.fixture
+def ai_servers(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInAIHandler)
+    server.requests = []
+    server.ocr_text = "Tekst z obrazu"
+    server.ocr_failures = 0
+    server.llm_text = "Podsumowanie testowe"
+    server.llm_status = 200
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setattr(AI_services, "OCR_API_URL", f"{base_url}/parse/image")
+    monkeypatch.setattr(AI_services, "DEEPSEEK_API_URL", f"{base_url}/v1/chat/completions")
+    yield server
+    test_job_backend.wait_idle()
+    server.shutdown()
+    server.server_close()
+
 @pytest.fixture
 def test_organization():
     return {
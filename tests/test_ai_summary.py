@@ -1,9 +1,22 @@
 import pytest
-from .conftest import setup_database, teardown_database, client
+from .conftest import setup_database, teardown_database, client, test_job_backend, TestingSessionLocal, engine
+from services.ai_jobs import JobBackend, run_summary_job
+import services.AI_services as AI_services
+import services.ai_jobs as ai_jobs
+import routers.ai_summary as ai_summary
+from models.ai_summary_job import AISummaryJob, JobStatusEnum
+from models.ocr_cache import OCRCacheEntry
+from PIL import Image
+import asyncio
+import hashlib
+import io
+import json
+import threading
+import time
 
 
 @pytest.fixture(autouse=True)
-def setup():
+def setup(ai_servers):
     setup_database()
     yield
     teardown_database()
@@ -21,11 +34,12 @@ def test_create_ai_summary(test_topic, test_channel, test_organization, headers)
     assert response.status_code == 200
     response = client.post("/ai_summary/?topic_id=1",
                             headers=headers)
-    assert response.status_code == 200
+    assert response.status_code == 202
     data = response.json()
     assert data["success"] is True
-    assert data["message"] == "AI Summary created successfully"
-    assert isinstance(data["data"], dict)
+    assert data["message"] == "AI Summary job queued successfully"
+    assert data["data"]["job_id"] == 1
+    assert data["data"]["topic_id"] == 1
 
 def test_create_ai_summary_without_topic_id(headers, test_channel, test_organization):
     response = client.post("/organizations/",
@@ -52,7 +66,8 @@ def test_get_ai_summary(headers, test_topic, test_channel, test_organization):
     assert response.status_code == 200
     response = client.post("/ai_summary/?topic_id=1",
                           headers=headers)
-    assert response.status_code == 200
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
     response = client.get("/ai_summary/", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -74,7 +89,8 @@ def test_update_ai_summary(headers, test_topic, test_channel, test_organization)
     assert response.status_code == 200
     response = client.post("/ai_summary/?topic_id=1",
                           headers=headers)
-    assert response.status_code == 200
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
     response = client.put(f"/ai_summary/1?topic_id=1", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -82,6 +98,28 @@ def test_update_ai_summary(headers, test_topic, test_channel, test_organization)
     assert data["message"] == "AI Summary updated successfully"
     assert isinstance(data["data"], dict)
 
+def test_update_ai_summary_off_event_loop(monkeypatch, headers, test_topic, test_channel, test_organization):
+    for path, payload in (("/organizations/", test_organization), ("/channels/", test_channel), ("/topics/", test_topic)):
+        assert client.post(path, json=payload, headers=headers).status_code == 200
+    assert client.post("/ai_summary/?topic_id=1", headers=headers).status_code == 202
+    test_job_backend.wait_idle()
+
+    on_loop = []
+    summarize_topic = ai_summary.summarize_topic
+
+    def recording_summarize_topic(*args):
+        try:
+            asyncio.get_running_loop()
+            on_loop.append(True)
+        except RuntimeError:
+            on_loop.append(False)
+        return summarize_topic(*args)
+
+    monkeypatch.setattr(ai_summary, "summarize_topic", recording_summarize_topic)
+    response = client.put("/ai_summary/1?topic_id=1", headers=headers)
+    assert response.status_code == 200
+    assert on_loop == [False]
+
 def test_update_ai_summary_not_found(headers, test_topic, test_channel, test_organization):
     response = client.post("/organizations/",
                           json=test_organization, headers=headers)
@@ -109,7 +147,8 @@ def test_delete_ai_summary(headers, test_topic, test_channel, test_organization)
     assert response.status_code == 200
     response = client.post("/ai_summary/?topic_id=1",
                           headers=headers)
-    assert response.status_code == 200
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
     response = client.delete("/ai_summary/1", headers=headers)
     assert response.status_code == 200
     data = response.json()
@@ -152,4 +191,435 @@ def test_create_ai_summary_without_topic(headers, test_channel, test_organizatio
     assert response.status_code == 422
     data = response.json()
     assert data["detail"][0]["msg"] == "Field required"
-    assert data["detail"][0]["loc"] == ["query", "topic_id"]
\ No newline at end of file
+    assert data["detail"][0]["loc"] == ["query", "topic_id"]
+
+def test_create_ai_summary_topic_not_found(headers):
+    response = client.post("/ai_summary/?topic_id=999", headers=headers)
+    assert response.status_code == 404
+    data = response.json()
+    assert data["detail"] == "Topic not found"
+
+def test_ai_summary_job_done(ai_servers, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Text", "content_type": "text", "content": "Notatka tekstowa",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Image", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slide.png", b"png-bytes", "image/png")},
+                           headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    job_id = response.json()["data"]["job_id"]
+    test_job_backend.wait_idle()
+
+    response = client.get(f"/ai_summary/jobs/{job_id}", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["data"]["status"] == "done"
+    assert data["data"]["summary_id"] == 1
+
+    response = client.get("/ai_summary/", headers=headers)
+    assert response.json()["data"][0]["summary_text"] == "Podsumowanie testowe"
+    paths = [path for path, body in ai_servers.requests]
+    assert paths == ["/parse/image", "/v1/chat/completions"]
+    assert "Notatka tekstowa" in ai_servers.requests[1][1].decode()
+    assert "Tekst z obrazu" in ai_servers.requests[1][1].decode()
+
+    # The OCR text makes the image note searchable without touching its version.
+    response = client.get("/notes/search?q=obrazu", headers=headers)
+    assert response.status_code == 200
+    assert [note["note_id"] for note in response.json()["data"]] == [2]
+    assert response.json()["data"][0]["updated_at"] is None
+
+def test_ai_summary_job_failed(ai_servers, headers, test_topic, test_channel, test_organization):
+    ai_servers.llm_status = 500
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Text", "content_type": "text", "content": "Notatka tekstowa",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    response = client.get("/ai_summary/jobs/1", headers=headers)
+    data = response.json()
+    assert data["data"]["status"] == "failed"
+    assert "500" in data["data"]["error"]
+    assert data["data"]["summary_id"] is None
+
+def test_get_ai_summary_job_not_found(headers):
+    response = client.get("/ai_summary/jobs/999", headers=headers)
+    assert response.status_code == 404
+    data = response.json()
+    assert data["detail"] == "AI Summary job not found"
+
+def test_concurrent_ai_summary_requests_share_job(monkeypatch, headers, test_topic, test_channel,
+                                                  test_organization):
+    submitted = []
+    monkeypatch.setattr(test_job_backend, "submit", submitted.append)
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Text", "content_type": "text", "content": "Notatka tekstowa",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+
+    first = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    second = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    assert first["message"] == "AI Summary job queued successfully"
+    assert second["message"] == "AI Summary job already in progress"
+    assert second["data"]["job_id"] == first["data"]["job_id"]
+    assert submitted == [first["data"]["job_id"]]
+
+    # A changed note set is a different computation and gets its own job.
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    third = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    assert third["message"] == "AI Summary job queued successfully"
+    assert third["data"]["job_id"] != first["data"]["job_id"]
+
+    # Finished jobs release their lease.
+    run_summary_job(third["data"]["job_id"], TestingSessionLocal)
+    fourth = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    assert fourth["message"] == "AI Summary job queued successfully"
+    assert len(submitted) == 3
+
+def test_expired_ai_summary_lease_taken_over(monkeypatch, headers, test_topic, test_channel, test_organization):
+    submitted = []
+    monkeypatch.setattr(test_job_backend, "submit", submitted.append)
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+
+    monkeypatch.setattr(ai_jobs, "AI_SUMMARY_LEASE_SECONDS", -1)
+    first = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    second = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+    assert second["message"] == "AI Summary job queued successfully"
+    assert second["data"]["job_id"] != first["data"]["job_id"]
+    assert len(submitted) == 2
+
+def test_recover_requeues_running_jobs_with_expired_lease(monkeypatch, headers, test_topic, test_channel,
+                                                         test_organization):
+    submitted = []
+    monkeypatch.setattr(test_job_backend, "submit", submitted.append)
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+
+    monkeypatch.setattr(ai_jobs, "AI_SUMMARY_LEASE_SECONDS", -1)
+    crashed = client.post("/ai_summary/?topic_id=1", headers=headers).json()["data"]["job_id"]
+    monkeypatch.undo()
+    monkeypatch.setattr(test_job_backend, "submit", submitted.append)
+    note = {"title": "Text", "content_type": "text", "content": "Notatka tekstowa",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    alive = client.post("/ai_summary/?topic_id=1", headers=headers).json()["data"]["job_id"]
+    with TestingSessionLocal() as db:
+        db.query(AISummaryJob).update({AISummaryJob.status: JobStatusEnum.running})
+        db.commit()
+    submitted.clear()
+
+    test_job_backend.recover()
+    assert submitted == [crashed]
+    with TestingSessionLocal() as db:
+        assert db.get(AISummaryJob, crashed).status == JobStatusEnum.queued
+        assert db.get(AISummaryJob, alive).status == JobStatusEnum.running
+
+def test_running_job_keeps_its_lease(monkeypatch, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    started, release = threading.Event(), threading.Event()
+
+    def slow_summary(topic_id, db):
+        started.set()
+        release.wait(10)
+        return AI_services.SummaryResult(text="Podsumowanie", covered_notes={})
+
+    monkeypatch.setattr(ai_jobs, "summarize_topic", slow_summary)
+    monkeypatch.setattr(ai_jobs, "AI_SUMMARY_LEASE_SECONDS", 0.3)
+    first = client.post("/ai_summary/?topic_id=1", headers=headers).json()["data"]["job_id"]
+    try:
+        assert started.wait(5)
+        # Well past the lease period, the job is still the topic's in-flight one.
+        time.sleep(0.8)
+        second = client.post("/ai_summary/?topic_id=1", headers=headers).json()
+        assert second["message"] == "AI Summary job already in progress"
+        assert second["data"]["job_id"] == first
+        submitted = []
+        monkeypatch.setattr(test_job_backend, "submit", submitted.append)
+        test_job_backend.recover()
+        assert submitted == []
+    finally:
+        release.set()
+        test_job_backend.wait_idle()
+    response = client.get(f"/ai_summary/jobs/{first}", headers=headers)
+    assert response.json()["data"]["status"] == "done"
+
+def test_job_backend_requires_submit():
+    with pytest.raises(TypeError):
+        JobBackend()
+
+def test_ocr_cache_reused_on_resummarize(ai_servers, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Image", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    for filename in ("slide.png", "slide_copy.png"):
+        response = client.post("/notes/", data=note, files={"image": (filename, b"same-bytes", "image/png")},
+                               headers=headers)
+        assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+    response = client.put("/ai_summary/1?topic_id=1&full_regeneration=true", headers=headers)
+    assert response.status_code == 200
+
+    ocr_calls = [path for path, body in ai_servers.requests if path == "/parse/image"]
+    assert len(ocr_calls) == 1
+    response = client.get("/ai_summary/ocr_cache", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()["data"]
+    assert stats["misses"] == 1
+    assert stats["memory_hits"] == 1
+    assert stats["entries"] == 1
+
+def test_ocr_sends_downscaled_image(ai_servers, headers, test_topic, test_channel, test_organization):
+    for path, payload in (("/organizations/", test_organization), ("/channels/", test_channel), ("/topics/", test_topic)):
+        assert client.post(path, json=payload, headers=headers).status_code == 200
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize((3000, 2000)).convert("RGB").save(buffer, "PNG")
+    image = buffer.getvalue()
+    note = {"title": "Image", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slide.png", image, "image/png")}, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    # The image pipeline's grayscale JPEG goes to OCR instead of the PNG...
+    ocr_bodies = [body for path, body in ai_servers.requests if path == "/parse/image"]
+    assert len(ocr_bodies) == 1
+    assert b"\xff\xd8\xff" in ocr_bodies[0] and image[:8] not in ocr_bodies[0]
+    # ...and the text is cached under the original's hash, as before.
+    db = TestingSessionLocal()
+    try:
+        assert [entry.content_hash for entry in db.query(OCRCacheEntry)] == [hashlib.sha256(image).hexdigest()]
+    finally:
+        db.close()
+
+def test_ocr_retried_after_server_error(ai_servers, monkeypatch, headers, test_topic, test_channel,
+                                        test_organization):
+    monkeypatch.setattr(AI_services, "OCR_RETRY_BACKOFF", 0)
+    ai_servers.ocr_failures = 1
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Image", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slide.png", b"png-bytes", "image/png")},
+                           headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    ocr_calls = [path for path, body in ai_servers.requests if path == "/parse/image"]
+    assert len(ocr_calls) == 2
+    assert "Tekst z obrazu" in ai_servers.requests[-1][1].decode()
+
+@pytest.mark.parametrize("retries", [-1, 0])
+def test_ocr_without_retries(ai_servers, monkeypatch, retries):
+    monkeypatch.setattr(AI_services, "OCR_MAX_RETRIES", retries)
+    assert AI_services.http_client.run(AI_services.ocr_space_image_bytes(b"png-bytes")) == "Tekst z obrazu"
+    ai_servers.ocr_failures = 1
+    with pytest.raises(AI_services.OCRError):
+        AI_services.http_client.run(AI_services.ocr_space_image_bytes(b"png-bytes"))
+
+def llm_prompts(ai_servers):
+    return [json.loads(body)["messages"][1]["content"]
+            for path, body in ai_servers.requests if path == "/v1/chat/completions"]
+
+def test_update_ai_summary_incremental(ai_servers, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "First", "content_type": "text", "content": "Pierwsza notatka",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    response = client.put("/ai_summary/1?topic_id=1", headers=headers)
+    assert response.status_code == 200
+    assert len(llm_prompts(ai_servers)) == 1
+
+    note = {"title": "Second", "content_type": "text", "content": "Druga notatka",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    response = client.put("/ai_summary/1?topic_id=1", headers=headers)
+    assert response.status_code == 200
+    assert set(response.json()["data"]["covered_notes"]) == {"1", "2"}
+    prompt = llm_prompts(ai_servers)[-1]
+    assert "Podsumowanie testowe" in prompt
+    assert "Druga notatka" in prompt
+    assert "Pierwsza notatka" not in prompt
+
+    response = client.put("/ai_summary/1?topic_id=1&full_regeneration=true", headers=headers)
+    assert response.status_code == 200
+    prompt = llm_prompts(ai_servers)[-1]
+    assert "Pierwsza notatka" in prompt
+    assert "Druga notatka" in prompt
+
+def test_update_ai_summary_after_note_deleted(ai_servers, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    for content in ("Pierwsza notatka", "Druga notatka"):
+        note = {"title": "Note", "content_type": "text", "content": content, "topic_id": 1, "organization_id": 1}
+        response = client.post("/notes/", data=note, headers=headers)
+        assert response.status_code == 200
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    response = client.delete("/notes/2", headers=headers)
+    assert response.status_code == 200
+    response = client.put("/ai_summary/1?topic_id=1", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["covered_notes"].keys() == {"1"}
+    prompt = llm_prompts(ai_servers)[-1]
+    assert "Pierwsza notatka" in prompt
+    assert "Druga notatka" not in prompt
+
+def test_ai_summary_map_reduce(ai_servers, monkeypatch, headers, test_topic, test_channel, test_organization):
+    monkeypatch.setattr(AI_services, "AI_CHUNK_TOKENS", 30)
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    for i in range(3):
+        note = {"title": "Note", "content_type": "text", "content": f"Notatka numer {i} " + "x" * 80,
+                "topic_id": 1, "organization_id": 1}
+        response = client.post("/notes/", data=note, headers=headers)
+        assert response.status_code == 200
+
+    response = client.post("/ai_summary/?topic_id=1", headers=headers)
+    assert response.status_code == 202
+    test_job_backend.wait_idle()
+
+    prompts = llm_prompts(ai_servers)
+    assert len(prompts) == 4
+    assert all("fragment notatek" in prompt for prompt in prompts[:3])
+    assert "Notatka numer" not in prompts[3]
+    response = client.get("/ai_summary/", headers=headers)
+    timings = response.json()["data"][0]["timings"]
+    assert timings["map_rounds"] == 1
+    assert {"collect_ms", "map_ms", "reduce_ms", "total_ms"} <= timings.keys()
+
+def test_chunk_notes_respects_budget():
+    chunks = AI_services.chunk_notes(["a" * 40, "b" * 40, "c" * 200], chunk_tokens=25)
+    assert all(sum(AI_services.estimate_tokens(note) for note in chunk) <= 25 for chunk in chunks)
+    assert "".join("".join(chunk) for chunk in chunks) == "a" * 40 + "b" * 40 + "c" * 200
+    assert AI_services.apply_token_budget(["a" * 40, "b" * 40], budget=15) == ["a" * 40, "b" * 12]
+
+def test_stream_ai_summary(ai_servers, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Text", "content_type": "text", "content": "Notatka tekstowa",
+            "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/ai_summary/stream?topic_id=1", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        event, data = block.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    tokens = [data["text"] for event, data in events if event == "token"]
+    assert "".join(tokens).strip() == "Podsumowanie testowe"
+    assert events[-1][0] == "done"
+    assert events[-1][1]["summary_id"] == 1
+    assert events[-1][1]["ttft_ms"] is not None
+    # Every session the stream opened has given its connection back.
+    assert engine.pool.checkedout() == 0
+
+    response = client.get("/ai_summary/", headers=headers)
+    assert response.json()["data"][0]["summary_text"].strip() == "Podsumowanie testowe"
+    response = client.get("/ai_summary/metrics", headers=headers)
+    assert response.json()["data"]["stream_ttft"]["count"] >= 1
+
+def test_stream_ai_summary_prepare_failed(monkeypatch, headers, test_topic, test_channel, test_organization):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+
+    def failing_prepare(topic_id, db):
+        raise AI_services.SummaryError("Błąd DeepSeek API: 500")
+
+    monkeypatch.setattr(ai_summary, "prepare_topic_summary", failing_prepare)
+    response = client.get("/ai_summary/stream?topic_id=1", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Failed to generate summary"
+    assert engine.pool.checkedout() == 0
+
+def test_stream_ai_summary_topic_not_found(headers):
+    response = client.get("/ai_summary/stream?topic_id=999", headers=headers)
+    assert response.status_code == 404
@@ -1,5 +1,13 @@
 import pytest
-from .conftest import setup_database, teardown_database, client
+from passlib.context import CryptContext
+from .conftest import setup_database, teardown_database, client, TestingSessionLocal, authenticate, test_user
+from models.user import User
+from services.hashing_service import password_hasher
+from services.auth_serivce import create_access_token
+from services.token_cache import token_cache
+import services.auth_serivce as auth_serivce
+from datetime import timedelta
+from fastapi import HTTPException
 
 @pytest.fixture(autouse=True)
 def setup_and_teardown():
@@ -54,3 +62,67 @@ def test_login_invalid_credentials(test_auth_data):
     data = response.json()
     assert data["detail"] == "Could not validate credentials"
 
+def test_login_rehashes_outdated_password_hash(monkeypatch, test_auth_data):
+    monkeypatch.setattr(password_hasher, "context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=4))
+    client.post("/auth/register/", json=test_auth_data)
+    monkeypatch.setattr(password_hasher, "context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+    login_data = {
+        "username": test_auth_data["username"],
+        "password": test_auth_data["password"]
+    }
+    response = client.post("/auth/login", data=login_data)
+    assert response.status_code == 200
+    db = TestingSessionLocal()
+    try:
+        password_hash = db.query(User).filter(User.username == test_auth_data["username"]).first().password_hash
+    finally:
+        db.close()
+    assert password_hash.startswith("$2b$05$")
+    response = client.post("/auth/login", data=login_data)
+    assert response.status_code == 200
+
+def test_hashing_stats(test_auth_data):
+    completed = password_hasher.stats()["completed"]
+    client.post("/auth/register/", json=test_auth_data)
+    response = client.get("/auth/hashing_stats")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert data["completed"] == completed + 1
+    assert data["pending"] == 0
+    assert data["workers"] == password_hasher.max_workers
+
+def test_get_current_user_caches_verified_token(monkeypatch, test_user):
+    client.post("/auth/register", json=test_user)
+    token = create_access_token("testuser", 1, "test@wp.pl", timedelta(minutes=30))
+    user = authenticate(token)
+    assert user == {"username": "testuser", "user_id": 1, "email": "test@wp.pl"}
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError("cached token decoded again")
+    monkeypatch.setattr(auth_serivce.jwt, "decode", fail_decode)
+    assert authenticate(token) == user
+    stats = token_cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+def test_token_cache_entry_never_outlives_exp():
+    token = create_access_token("testuser", 1, "test@wp.pl", timedelta(seconds=-1))
+    with pytest.raises(HTTPException):
+        authenticate(token)
+    token_cache.put(token, {"username": "testuser", "user_id": 1, "email": "test@wp.pl"}, exp=1)
+    assert token_cache.get(token) is None
+    assert token_cache.stats()["entries"] == 0
+
+def test_token_cache_evict_user(test_user):
+    client.post("/auth/register", json=test_user)
+    client.post("/auth/register", json=dict(test_user, username="other", email="other@wp.pl"))
+    first = create_access_token("testuser", 1, "test@wp.pl", timedelta(minutes=30))
+    second = create_access_token("other", 2, "other@wp.pl", timedelta(minutes=30))
+    authenticate(first)
+    authenticate(second)
+    token_cache.evict_user(1)
+    assert token_cache.get(first) is None
+    assert token_cache.get(second) is not None
+    token_cache.evict(second)
+    assert token_cache.stats()["entries"] == 0
@@ -1,5 +1,10 @@
 import pytest
-from .conftest import setup_database, teardown_database, client
+from .conftest import setup_database, teardown_database, client, TestingSessionLocal
+from models.notifications import Notification
+from models.organization import Organization
+from models.organization_user import OrganizationUser
+from models.user import User
+from services.notification_fanout import notification_fanout
 
 @pytest.fixture(autouse=True)
 def setup_and_teardown():
@@ -150,3 +155,35 @@ def test_delete_deadline_not_found():
 
 
 
+
+def add_organization_members(user_ids, organization_id=1):
+    db = TestingSessionLocal()
+    try:
+        db.add(Organization(organization_id=organization_id, organization_name="Test Organization"))
+        db.add_all([User(user_id=user_id, username=f"user{user_id}", first_name="Test", last_name="User",
+                         email=f"user{user_id}@example.com", password_hash="x") for user_id in user_ids])
+        db.add_all([OrganizationUser(organization_id=organization_id, user_id=user_id) for user_id in user_ids])
+        db.commit()
+    finally:
+        db.close()
+
+def test_create_deadline_notifies_organization(test_deadline_exam, monkeypatch):
+    add_organization_members(range(1, 6))
+    monkeypatch.setattr(notification_fanout, "chunk_size", 2)
+    response = client.post("/deadlines/",
+                           data=test_deadline_exam,
+                           headers={"Authorization": "Bearer test_token"})
+    assert response.status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        notifications = db.query(Notification).order_by(Notification.user_id).all()
+    finally:
+        db.close()
+    # The creator is not notified about their own deadline.
+    assert [notification.user_id for notification in notifications] == [2, 3, 4, 5]
+    assert notifications[0].message == "New Egzamin in your organization: Test Exam Name on 2023-10-01."
+    stats = client.get("/notifications/fanout_stats").json()["data"]
+    assert stats["runs"] == 1
+    assert stats["notifications"] == 4
+    assert stats["last_recipients"] == 4
@@ -1,6 +1,27 @@
 import pytest
-from .conftest import (setup_database, teardown_database, client,
+import asyncio
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import select, text
+from .conftest import (setup_database, teardown_database, client, TestingAsyncSessionLocal, TestingSessionLocal,
                        headers, test_organization, test_channel, test_topic, test_user)
+from models.note_like import LikeTypeEnum
+from services.vote_service import apply_vote
+from services.vote_buffer import VoteBuffer, vote_buffer
+from services.organization_ranking import today
+from models.note import Note
+from services.note_search import IndexSearch
+from services.search_index import InvertedIndex, tokenize
+from services.AI_services import store_ocr_texts
+import routers.notes
+import services.media_service as media_service
+import services.media_cleanup as media_cleanup
+from models.media_object import MediaObject
+from services.image_pipeline import image_pipeline
+from services.image_variants import supported_formats
+from PIL import Image
+import hashlib
+import io
+import os
 
 
 @pytest.fixture(autouse=True)
@@ -329,6 +350,187 @@ def test_create_note_image(headers, test_organization, test_channel, test_topic,
     assert data["message"] == "Note created successfully"
     assert data["data"]["title"] == test_note_image["title"]
 
+def media_files():
+    return {os.path.join(root, name) for root, _, names in os.walk(media_service.MEDIA_OBJECTS_DIR) for name in names}
+
+def test_create_note_image_upload(monkeypatch, headers):
+    monkeypatch.setattr(media_service, "MEDIA_CHUNK_BYTES", 4)
+    before = media_files()
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    image = bytes(range(256)) * 4
+    sha256 = hashlib.sha256(image).hexdigest()
+    response = client.post("/notes/", data=note, files={"image": ("../../slajd.PNG", image, "image/png")},
+                           headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["image_url"] == f"/media/objects/{sha256[:2]}/{sha256[2:4]}/{sha256}.png"
+
+    # Copied chunk by chunk into its sharded place, with no temporary file left.
+    path = media_service.object_path(sha256, ".png")
+    assert media_files() - before == {path}
+    with open(path, "rb") as stored:
+        assert stored.read() == image
+
+    response = client.delete("/notes/1", headers=headers)
+    assert response.status_code == 200
+    assert not os.path.exists(path)
+
+def test_create_note_image_too_large(monkeypatch, headers):
+    monkeypatch.setattr(media_service, "MEDIA_CHUNK_BYTES", 4)
+    monkeypatch.setattr(routers.notes, "NOTE_IMAGE_MAX_BYTES", 10)
+    before = media_files()
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slajd.png", b"x" * 11, "image/png")},
+                           headers=headers)
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File too large"
+    assert media_files() == before
+    assert client.get("/notes/1").status_code == 404
+
+def test_note_images_deduplicated(headers):
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    image_urls = []
+    for filename in ("slajd.png", "slajd (1).png"):
+        response = client.post("/notes/", data=note, files={"image": (filename, b"ten sam slajd", "image/png")},
+                               headers=headers)
+        assert response.status_code == 200
+        image_urls.append(response.json()["data"]["image_url"])
+    assert image_urls[0] == image_urls[1]
+    path = image_urls[0].lstrip("/")
+
+    db = TestingSessionLocal()
+    try:
+        media_object = db.query(MediaObject).one()
+        assert (media_object.path, media_object.ref_count) == (path, 2)
+    finally:
+        db.close()
+
+    # The bytes go with the last note that uses them.
+    client.delete("/notes/1", headers=headers)
+    assert os.path.exists(path)
+    client.delete("/notes/2", headers=headers)
+    assert not os.path.exists(path)
+    db = TestingSessionLocal()
+    try:
+        assert db.query(MediaObject).count() == 0
+    finally:
+        db.close()
+
+def test_released_media_reused_before_removal():
+    def upload():
+        return UploadFile(io.BytesIO(b"ten sam slajd"), filename="slajd.png")
+
+    async def media_object(db, sha256):
+        return (await db.execute(select(MediaObject.ref_count, MediaObject.path)
+                                 .filter(MediaObject.sha256 == sha256))).first()
+
+    async def scenario():
+        async with TestingAsyncSessionLocal() as db:
+            stored = await media_service.store_media(db, upload(), 100)
+            await db.commit()
+            path = await media_service.release_media(db, stored.sha256)
+            await db.commit()
+            # The row outlives the last reference until the file is removed;
+            # an upload in between takes it back instead of inserting anew.
+            assert path == stored.path
+            assert tuple(await media_object(db, stored.sha256)) == (0, path)
+            again = await media_service.store_media(db, upload(), 100)
+            await db.commit()
+            assert again.path == path
+            await media_service.remove_media_file(db, stored.sha256, path)
+            assert os.path.exists(path)
+            assert tuple(await media_object(db, stored.sha256)) == (1, path)
+
+            # A reference taken while the file was being removed brings it back.
+            os.remove(path)
+            await media_service.store_media(db, upload(), 100)
+            await db.commit()
+            assert os.path.exists(path)
+            assert (await media_object(db, stored.sha256)).ref_count == 2
+
+    asyncio.run(scenario())
+
+def test_remove_legacy_media(headers):
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    client.post("/notes/", data=note, files={"image": ("slajd.png", b"stary slajd", "image/png")}, headers=headers)
+    copied, referenced, unstored = (os.path.join("media", "note_imgs", name)
+                                    for name in ("copied.png", "referenced.png", "unstored.png"))
+    for path, content in ((copied, b"stary slajd"), (referenced, b"stary slajd"), (unstored, b"inny slajd")):
+        with open(path, "wb") as file:
+            file.write(content)
+    db = TestingSessionLocal()
+    try:
+        # As if the upgrade had been rolled back for this note.
+        db.add(Note(title="Stary", content_type="image", image_url="/" + referenced.replace(os.sep, "/"),
+                    topic_id=1, organization_id=1, user_id=1))
+        db.commit()
+        assert media_cleanup.remove_legacy_media(db) == [copied]
+        assert not os.path.exists(copied)
+        assert os.path.exists(referenced) and os.path.exists(unstored)
+    finally:
+        db.close()
+
+def png_bytes(size: tuple[int, int]) -> bytes:
+    buffer = io.BytesIO()
+    Image.linear_gradient("L").resize(size).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+def test_note_image_variants(headers):
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slajd.png", png_bytes((2400, 1600)), "image/png")},
+                           headers=headers)
+    assert response.status_code == 200
+    path = response.json()["data"]["image_url"].lstrip("/")
+
+    # Rendered by the background task once the note was stored.
+    variants = client.get("/notes/1").json()["data"]["image_variants"]
+    formats = supported_formats(["avif", "webp"])
+    assert "webp" in formats
+    assert [(variant["name"], variant["width"], variant["height"]) for variant in variants] == (
+        [("thumb", 320, 213)] * len(formats) + [("medium", 1280, 853)] * len(formats)
+    )
+    for variant in variants:
+        assert variant["url"].startswith(os.path.splitext("/" + path)[0] + ".")
+        assert os.path.getsize(variant["url"].lstrip("/")) == variant["size"]
+    with Image.open(os.path.splitext(path)[0] + ".ocr.jpg") as ocr:
+        assert (ocr.mode, ocr.size) == ("L", (2000, 1333))
+    stats = client.get("/notes/image_stats").json()["data"]
+    assert (stats["rendered"], stats["failed"]) == (1, 0)
+
+    # The same bytes again reuse the derivatives.
+    response = client.post("/notes/", data=note, files={"image": ("kopia.png", png_bytes((2400, 1600)), "image/png")},
+                           headers=headers)
+    assert response.json()["data"]["image_url"] == "/" + path
+    assert client.get("/notes/2").json()["data"]["image_variants"] == variants
+    assert client.get("/notes/image_stats").json()["data"]["skipped"] == 1
+
+    client.delete("/notes/1", headers=headers)
+    client.delete("/notes/2", headers=headers)
+    assert not any(file.startswith(os.path.splitext(path)[0]) for file in media_files())
+
+def test_note_image_unreadable(headers):
+    note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, files={"image": ("slajd.png", b"not an image", "image/png")},
+                           headers=headers)
+    assert response.status_code == 200
+    assert client.get("/notes/1").json()["data"]["image_variants"] == []
+    assert client.get("/notes/image_stats").json()["data"]["failed"] == 1
+
+def test_pending_images_rendered(monkeypatch, headers):
+    async def not_running(sha256):
+        pass
+
+    with monkeypatch.context() as patch:
+        # Stored while the pipeline was not running.
+        patch.setattr(image_pipeline, "process", not_running)
+        note = {"title": "Slajd", "content_type": "image", "topic_id": 1, "organization_id": 1}
+        client.post("/notes/", data=note, files={"image": ("slajd.png", png_bytes((200, 100)), "image/png")},
+                    headers=headers)
+    assert client.get("/notes/1").json()["data"]["image_variants"] == []
+
+    asyncio.run(image_pipeline.process_pending())
+    variants = client.get("/notes/1").json()["data"]["image_variants"]
+    assert {(variant["name"], variant["width"]) for variant in variants} == {("thumb", 200), ("medium", 200)}
+
 def test_create_note_no_auth(test_note_text):
     form_data = {
         "title": test_note_text["title"],
@@ -374,3 +576,326 @@ def test_delete_note_not_found(headers):
     assert response.status_code == 404
     data = response.json()
     assert data["detail"] == "Note not found"
+
+def test_read_notes_in_topic_paginated(headers, test_organization, test_channel, test_topic, test_note_text):
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+
+    for i in range(5):
+        form_data = {
+            "title": f"Note {i}",
+            "content_type": test_note_text["content_type"],
+            "content": test_note_text["content"],
+            "topic_id": test_note_text["topic_id"],
+            "organization_id": test_note_text["organization_id"]
+        }
+        response = client.post("/notes/", data=form_data, headers=headers)
+        assert response.status_code == 200
+
+    titles = []
+    cursor = None
+    for _ in range(3):
+        url = "/notes/notes_in_topic?topic_id=1&limit=2"
+        if cursor:
+            url += f"&cursor={cursor}"
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        data = response.json()
+        assert data["limit"] == 2
+        titles += [note["title"] for note in data["data"]]
+        cursor = data["next_cursor"]
+    assert titles == [f"Note {i}" for i in range(5)]
+    assert cursor is None
+
+def test_read_notes_invalid_cursor(headers):
+    response = client.get("/notes/?cursor=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+    data = response.json()
+    assert data["detail"] == "Invalid cursor"
+
+def test_concurrent_votes_are_not_lost(headers, test_organization, test_channel, test_topic, test_note_text, test_user):
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    form_data = {key: test_note_text[key] for key in ("title", "content_type", "content", "topic_id", "organization_id")}
+    response = client.post("/notes/", data=form_data, headers=headers)
+    assert response.status_code == 200
+
+    async def vote(user_id, vote_type):
+        async with TestingAsyncSessionLocal() as db:
+            return await apply_vote(db, 1, user_id, vote_type)
+
+    async def vote_concurrently():
+        likes = [vote(user_id, LikeTypeEnum.like) for user_id in range(2, 27)]
+        dislikes = [vote(user_id, LikeTypeEnum.dislike) for user_id in range(27, 32)]
+        return await asyncio.gather(*likes, *dislikes)
+
+    votes = asyncio.run(vote_concurrently())
+    assert len(votes) == 30
+
+    response = client.get("/notes/1", headers=headers)
+    assert response.json()["data"]["likes"] == 20
+    response = client.get("/ranking/1", headers=headers)
+    data = response.json()["data"]
+    assert data["score"] == 20
+    assert data["rank"] == "specalista"
+
+@pytest.mark.parametrize("buffered", [False, True])
+def test_vote_on_missing_note(monkeypatch, buffered, test_user):
+    monkeypatch.setattr(vote_buffer, "enabled", buffered)
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+
+    async def vote():
+        async with TestingAsyncSessionLocal() as db:
+            # Enforce foreign keys like Postgres does.
+            await db.execute(text("PRAGMA foreign_keys=ON"))
+            with pytest.raises(HTTPException) as error:
+                await apply_vote(db, 999, 1, LikeTypeEnum.like)
+            return error.value
+
+    error = asyncio.run(vote())
+    assert (error.status_code, error.detail) == (404, "Note does not exist")
+
+def test_buffered_votes_merged_into_reads(monkeypatch, headers, test_organization, test_channel, test_topic,
+                                          test_note_text, test_user):
+    monkeypatch.setattr(vote_buffer, "enabled", True)
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    form_data = {key: test_note_text[key] for key in ("title", "content_type", "content", "topic_id", "organization_id")}
+    response = client.post("/notes/", data=form_data, headers=headers)
+    assert response.status_code == 200
+
+    response = client.post("/notes/give_like?note_id=1", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"]["likes"] == 1
+    assert response.json()["data"]["author_score"] == 1
+    response = client.post("/notes/give_like?note_id=1", headers=headers)
+    assert response.status_code == 400
+
+    def stored_likes():
+        db = TestingSessionLocal()
+        try:
+            return db.query(Note.likes).filter(Note.note_id == 1).scalar()
+        finally:
+            db.close()
+
+    assert stored_likes() == 0
+    assert client.get("/notes/1", headers=headers).json()["data"]["likes"] == 1
+    assert client.get("/notes/notes_in_topic?topic_id=1", headers=headers).json()["data"][0]["likes"] == 1
+    assert client.get("/ranking/1", headers=headers).json()["data"]["score"] == 1
+
+    asyncio.run(vote_buffer.flush())
+    assert stored_likes() == 1
+    assert client.get("/notes/1", headers=headers).json()["data"]["likes"] == 1
+    assert client.get("/ranking/1", headers=headers).json()["data"]["score"] == 1
+    stats = vote_buffer.stats()
+    assert stats["flushed_votes"] == 1
+    assert stats["pending_votes"] == 0
+
+def test_vote_buffer_clear_drops_in_flight_deltas():
+    buffer = VoteBuffer()
+    buffer._flushing_likes, buffer._flushing_scores = {1: 2}, {1: 2}
+    buffer._flushing_buckets = {(1, today(), 1): 2}
+    buffer.clear()
+    assert buffer.pending_likes(1) == 0
+    assert buffer.pending_score(1) == 0
+    assert buffer.pending_organization_scores(1, today()) == {}
+
+def add_search_notes():
+    db = TestingSessionLocal()
+    try:
+        db.add_all([
+            Note(title="Całki oznaczone", content="Przykłady z ćwiczeń", content_type="text",
+                 topic_id=1, organization_id=1, user_id=1),
+            Note(title="Kolokwium", content="Zakres: całki i pochodne", content_type="text",
+                 topic_id=1, organization_id=1, user_id=1),
+            Note(title="Slajd", content_type="image", image_url="/media/note_imgs/slajd.png",
+                 ocr_text="Całki niewłaściwe", topic_id=2, organization_id=1, user_id=1),
+            Note(title="Całki w innej organizacji", content="Nie powinno się pojawić", content_type="text",
+                 topic_id=3, organization_id=2, user_id=1),
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def test_search_notes_ranked(headers):
+    add_search_notes()
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Notes retrieved successfully"
+    # Title matches rank first; OCR text of image notes is searched too.
+    assert [note["note_id"] for note in data["data"]][0] == 1
+    assert sorted(note["note_id"] for note in data["data"]) == [1, 2, 3]
+
+    # Every word has to match.
+    response = client.get("/notes/search?q=całki pochodne", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [2]
+
+def test_search_notes_without_diacritics(headers):
+    add_search_notes()
+    response = client.get("/notes/search?q=cwiczen", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [1]
+
+def test_search_notes_scoped(headers):
+    add_search_notes()
+    response = client.get("/notes/search?q=całki&topic_id=2", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [3]
+    response = client.get("/notes/search?q=całki&organization_id=2", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [4]
+
+def test_search_notes_paginated(headers):
+    add_search_notes()
+    response = client.get("/notes/search?q=całki&limit=2", headers=headers)
+    data = response.json()
+    assert len(data["data"]) == 2
+    assert data["next_cursor"] is not None
+    seen = [note["note_id"] for note in data["data"]]
+
+    response = client.get(f"/notes/search?q=całki&limit=2&cursor={data['next_cursor']}", headers=headers)
+    data = response.json()
+    assert data["next_cursor"] is None
+    seen += [note["note_id"] for note in data["data"]]
+    assert sorted(seen) == [1, 2, 3, 4]
+
+def test_search_notes_no_match(headers):
+    add_search_notes()
+    for query in ("geometria", "\"*)"):
+        response = client.get("/notes/search", params={"q": query}, headers=headers)
+        assert response.status_code == 404
+        assert response.json()["detail"] == "No notes match this search"
+
+def test_search_notes_invalid_cursor(headers):
+    response = client.get("/notes/search?q=całki&cursor=abc", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+def test_search_index_follows_updates(headers):
+    add_search_notes()
+    db = TestingSessionLocal()
+    try:
+        note = db.get(Note, 2)
+        note.content = "Zakres: granice"
+        db.delete(db.get(Note, 1))
+        db.commit()
+    finally:
+        db.close()
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [3]
+    response = client.get("/notes/search?q=granice", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [2]
+
+def test_tokenize_polish():
+    assert tokenize("Całkami oznaczonymi") == tokenize("całki oznaczone") == ["calk", "oznaczon"]
+    assert tokenize("Notatki z ćwiczeń i wykładu") == ["notatk", "cwiczen", "wyklad"]
+
+def test_inverted_index_compacts_retired_notes(tmp_path):
+    index = InvertedIndex()
+    for note_id in range(1, 11):
+        index.add(note_id, f"Notatka {note_id}", "całki", organization_id=1, topic_id=1)
+    for note_id in range(1, 5):
+        index.remove(note_id)
+    index.add(5, "Całki", "całki", organization_id=1, topic_id=1)
+    # Retired slots were rewritten away once they passed a quarter of the notes.
+    stats = index.stats()
+    assert stats["notes"] == 6
+    assert stats["slots"] == 6
+    results = index.search("całki")
+    assert results[0][0] == 5
+    assert sorted(note_id for note_id, _ in results) == [5, 6, 7, 8, 9, 10]
+
+    index.save(str(tmp_path / "notes.idx"))
+    loaded = InvertedIndex()
+    assert loaded.load(str(tmp_path / "notes.idx"))
+    assert loaded.stats()["mapped_terms"] == loaded.stats()["terms"]
+    assert loaded.search("całki") == results
+    loaded.add(11, "Całki", None, organization_id=1, topic_id=1)
+    assert [note_id for note_id, _ in loaded.search("całki")][:2] == [5, 11]
+    assert not InvertedIndex().load(str(tmp_path / "missing.idx"))
+
+def test_index_search_backend(monkeypatch, tmp_path, headers, test_note_text):
+    backend = IndexSearch(path=str(tmp_path / "notes.idx"), session_factory=TestingAsyncSessionLocal)
+    monkeypatch.setattr(routers.notes, "note_search", backend)
+    add_search_notes()
+
+    # Built from the table on first use; stemming also finds other forms.
+    response = client.get("/notes/search?q=całkami&organization_id=1", headers=headers)
+    assert response.status_code == 200
+    note_ids = [note["note_id"] for note in response.json()["data"]]
+    assert note_ids[0] == 1
+    assert sorted(note_ids) == [1, 2, 3]
+    response = client.get("/notes/search?q=całki&topic_id=2", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [3]
+
+    # Created and deleted notes are indexed as they happen.
+    response = client.post("/notes/", data={**test_note_text, "content": "Całki krzywoliniowe"}, headers=headers)
+    assert response.status_code == 200
+    response = client.delete("/notes/1", headers=headers)
+    assert response.status_code == 200
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert sorted(note["note_id"] for note in response.json()["data"]) == [2, 3, 5]
+
+    # A snapshot is mapped back and caught up with changes made meanwhile.
+    asyncio.run(backend.snapshot())
+    db = TestingSessionLocal()
+    try:
+        db.delete(db.get(Note, 2))
+        db.add(Note(title="Całki powierzchniowe", content_type="text", topic_id=1, organization_id=1, user_id=1))
+        db.commit()
+    finally:
+        db.close()
+    restarted = IndexSearch(path=backend.path, session_factory=TestingAsyncSessionLocal)
+    monkeypatch.setattr(routers.notes, "note_search", restarted)
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert sorted(note["note_id"] for note in response.json()["data"]) == [3, 5, 6]
+
+def test_index_search_snapshot_catches_up_with_edits(monkeypatch, tmp_path, headers):
+    backend = IndexSearch(path=str(tmp_path / "notes.idx"), session_factory=TestingAsyncSessionLocal)
+    monkeypatch.setattr(routers.notes, "note_search", backend)
+    add_search_notes()
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert sorted(note["note_id"] for note in response.json()["data"]) == [1, 2, 3]
+    asyncio.run(backend.snapshot())
+
+    # Edited while no index was listening, e.g. by OCR in another worker.
+    db = TestingSessionLocal()
+    try:
+        store_ocr_texts(db, [db.get(Note, 3)], ["Granice ciągów"])
+        db.get(Note, 1).title = "Pochodne"
+        db.commit()
+    finally:
+        db.close()
+    restarted = IndexSearch(path=backend.path, session_factory=TestingAsyncSessionLocal)
+    monkeypatch.setattr(routers.notes, "note_search", restarted)
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [2]
+    response = client.get("/notes/search?q=granice", headers=headers)
+    assert [note["note_id"] for note in response.json()["data"]] == [3]
+
+def test_index_search_rebuilds_unreadable_snapshot(monkeypatch, tmp_path, headers):
+    path = tmp_path / "notes.idx"
+    path.write_bytes(b"EDUIDX2\n" + (64).to_bytes(8, "little") + b"{not json")
+    backend = IndexSearch(path=str(path), session_factory=TestingAsyncSessionLocal)
+    monkeypatch.setattr(routers.notes, "note_search", backend)
+    add_search_notes()
+    response = client.get("/notes/search?q=całki&organization_id=1", headers=headers)
+    assert response.status_code == 200
+    assert sorted(note["note_id"] for note in response.json()["data"]) == [1, 2, 3]
@@ -1,6 +1,15 @@
 import pytest
+import asyncio
+import json
+import threading
+from datetime import datetime
 from .conftest import (setup_database, teardown_database, client, headers, test_organization,
-                       test_user)
+                       test_user, TestingAsyncSessionLocal, TestingSessionLocal)
+from models.notifications import Notification
+from routers.notifications import notification_stream
+import routers.notifications
+from services.notification_bus import notification_bus, NotificationBus, PostgresTransport, notify_batches
+from services.unread_counter import unread_counter
 
 
 @pytest.fixture(autouse=True)
@@ -173,7 +182,7 @@ def test_delete_all_notifications(headers, test_user, test_organization):
     data = response.json()
     assert data["success"] is True
     assert data["message"] == "All notifications deleted successfully"
-    assert isinstance(data["data"], list)
+    assert data["data"] == {"deleted": 1}
 
 def test_delete_all_notifications_no_notifications(headers):
     response = client.delete("/notifications/", headers=headers)
@@ -210,4 +219,197 @@ def test_get_nonexistent_notification(headers):
     response = client.get("/notifications/999", headers=headers)
     assert response.status_code == 404
     data = response.json()
-    assert data["detail"] == "Notification not found"
\ No newline at end of file
+    assert data["detail"] == "Notification not found"
+
+def test_notification_stream_resumes_and_pushes():
+    async def scenario():
+        async with TestingAsyncSessionLocal() as db:
+            db.add_all([Notification(user_id=1, message="Pierwsze"), Notification(user_id=1, message="Drugie")])
+            await db.commit()
+            events = await notification_stream(1, db, last_event_id=1, heartbeat=0.05)
+            assert (await anext(events)).startswith("id: 2\nevent: notification\n")
+            assert await anext(events) == ": heartbeat\n\n"
+
+            live = Notification(user_id=1, message="Trzecie")
+            other = Notification(user_id=2, message="Cudze")
+            db.add_all([live, other])
+            await db.commit()
+            await db.refresh(live)
+            await db.refresh(other)
+            already_sent = await db.get(Notification, 2)
+            notification_bus.publish(other, already_sent, live)
+            event = await anext(events)
+            assert event.startswith("id: 3\n")
+            assert "Trzecie" in event
+            assert notification_bus.subscriber_count() == 1
+            await events.aclose()
+            assert notification_bus.subscriber_count() == 0
+
+    asyncio.run(scenario())
+
+def test_notification_stream_replays_whole_backlog(monkeypatch):
+    monkeypatch.setattr(routers.notifications, "MAX_PAGE_LIMIT", 2)
+
+    async def scenario():
+        async with TestingAsyncSessionLocal() as db:
+            db.add_all([Notification(user_id=1, message=f"Powiadomienie {i}") for i in range(6)])
+            await db.commit()
+            events = await notification_stream(1, db, last_event_id=1, heartbeat=0.05)
+            replayed = []
+            while (event := await anext(events)) != ": heartbeat\n\n":
+                replayed.append(int(event.split("\n")[0].removeprefix("id: ")))
+            await events.aclose()
+            return replayed
+
+    assert asyncio.run(scenario()) == [2, 3, 4, 5, 6]
+
+def test_notify_batches_fit_postgres_limit():
+    payloads = [{"user_id": i, "message": "x" * 100} for i in range(200)]
+    batches = notify_batches(payloads, limit=1000)
+    assert all(len(batch.encode()) <= 1000 for batch in batches)
+    assert [payload for batch in batches for payload in json.loads(batch)] == payloads
+    # Each batch is full: the next payload would not have fit.
+    encoded = len(json.dumps(payloads[0]))
+    assert all(len(batch) + encoded + 1 > 1000 for batch in batches[:-1])
+    assert notify_batches([{"message": "x" * 2000}], limit=1000) == [json.dumps([{"message": "x" * 2000}])]
+
+def test_postgres_transport_sends_fan_out_in_one_transaction():
+    bus = NotificationBus(transport="memory")
+    transport = PostgresTransport(bus)
+    transactions = []
+
+    async def notify(batches):
+        # Stands in for pg_notify: the listener gets every batch.
+        transactions.append(batches)
+        for batch in batches:
+            transport._on_notify(None, 0, "notifications", batch)
+
+    transport._notify = notify
+    transport.loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=transport.loop.run_forever, daemon=True)
+    thread.start()
+    delivered = []
+    bus.dispatch = delivered.append
+    try:
+        payloads = [{"notification_id": i, "user_id": i, "message": "Nowy termin " * 20} for i in range(2000)]
+        transport.send_many(payloads)
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0), transport.loop).result(timeout=5)
+    finally:
+        transport.loop.call_soon_threadsafe(transport.loop.stop)
+        thread.join()
+        transport.loop.close()
+    assert len(transactions) == 1
+    assert 1 < len(transactions[0]) < 100
+    assert delivered == payloads
+
+def test_notification_pushed_on_removal_from_organization(test_user, test_organization):
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    login_data = {"username": test_user["username"], "password": test_user["password"]}
+    token = client.post("/auth/login", data=login_data).json()["access_token"]
+    auth_headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/organizations/", json=test_organization, headers=auth_headers)
+    assert response.status_code == 200
+
+    async def scenario():
+        async with TestingAsyncSessionLocal() as db:
+            events = await notification_stream(1, db)
+            response = await asyncio.to_thread(
+                client.delete, "/organization_users/RemoveUserFromOrganization?organization_id=1&user_id=1",
+                headers=auth_headers
+            )
+            assert response.status_code == 200
+            event = await asyncio.wait_for(anext(events), timeout=5)
+            await events.aclose()
+            return event
+
+    assert "You have been removed from organization Test Organization." in asyncio.run(scenario())
+
+def test_unread_count(monkeypatch, test_user, test_organization):
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    login_data = {"username": test_user["username"], "password": test_user["password"]}
+    token = client.post("/auth/login", data=login_data).json()["access_token"]
+    auth_headers = {"Authorization": f"Bearer {token}"}
+    response = client.post("/organizations/", json=test_organization, headers=auth_headers)
+    assert response.status_code == 200
+
+    response = client.get("/notifications/unread_count", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Unread notifications count retrieved successfully"
+    assert data["data"] == {"unread_count": 0}
+
+    response = client.delete("/organization_users/RemoveUserFromOrganization?organization_id=1&user_id=1",
+                             headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/notifications/unread_count", headers=auth_headers).json()["data"]["unread_count"] == 1
+    response = client.put("/notifications/1/read", headers=auth_headers)
+    assert response.status_code == 200
+    response = client.put("/notifications/1/read", headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/notifications/unread_count", headers=auth_headers).json()["data"]["unread_count"] == 0
+    assert unread_counter.stats()["misses"] == 1
+
+    # Rows written behind the counter's back show up once the entry expires.
+    db = TestingSessionLocal()
+    try:
+        db.add(Notification(user_id=1, message="Z innego workera"))
+        db.commit()
+    finally:
+        db.close()
+    assert client.get("/notifications/unread_count", headers=auth_headers).json()["data"]["unread_count"] == 0
+    monkeypatch.setattr(unread_counter, "ttl", 0)
+    assert client.get("/notifications/unread_count", headers=auth_headers).json()["data"]["unread_count"] == 1
+
+    monkeypatch.setattr(unread_counter, "ttl", 60)
+    response = client.delete("/notifications/", headers=auth_headers)
+    assert response.status_code == 200
+    assert client.get("/notifications/unread_count", headers=auth_headers).json()["data"]["unread_count"] == 0
+
+def add_notifications(user_id, count, created_at=None):
+    db = TestingSessionLocal()
+    try:
+        db.add_all([Notification(user_id=user_id, message=f"Powiadomienie {i}", created_at=created_at)
+                    for i in range(count)])
+        db.commit()
+    finally:
+        db.close()
+
+def test_bulk_mark_as_read(headers):
+    add_notifications(1, 5)
+    add_notifications(2, 2)
+    response = client.put("/notifications/read?ids=1&ids=2&ids=6", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Notifications marked as read successfully"
+    assert data["data"] == {"updated": 2}
+
+    response = client.put("/notifications/read", headers=headers)
+    assert response.json()["data"] == {"updated": 3}
+    assert client.get("/notifications/unread_count", headers=headers).json()["data"]["unread_count"] == 0
+    statuses = [n["status"] for n in client.get("/notifications/", headers=headers).json()["data"]]
+    assert statuses == ["read"] * 5 + ["unread"] * 2
+
+def test_bulk_delete(headers):
+    add_notifications(1, 3, created_at=datetime(2020, 1, 1))
+    add_notifications(1, 2)
+    add_notifications(2, 2)
+
+    response = client.delete("/notifications/?older_than=2021-01-01T00:00:00", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["data"] == {"deleted": 3}
+
+    response = client.delete("/notifications/batch?ids=4&ids=6", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Notifications deleted successfully"
+    assert data["data"] == {"deleted": 1}
+    response = client.delete("/notifications/batch?ids=4", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Notifications not found"
+
+    assert client.get("/notifications/unread_count", headers=headers).json()["data"]["unread_count"] == 1
+    response = client.delete("/notifications/", headers=headers)
+    assert response.json()["data"] == {"deleted": 1}
+    assert len(client.get("/notifications/", headers=headers).json()["data"]) == 2
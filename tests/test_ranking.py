@@ -1,5 +1,13 @@
 import pytest
-from .conftest import setup_database, teardown_database, client, headers, test_user
+from .conftest import (setup_database, teardown_database, client, headers, test_user, TestingSessionLocal,
+                       test_organization, test_channel, test_topic)
+from datetime import timedelta
+from models.user import RankEnum
+from models.organization_score_bucket import OrganizationScoreBucket
+from services.organization_ranking import today
+from services.vote_buffer import vote_buffer
+import asyncio
+from services.leaderboard import Leaderboard, leaderboard
 
 
 @pytest.fixture(autouse=True)
@@ -44,6 +52,9 @@ def test_get_all_users_score(headers, test_user):
     assert "username" in data["data"][0]
     assert "score" in data["data"][0]
     assert "rank" in data["data"][0]
+    assert data["total"] == 1
+    assert data["limit"] == 50
+    assert data["next_cursor"] is None
 
 def test_get_user_score(headers, test_user):
     response = client.post("/auth/register", json=test_user)
@@ -72,4 +83,113 @@ def test_get_all_users_score_no_users(headers):
 
 def test_get_my_score_unauthorized():
     response = client.get("/ranking/my")
-    assert response.status_code == 401
\ No newline at end of file
+    assert response.status_code == 401
+
+def test_leaderboard_top_paging_and_around():
+    board = Leaderboard()
+    board.loaded = True
+    for user_id, score in [(1, 5), (2, 30), (3, 12), (4, 12), (5, 0)]:
+        board.update(user_id, score, RankEnum.beginner, f"user{user_id}")
+    assert [entry["user_id"] for entry in board.top(10)] == [2, 3, 4, 1, 5]
+    assert [entry["user_id"] for entry in board.top(2, offset=2)] == [4, 1]
+    assert board.top(2, offset=10) == []
+
+    board.update(1, 40, RankEnum.master)
+    around = board.around(1, neighbours=1)
+    assert [(entry["position"], entry["user_id"]) for entry in around] == [(1, 1), (2, 2)]
+    assert around[0]["username"] == "user1"
+    assert [entry["user_id"] for entry in board.around(4, neighbours=1)] == [3, 4, 5]
+    board.remove(3)
+    assert len(board) == 4
+    assert board.around(3, neighbours=1) is None
+
+def test_leaderboard_follows_votes(headers, test_user, test_organization, test_channel, test_topic):
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    response = client.get("/ranking/", headers=headers)
+    assert response.json()["data"][0]["score"] == 0
+    assert leaderboard.loaded
+
+    other = dict(test_user, username="other", email="other@example.com")
+    response = client.post("/auth/register", json=other)
+    assert response.status_code == 201
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Note", "content_type": "text", "content": "Tekst", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/notes/give_dislike?note_id=1", headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/ranking/?limit=1", headers=headers)
+    page = response.json()
+    assert page["total"] == 2
+    assert [entry["username"] for entry in page["data"]] == ["other"]
+    response = client.get(f"/ranking/?limit=1&cursor={page['next_cursor']}", headers=headers)
+    page = response.json()
+    assert [(entry["username"], entry["score"], entry["position"]) for entry in page["data"]] == [("testuser", -1, 2)]
+    assert page["next_cursor"] is None
+    response = client.get("/ranking/my/around?neighbours=1", headers=headers)
+    assert response.status_code == 200
+    assert [entry["username"] for entry in response.json()["data"]] == ["other", "testuser"]
+
+def create_liked_note(headers, test_user, test_organization, test_channel, test_topic):
+    response = client.post("/auth/register", json=test_user)
+    assert response.status_code == 201
+    response = client.post("/organizations/", json=test_organization, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/channels/", json=test_channel, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/topics/", json=test_topic, headers=headers)
+    assert response.status_code == 200
+    note = {"title": "Note", "content_type": "text", "content": "Tekst", "topic_id": 1, "organization_id": 1}
+    response = client.post("/notes/", data=note, headers=headers)
+    assert response.status_code == 200
+    response = client.post("/notes/give_like?note_id=1", headers=headers)
+    assert response.status_code == 200
+
+def test_organization_ranking_window(headers, test_user, test_organization, test_channel, test_topic):
+    create_liked_note(headers, test_user, test_organization, test_channel, test_topic)
+    db = TestingSessionLocal()
+    try:
+        db.add(OrganizationScoreBucket(organization_id=1, day=today() - timedelta(days=10), user_id=1, score=5))
+        db.commit()
+    finally:
+        db.close()
+
+    response = client.get("/ranking/organization/1?window=7d", headers=headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["message"] == "Organization ranking retrieved successfully"
+    assert data["data"] == [{"position": 1, "user_id": 1, "username": "testuser", "score": 1}]
+    response = client.get("/ranking/organization/1?window=30d", headers=headers)
+    assert response.json()["data"][0]["score"] == 6
+
+def test_organization_ranking_invalid(headers, test_user, test_organization, test_channel, test_topic):
+    create_liked_note(headers, test_user, test_organization, test_channel, test_topic)
+    response = client.get("/ranking/organization/1?window=week", headers=headers)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid window"
+    response = client.get("/ranking/organization/999", headers=headers)
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Organization not found"
+
+def test_organization_ranking_merges_buffered_votes(monkeypatch, headers, test_user, test_organization,
+                                                    test_channel, test_topic):
+    monkeypatch.setattr(vote_buffer, "enabled", True)
+    create_liked_note(headers, test_user, test_organization, test_channel, test_topic)
+    response = client.get("/ranking/organization/1?window=1d", headers=headers)
+    assert response.json()["data"][0]["score"] == 1
+
+    asyncio.run(vote_buffer.flush())
+    db = TestingSessionLocal()
+    try:
+        assert db.query(OrganizationScoreBucket.score).filter_by(organization_id=1, user_id=1).scalar() == 1
+    finally:
+        db.close()
+    response = client.get("/ranking/organization/1?window=1d", headers=headers)
+    assert response.json()["data"][0]["score"] == 1
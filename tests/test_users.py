@@ -1,5 +1,13 @@
 import pytest
-from .conftest import setup_database, teardown_database, client, test_user
+from .conftest import setup_database, teardown_database, client, test_user, authenticate
+import routers.users
+from services.auth_serivce import create_access_token
+from services.token_cache import token_cache
+from datetime import timedelta
+from fastapi import HTTPException
+from PIL import Image
+import io
+import os
 
 
 @pytest.fixture(autouse=True)
@@ -89,6 +97,44 @@ def test_update_user(test_user):
     assert data["message"] == "User updated successfully"
     assert data["data"]["username"] == update_data["username"]
 
+def login(username: str, password: str) -> str:
+    response = client.post("/auth/login", data={"username": username, "password": password})
+    assert response.status_code == 200
+    return response.json()["access_token"]
+
+def test_update_user_password_revokes_tokens(test_user):
+    client.post("/auth/register/", json=test_user)
+    token = login(test_user["username"], test_user["password"])
+    authenticate(token)
+
+    response = client.put("/users/1", json={"first_name": "Nowe"})
+    assert response.status_code == 200
+    assert token_cache.get(token) is not None
+    assert authenticate(token)["user_id"] == 1
+
+    response = client.put("/users/1", json={"password": "updatedpassword"})
+    assert response.status_code == 200
+    assert token_cache.get(token) is None
+    with pytest.raises(HTTPException) as error:
+        authenticate(token)
+    assert error.value.status_code == 401
+    assert authenticate(login(test_user["username"], "updatedpassword"))["user_id"] == 1
+
+def test_change_password_revokes_tokens(test_user):
+    client.post("/auth/register/", json=test_user)
+    token = login(test_user["username"], test_user["password"])
+    authenticate(token)
+    response = client.put("/users/1/change_password", data={"old_password": test_user["password"],
+                                                              "new_password": "newpassword"},
+                          headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    with pytest.raises(HTTPException):
+        authenticate(token)
+    # Forged with the old version, as if it had been issued before the change.
+    forged = create_access_token(test_user["username"], 1, test_user["email"], timedelta(minutes=30))
+    with pytest.raises(HTTPException):
+        authenticate(forged)
+
 def test_update_user_avatar(test_user):
     client.post("/auth/register/", json=test_user)
 
@@ -113,6 +159,60 @@ def test_update_user_avatar(test_user):
     assert data["message"] == "Avatar updated successfully"
     assert data["data"]["avatar_url"] is not None
 
+def test_replace_user_avatar(test_user):
+    client.post("/auth/register/", json=test_user)
+    login_response = client.post("/auth/login", data={"username": test_user["username"],
+                                                      "password": test_user["password"]})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+
+    paths = []
+    for content in (b"pierwszy", b"drugi"):
+        response = client.put("/users/1/avatar", files={'file': ('avatar.png', content, 'image/png')},
+                              headers=headers)
+        assert response.status_code == 200
+        paths.append(response.json()["data"]["avatar_url"].lstrip("/"))
+    assert client.get("/users/1").json()["data"]["avatar_variants"] == []
+    # The replaced avatar was its bytes' only reference.
+    assert not os.path.exists(paths[0])
+    assert os.path.exists(paths[1])
+
+    response = client.delete("/users/1", headers=headers)
+    assert response.status_code == 200
+    assert not os.path.exists(paths[1])
+
+def test_user_avatar_variants(test_user):
+    client.post("/auth/register/", json=test_user)
+    login_response = client.post("/auth/login", data={"username": test_user["username"],
+                                                      "password": test_user["password"]})
+    headers = {"Authorization": f"Bearer {login_response.json()['access_token']}"}
+    buffer = io.BytesIO()
+    Image.new("RGBA", (800, 800), (200, 40, 40, 128)).save(buffer, "PNG")
+
+    response = client.put("/users/1/avatar", files={'file': ('avatar.png', buffer.getvalue(), 'image/png')},
+                          headers=headers)
+    assert response.status_code == 200
+    variants = client.get("/users/1").json()["data"]["avatar_variants"]
+    assert {(variant["name"], variant["width"]) for variant in variants} == {("thumb", 320), ("medium", 800)}
+    assert variants[0]["width"] == 320
+    assert all(os.path.exists(variant["url"].lstrip("/")) for variant in variants)
+
+    client.delete("/users/1", headers=headers)
+    assert not any(os.path.exists(variant["url"].lstrip("/")) for variant in variants)
+
+def test_update_user_avatar_too_large(monkeypatch, test_user):
+    monkeypatch.setattr(routers.users, "AVATAR_MAX_BYTES", 10)
+    client.post("/auth/register/", json=test_user)
+    login_response = client.post("/auth/login", data={"username": test_user["username"],
+                                                      "password": test_user["password"]})
+    token = login_response.json()["access_token"]
+
+    response = client.put("/users/1/avatar",
+                          files={'file': ('test_avatar.png', b'x' * 11, 'image/png')},
+                          headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File too large"
+    assert client.get("/users/1").json()["data"]["avatar_url"] is None
+
 def test_change_password(test_user):
     client.post("/auth/register/", json=test_user)
 